@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import tracemalloc
+
+from app.core import memory, profiling
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints answer 404 unless ADMIN_TOKEN is set and sent in X-Admin-Token."""
+    if not profiling.admin_authorized(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _profile_response(stacks: profiling.Stacks, name: str, format: str):
+    if format == "speedscope":
+        return profiling.speedscope(stacks, name)
+    return PlainTextResponse(profiling.collapsed(stacks))
+
+
+@router.get("/profile")
+async def sample_worker(
+    seconds: float = Query(10, gt=0, le=120),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    idle: bool = Query(False, description="Include threads waiting for work"),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$")
+):
+    """Sample every thread of this worker for ``seconds`` and return flamegraph stacks."""
+    stacks = await run_in_threadpool(profiling.stack_sampler.run, seconds, interval_ms / 1000, idle)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A sampling run is already in progress")
+    return _profile_response(stacks, f"worker sample {seconds}s", format)
+
+
+@router.get("/scheduler")
+async def scheduler_status():
+    """This worker's view of the scheduler: lease, fencing token and job history (jobs only run on the leader)."""
+    from app.jobs.scheduler import scheduler
+
+    return scheduler.status()
+
+
+@router.get("/profiles")
+async def list_request_profiles():
+    """Recent single-request profiles (requests sent with X-Profile: 1)."""
+    return {"profiles": profiling.profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$")
+):
+    profiler = profiling.profile_store.get(profile_id)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(profiler.stacks, profiler.name, format)
+
+
+def _require_tracing():
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not running; POST /admin/memory/tracing first")
+
+
+@router.get("/memory")
+async def memory_overview():
+    """Process memory, in-process cache sizes (from the last index refresh), per-route request peaks and held snapshots."""
+    measured_at, caches = memory.last_cache_sizes()
+    return {
+        "process": memory.process_memory(),
+        "caches_measured_at": measured_at,
+        "caches": {
+            name: {"entries": entries, "approx_kb": round(size / 1024, 1)}
+            for name, (entries, size) in sorted(caches.items(), key=lambda item: -item[1][1])
+        },
+        "request_peaks": memory.allocation_sampler.routes(),
+        "snapshots": memory.snapshots.list(),
+    }
+
+
+@router.post("/memory/tracing")
+async def start_memory_tracing(frames: int = Query(10, ge=1, le=100)):
+    """Start tracemalloc; allocations made before this are not traced."""
+    memory.start_tracing(frames)
+    return memory.process_memory()
+
+
+@router.delete("/memory/tracing")
+async def stop_memory_tracing():
+    """Stop tracemalloc and drop held snapshots and request peaks."""
+    memory.stop_tracing()
+    memory.allocation_sampler.reset()
+    return memory.process_memory()
+
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(
+    label: str = Query(""),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """Snapshot traced allocations and return the top allocators."""
+    _require_tracing()
+    snapshot_id = await run_in_threadpool(memory.snapshots.take, label)
+    return await run_in_threadpool(memory.snapshots.top, snapshot_id, group_by, limit)
+
+
+@router.get("/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(
+    snapshot_id: int,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    top = await run_in_threadpool(memory.snapshots.top, snapshot_id, group_by, limit)
+    if top is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return top
+
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(
+    base: int,
+    current: Optional[int] = Query(None, description="Defaults to a new snapshot taken now"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """Allocation growth from snapshot ``base`` to ``current``."""
+    if current is None:
+        _require_tracing()
+        current = await run_in_threadpool(memory.snapshots.take, "diff")
+    diff = await run_in_threadpool(memory.snapshots.diff, base, current, group_by, limit)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return diff
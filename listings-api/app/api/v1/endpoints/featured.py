@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, Path
+from fastapi import APIRouter, Depends, Query, HTTPException, Path, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import Optional
 import json
 
-from app.core.database import get_db, get_redis
+from app.core.cache import ResponseCache, get_response_cache
+from app.core.database import get_db
+from app.core.query_log import query_log, request_fingerprint
 from app.core.config import settings
-from app.models.schemas import FeaturedListingsResponse, PropertyType
-from app.services.featured import FeaturedService
+from app.core.request_context import serialize
+from app.models.schemas import FeaturedBatchResponse, FeaturedListingsResponse, PropertyType
+from app.services.featured import FeaturedService, featured_cache_key
+from app.services.office_stats import office_stats
+from app.utils.http_cache import latest_timestamp
 
 router = APIRouter()
 
@@ -20,8 +26,10 @@ async def get_active_offices(
     """
     Get list of active broker offices that have listings.
     """
-    featured_service = FeaturedService(db)
-    offices = featured_service.get_active_offices(property_type, limit)
+    if office_stats.loaded:
+        offices = office_stats.get_active_offices(property_type, limit)
+    else:
+        offices = FeaturedService(db).get_active_offices(property_type, limit)
     
     return {
         "offices": offices,
@@ -37,8 +45,10 @@ async def get_office_info(
     """
     Get basic information about a broker office.
     """
-    featured_service = FeaturedService(db)
-    office_info = featured_service.get_office_info(office_key)
+    if office_stats.loaded:
+        office_info = office_stats.get_office_info(office_key)
+    else:
+        office_info = FeaturedService(db).get_office_info(office_key)
     
     if not office_info:
         raise HTTPException(
@@ -49,29 +59,98 @@ async def get_office_info(
     return office_info
 
 
+@router.get("/batch", response_model=FeaturedBatchResponse)
+async def get_featured_listings_batch(
+    office_keys: str = Query(..., description="Comma-separated broker office keys"),
+    property_type: Optional[PropertyType] = Query(None, description="Filter by property type"),
+    limit: int = Query(12, ge=1, le=50, description="Number of featured listings per office"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
+    db: Session = Depends(get_db),
+    response_cache: ResponseCache = Depends(get_response_cache)
+):
+    """
+    Get featured listings for several broker offices in one call.
+    Results follow the request order; offices without listings are returned with found=false.
+    """
+    keys = list(dict.fromkeys(key.strip() for key in office_keys.split(",") if key.strip()))
+    if not keys:
+        raise HTTPException(status_code=400, detail="At least one office key is required")
+    if len(keys) > settings.BATCH_MAX_OFFICE_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_OFFICE_KEYS} office keys per request"
+        )
+    
+    # Per-office feeds already cached (including pre-rendered ones) are reused as raw JSON
+    cache_keys = {
+        key: featured_cache_key(key, property_type, limit, transaction_type) for key in keys
+    }
+    cached = response_cache.get_many(list(cache_keys.values()))
+    bodies = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+    
+    missing = [key for key in keys if key not in bodies]
+    if missing:
+        featured_service = FeaturedService(db)
+        fetched = featured_service.get_featured_listings_batch(
+            missing, property_type, limit, transaction_type
+        )
+        stored = response_cache.set_many(
+            {
+                cache_keys[key]: (
+                    serialize(feed),
+                    latest_timestamp(listing.modification_timestamp for listing in feed.listings)
+                )
+                for key, feed in fetched.items()
+            },
+            settings.CACHE_TTL_SECONDS
+        )
+        for key in fetched:
+            bodies[key] = stored[cache_keys[key]].body
+    
+    results = []
+    not_found = []
+    for key in keys:
+        encoded_key = json.dumps(key).encode()
+        if key in bodies:
+            results.append(b'{"office_key":' + encoded_key + b',"found":true,"feed":' + bodies[key] + b'}')
+        else:
+            not_found.append(key)
+            results.append(b'{"office_key":' + encoded_key + b',"found":false,"feed":null}')
+    
+    body = (
+        b'{"results":[' + b",".join(results) + b'],'
+        b'"count":' + str(len(bodies)).encode() + b','
+        b'"not_found":' + json.dumps(not_found).encode() + b'}'
+    )
+    return Response(content=body, media_type="application/json")
+
+
 @router.get("/{office_key}", response_model=FeaturedListingsResponse)
 async def get_featured_listings_by_office(
+    request: Request,
     office_key: str = Path(..., description="Broker office key"),
     property_type: Optional[PropertyType] = Query(None, description="Filter by property type"),
     limit: int = Query(12, ge=1, le=50, description="Number of featured listings to return"),
     transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
     db: Session = Depends(get_db),
-    redis_client = Depends(get_redis)
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Get featured listings for a specific broker office.
     Returns the most recent active listings from that office.
+    Common variants are pre-rendered after each ingestion run.
     """
 
-    cache_key = f"featured:{office_key}:{property_type}:{limit}:{transaction_type}"
-    
-    if redis_client:
-        try:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return FeaturedListingsResponse.model_validate(json.loads(cached_result))
-        except Exception:
-            pass
+    query_log.record(request_fingerprint("featured", {
+        "office_key": office_key,
+        "property_type": property_type.value if property_type else None,
+        "limit": limit,
+        "transaction_type": transaction_type,
+    }))
+    cache_key = featured_cache_key(office_key, property_type, limit, transaction_type)
+    cached_response = response_cache.respond(request, cache_key)
+    if cached_response:
+        return cached_response
     
     featured_service = FeaturedService(db)
     featured_response = featured_service.get_featured_listings(
@@ -87,14 +166,12 @@ async def get_featured_listings_by_office(
             detail=f"No listings found for office key '{office_key}'"
         )
     
-    if redis_client:
-        try:
-            redis_client.setex(
-                cache_key,
-                settings.CACHE_TTL_SECONDS,
-                featured_response.model_dump_json()
-            )
-        except Exception:
-            pass
-    
-    return featured_response
\ No newline at end of file
+    return response_cache.store(
+        request,
+        cache_key,
+        serialize(featured_response),
+        settings.CACHE_TTL_SECONDS,
+        last_modified=latest_timestamp(
+            listing.modification_timestamp for listing in featured_response.listings
+        )
+    )
\ No newline at end of file
@@ -1,55 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import Optional
 import json
 
+from app.core.cache import ResponseCache, get_response_cache
 from app.core.database import get_db, get_redis
 from app.core.config import settings
-from app.models.schemas import ListingDetail, MediaItem
+from app.core.request_context import serialize
+from app.models.schemas import (
+    ListingDetail, MediaItem, ListingBatchRequest, ListingBatchResponse
+)
 from app.services.listings import ListingsService
+from app.services.media import MediaService
 
 router = APIRouter()
 
 
+@router.post("/batch", response_model=ListingBatchResponse)
+async def get_listings_batch(
+    batch: ListingBatchRequest,
+    db: Session = Depends(get_db),
+    response_cache: ResponseCache = Depends(get_response_cache)
+):
+    """
+    Get detailed information for several listings in one call.
+    Results follow the request order; unknown keys are returned with found=false.
+    """
+    listing_keys = list(dict.fromkeys(batch.listing_keys))
+    if len(listing_keys) > settings.BATCH_MAX_LISTING_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_LISTING_KEYS} listing keys per request"
+        )
+    
+    # Cached details are reused as raw JSON, only misses go to the database
+    cached = response_cache.get_many([f"listing_detail:{key}" for key in listing_keys])
+    bodies = {key: cached[f"listing_detail:{key}"] for key in listing_keys
+              if f"listing_detail:{key}" in cached}
+    
+    missing = [key for key in listing_keys if key not in bodies]
+    if missing:
+        listings_service = ListingsService(db)
+        fetched = listings_service.get_listings_by_keys(missing)
+        stored = response_cache.set_many(
+            {
+                f"listing_detail:{key}": (serialize(listing), listing.modification_timestamp)
+                for key, listing in fetched.items()
+            },
+            settings.CACHE_TTL_SECONDS
+        )
+        for key in fetched:
+            bodies[key] = stored[f"listing_detail:{key}"].body
+    
+    results = []
+    not_found = []
+    for key in listing_keys:
+        encoded_key = json.dumps(key).encode()
+        if key in bodies:
+            results.append(b'{"listing_key":' + encoded_key + b',"found":true,"listing":' + bodies[key] + b'}')
+        else:
+            not_found.append(key)
+            results.append(b'{"listing_key":' + encoded_key + b',"found":false,"listing":null}')
+    
+    body = (
+        b'{"results":[' + b",".join(results) + b'],'
+        b'"count":' + str(len(bodies)).encode() + b','
+        b'"not_found":' + json.dumps(not_found).encode() + b'}'
+    )
+    return Response(content=body, media_type="application/json")
+
+
 @router.get("/{listing_key}", response_model=ListingDetail)
 async def get_listing_detail(
+    request: Request,
     listing_key: str = Path(..., description="Unique listing identifier"),
     db: Session = Depends(get_db),
-    redis_client = Depends(get_redis)
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Get detailed information for a specific listing by its listing key.
+    Supports conditional requests via ETag / Last-Modified.
     """
     
     cache_key = f"listing_detail:{listing_key}"
-    if redis_client:
-        try:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return ListingDetail.model_validate(json.loads(cached_result))
-        except Exception:
-            pass
+    cached_response = response_cache.respond(request, cache_key)
+    if cached_response:
+        return cached_response
     
     listings_service = ListingsService(db)
-    listing = listings_service.get_listing_by_key(listing_key)
+    if settings.DETAIL_SQL_RENDERING:
+        document = listings_service.get_listing_detail_json(listing_key)
+    else:
+        listing = listings_service.get_listing_by_key(listing_key)
+        document = (serialize(listing), listing.modification_timestamp) if listing else None
     
-    if not listing:
+    if not document:
         raise HTTPException(
             status_code=404,
             detail=f"Listing with key '{listing_key}' not found"
         )
     
-    if redis_client:
-        try:
-            redis_client.setex(
-                cache_key,
-                settings.CACHE_TTL_SECONDS,
-                listing.model_dump_json()
-            )
-        except Exception:
-            pass
-    
-    return listing
+    body, modification_timestamp = document
+    return response_cache.store(
+        request,
+        cache_key,
+        body,
+        settings.CACHE_TTL_SECONDS,
+        last_modified=modification_timestamp
+    )
 
 
 @router.get("/{listing_key}/media")
@@ -63,18 +122,8 @@ async def get_listing_media(
     Get all media for a specific listing.
     Optional size parameter to filter by image size (Thumbnail, Medium, Large).
     """
-    cache_key = f"listing_media:{listing_key}:{size or 'all'}"
-    
-    if redis_client:
-        try:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return json.loads(cached_result)
-        except Exception:
-            pass
-    
-    listings_service = ListingsService(db)
-    media = listings_service.get_listing_media(listing_key, size)
+    media_service = MediaService(db, redis_client)
+    media = media_service.get_media_by_listing(listing_key, size_filter=size)
     
     if media is None:
         raise HTTPException(
@@ -82,19 +131,7 @@ async def get_listing_media(
             detail=f"Listing with key '{listing_key}' not found"
         )
     
-    response = {"listing_key": listing_key, "media": media}
-    
-    if redis_client:
-        try:
-            redis_client.setex(
-                cache_key,
-                settings.CACHE_TTL_SECONDS,
-                json.dumps(response, default=str)
-            )
-        except Exception:
-            pass
-    
-    return response
+    return {"listing_key": listing_key, "media": media}
 
 
 @router.get("/{listing_key}/similar")
@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, Query, HTTPException, Path
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
-from app.core.database import get_db
+from app.core.database import get_db, get_redis
 from app.models.schemas import MediaItem
 from app.services.media import MediaService
+from app.services.reference_data import reference_data
 
 router = APIRouter()
 
@@ -15,12 +16,14 @@ async def get_media_by_listing(
     size: Optional[str] = Query(None, description="Filter by image size (Thumbnail, Medium, Large)"),
     media_type: Optional[str] = Query(None, description="Filter by media type"),
     limit: Optional[int] = Query(None, ge=1, le=100, description="Limit number of media items"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    redis_client = Depends(get_redis)
 ):
     """
     Get media for a specific listing with optional filtering.
+    All filter variants are served from one cached media bundle.
     """
-    media_service = MediaService(db)
+    media_service = MediaService(db, redis_client)
     media_items = media_service.get_media_by_listing(
         listing_key=listing_key,
         size_filter=size,
@@ -74,8 +77,7 @@ async def get_available_media_sizes(
     """
     Get list of available media sizes in the system.
     """
-    media_service = MediaService(db)
-    sizes = media_service.get_available_sizes(property_type)
+    sizes = reference_data.get(db).get_media_sizes(property_type)
     
     return {
         "available_sizes": sizes,
@@ -91,8 +93,7 @@ async def get_available_media_types(
     """
     Get list of available media types in the system.
     """
-    media_service = MediaService(db)
-    types = media_service.get_available_types(property_type)
+    types = reference_data.get(db).get_media_types(property_type)
     
     return {
         "available_types": types,
@@ -1,21 +1,26 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import Optional, List
-import json
 
-from app.core.database import get_db, get_redis
+from app.core.cache import ResponseCache, get_response_cache
+from app.core.database import get_db
 from app.core.config import settings
+from app.core.request_context import serialize
+from app.core.query_log import fingerprint_cache_key, query_log, request_fingerprint
 from app.models.schemas import (
     SearchResponse, MapResponse, SearchFilters, 
-    PaginationInfo, TransactionType, PropertyType, SortOption
+    TransactionType, PropertyType, SortOption
 )
+from app.services.reference_data import reference_data
 from app.services.search import SearchService
+from app.utils.http_cache import latest_timestamp
 
 router = APIRouter()
 
 
 @router.get("/", response_model=SearchResponse)
 async def search_listings(
+    request: Request,
     transaction_type: Optional[TransactionType] = Query(None, description="Sale, Lease, or Sub-Lease"),
     property_type: Optional[PropertyType] = Query(None, description="Residential or Commercial"),
     property_sub_type: Optional[str] = Query(None, description="Detached, Condo, etc."),
@@ -32,7 +37,7 @@ async def search_listings(
     sort: SortOption = Query(SortOption.NEWEST, description="Sort option"),
     
     db: Session = Depends(get_db),
-    redis_client = Depends(get_redis)
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Search listings with filters, pagination, and sorting.
@@ -50,54 +55,36 @@ async def search_listings(
         county_or_parish=county_or_parish,
     )
     
-    cache_key = f"search:{hash(str(filters.model_dump()))}:{page}:{limit}:{sort}"
+    fingerprint = request_fingerprint("search", {
+        "filters": filters.model_dump(mode="json", exclude_none=True),
+        "page": page,
+        "limit": limit,
+        "sort": sort.value,
+    })
+    query_log.record(fingerprint)
+    cache_key = fingerprint_cache_key(fingerprint)
     
-    if redis_client:
-        try:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return SearchResponse.model_validate(json.loads(cached_result))
-        except Exception:
-            pass
+    cached_response = response_cache.respond(request, cache_key)
+    if cached_response:
+        return cached_response
     
     search_service = SearchService(db)
-    
-    listings, total_count = search_service.search_listings(
-        filters=filters,
-        page=page,
-        limit=limit,
-        sort=sort
-    )
-    
-    total_pages = (total_count + limit - 1) // limit
-    pagination = PaginationInfo(
-        page=page,
-        limit=limit,
-        total=total_count,
-        pages=total_pages
-    )
-    
-    response = SearchResponse(
-        listings=listings,
-        pagination=pagination,
-        filters_applied=filters
+    response = search_service.build_search_response(filters, page, limit, sort)
+    
+    return response_cache.store(
+        request,
+        cache_key,
+        serialize(response),
+        settings.SEARCH_CACHE_TTL,
+        last_modified=latest_timestamp(
+            listing.modification_timestamp for listing in response.listings
+        )
     )
-    
-    if redis_client:
-        try:
-            redis_client.setex(
-                cache_key, 
-                settings.SEARCH_CACHE_TTL, 
-                response.model_dump_json()
-            )
-        except Exception:
-            pass
-    
-    return response
 
 
 @router.get("/map", response_model=MapResponse)
 async def search_listings_for_map(
+    request: Request,
     
     ne_lat: float = Query(..., description="Northeast latitude"),
     ne_lng: float = Query(..., description="Northeast longitude"),
@@ -115,7 +102,7 @@ async def search_listings_for_map(
     limit: int = Query(500, ge=1, le=1000, description="Max listings for map"),
     
     db: Session = Depends(get_db),
-    redis_client = Depends(get_redis)
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Get listings within map bounds for display on a map.
@@ -142,39 +129,29 @@ async def search_listings_for_map(
         sw_lng=sw_lng,
     )
     
-    cache_key = f"map:{hash(str(filters.model_dump()))}:{limit}"
+    fingerprint = request_fingerprint("map", {
+        "filters": filters.model_dump(mode="json", exclude_none=True),
+        "limit": limit,
+    })
+    query_log.record(fingerprint)
+    cache_key = fingerprint_cache_key(fingerprint)
     
-    if redis_client:
-        try:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return MapResponse.model_validate(json.loads(cached_result))
-        except Exception:
-            pass
+    cached_response = response_cache.respond(request, cache_key)
+    if cached_response:
+        return cached_response
     
     search_service = SearchService(db)
-    
-    listings = search_service.search_listings_for_map(
-        filters=filters,
-        limit=limit
-    )
-    
-    response = MapResponse(
-        listings=listings,
-        count=len(listings)
+    response = search_service.build_map_response(filters, limit)
+    
+    return response_cache.store(
+        request,
+        cache_key,
+        serialize(response),
+        settings.MAP_CACHE_TTL,
+        last_modified=latest_timestamp(
+            listing.modification_timestamp for listing in response.listings
+        )
     )
-    
-    if redis_client:
-        try:
-            redis_client.setex(
-                cache_key,
-                60,
-                response.model_dump_json()
-            )
-        except Exception:
-            pass
-    
-    return response
 
 
 @router.get("/suggestions/cities")
@@ -201,7 +178,6 @@ async def get_property_type_suggestions(
     """
     Get available property sub-types for a given property type.
     """
-    search_service = SearchService(db)
-    subtypes = search_service.get_property_subtypes(property_type)
+    subtypes = reference_data.get(db).get_property_subtypes(property_type)
     
     return {"property_subtypes": subtypes}
\ No newline at end of file
@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.compression import SUPPORTED_ENCODINGS, compress_all, negotiate_encoding
+from app.core.database import get_redis_bytes
+from app.core.request_context import record_cache_lookup, timed
+from app.utils.http_cache import (
+    make_etag, http_date, is_conditional, is_not_modified,
+    not_modified_response, conditional_response
+)
+
+
+def cache_namespace(cache_key: str) -> str:
+    """Metrics namespace of a cache key: its first ``:``-separated segment."""
+    return cache_key.partition(":")[0]
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: Optional[str] = None
+    encoding: Optional[str] = None
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """
+    Redis-backed store for rendered JSON responses and their validators.
+
+    The raw body lives under ``cache_key``, each precompressed variant under
+    ``cache_key:<encoding>`` and the validators under ``cache_key:v``.
+    Conditional requests are answered from the small validator entry alone,
+    and cache hits return the stored variant without compressing again.
+    Expects a client created with ``decode_responses=False``.
+    """
+
+    VALIDATOR_SUFFIX = ":v"
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def get_validators(self, cache_key: str) -> Optional[Tuple[str, Optional[str]]]:
+        if not self.redis:
+            return None
+        try:
+            with timed("cache", "cache.get_validators", namespace=cache_namespace(cache_key)) as current:
+                raw = self.redis.get(cache_key + self.VALIDATOR_SUFFIX)
+                if current:
+                    current.set("cache.hit", raw is not None)
+        except Exception:
+            return None
+        return self._parse_validators(raw)
+
+    def get(self, cache_key: str, encoding: Optional[str] = None) -> Optional[CachedResponse]:
+        """
+        Fetch a cached response, preferring the variant for ``encoding``.
+        Bodies under the compression threshold only exist uncompressed.
+        """
+        if not self.redis:
+            return None
+        try:
+            with timed("cache", "cache.get", namespace=cache_namespace(cache_key)) as current:
+                body_key = f"{cache_key}:{encoding}" if encoding else cache_key
+                body, raw_validators = self.redis.mget(
+                    body_key, cache_key + self.VALIDATOR_SUFFIX
+                )
+                if body is None and encoding:
+                    encoding = None
+                    body = self.redis.get(cache_key)
+                if current:
+                    current.set("cache.hit", body is not None)
+        except Exception:
+            return None
+        if body is None:
+            return None
+
+        validators = self._parse_validators(raw_validators)
+        if validators:
+            etag, last_modified = validators
+        elif encoding is None:
+            etag, last_modified = make_etag(body), None
+        else:
+            return None
+        return CachedResponse(
+            body=body, etag=etag, last_modified=last_modified, encoding=encoding
+        )
+
+    def set(
+        self,
+        cache_key: str,
+        body: Union[str, bytes],
+        ttl: int,
+        last_modified: Optional[datetime] = None
+    ) -> CachedResponse:
+        cached = self._prepare(body, last_modified)
+        if self.redis:
+            try:
+                with timed("cache", "cache.set", namespace=cache_namespace(cache_key), bytes=len(cached.body)):
+                    pipe = self.redis.pipeline(transaction=False)
+                    self._queue_write(pipe, cache_key, cached, ttl)
+                    pipe.execute()
+            except Exception:
+                pass
+        return cached
+
+    def get_many(self, cache_keys: List[str]) -> Dict[str, bytes]:
+        """Fetch several raw bodies with a single MGET. Misses are omitted."""
+        if not self.redis or not cache_keys:
+            return {}
+        try:
+            with timed("cache", "cache.get_many", keys=len(cache_keys)) as current:
+                bodies = self.redis.mget(cache_keys)
+                if current:
+                    current.set("cache.hits", sum(1 for body in bodies if body is not None))
+        except Exception:
+            return {}
+        found = {
+            cache_key: body
+            for cache_key, body in zip(cache_keys, bodies)
+            if body is not None
+        }
+        for cache_key in cache_keys:
+            hit = cache_key in found
+            record_cache_lookup(cache_namespace(cache_key), int(hit), int(not hit))
+        return found
+
+    def set_many(
+        self,
+        entries: Dict[str, Tuple[Union[str, bytes], Optional[datetime]]],
+        ttl: int
+    ) -> Dict[str, CachedResponse]:
+        """Cache several rendered bodies in one pipeline round trip."""
+        cached_entries = {
+            cache_key: self._prepare(body, last_modified)
+            for cache_key, (body, last_modified) in entries.items()
+        }
+        if self.redis and cached_entries:
+            try:
+                with timed("cache", "cache.set_many", keys=len(cached_entries)):
+                    pipe = self.redis.pipeline(transaction=False)
+                    for cache_key, cached in cached_entries.items():
+                        self._queue_write(pipe, cache_key, cached, ttl)
+                    pipe.execute()
+            except Exception:
+                pass
+        return cached_entries
+
+    def delete_many(self, cache_keys: List[str]) -> None:
+        """Drop cached responses together with their encoded variants and validators."""
+        if not self.redis or not cache_keys:
+            return
+        redis_keys = []
+        for cache_key in cache_keys:
+            redis_keys.append(cache_key)
+            redis_keys.append(cache_key + self.VALIDATOR_SUFFIX)
+            redis_keys.extend(f"{cache_key}:{encoding}" for encoding in SUPPORTED_ENCODINGS)
+        try:
+            self.redis.delete(*redis_keys)
+        except Exception:
+            pass
+
+    def respond(self, request: Request, cache_key: str) -> Optional[Response]:
+        """
+        Serve a request from cache. Conditional requests are checked against
+        the validator entry first, so a 304 never reads the body.
+        """
+        if not self.redis:
+            return None
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if is_conditional(request):
+            validators = self.get_validators(cache_key)
+            if validators and is_not_modified(request, *validators):
+                record_cache_lookup(cache_namespace(cache_key), 1)
+                return not_modified_response(*validators, encoding=encoding)
+
+        cached = self.get(cache_key, encoding)
+        if not cached:
+            record_cache_lookup(cache_namespace(cache_key), 0, 1)
+            return None
+        record_cache_lookup(cache_namespace(cache_key), 1)
+        return conditional_response(
+            request, cached.body, cached.etag, cached.last_modified, cached.encoding
+        )
+
+    def store(
+        self,
+        request: Request,
+        cache_key: str,
+        body: Union[str, bytes],
+        ttl: int,
+        last_modified: Optional[datetime] = None
+    ) -> Response:
+        """Cache a freshly rendered body and build the response for it."""
+        cached = self.set(cache_key, body, ttl, last_modified)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding in cached.encoded:
+            return conditional_response(
+                request, cached.encoded[encoding], cached.etag, cached.last_modified, encoding
+            )
+        return conditional_response(request, cached.body, cached.etag, cached.last_modified)
+
+    @staticmethod
+    @timed("compress")
+    def _prepare(body: Union[str, bytes], last_modified: Optional[datetime]) -> CachedResponse:
+        body = body.encode() if isinstance(body, str) else body
+        return CachedResponse(
+            body=body,
+            etag=make_etag(body),
+            last_modified=http_date(last_modified) if last_modified else None,
+            encoded=compress_all(body)
+        )
+
+    def _queue_write(self, pipe, cache_key: str, cached: CachedResponse, ttl: int) -> None:
+        pipe.setex(cache_key, ttl, cached.body)
+        for encoding, encoded_body in cached.encoded.items():
+            pipe.setex(f"{cache_key}:{encoding}", ttl, encoded_body)
+        pipe.setex(
+            cache_key + self.VALIDATOR_SUFFIX,
+            ttl,
+            f"{cached.etag}|{cached.last_modified or ''}"
+        )
+
+    @staticmethod
+    def _parse_validators(raw) -> Optional[Tuple[str, Optional[str]]]:
+        if not raw:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        etag, _, last_modified = raw.partition("|")
+        return etag, last_modified or None
+
+
+def get_response_cache() -> ResponseCache:
+    """Response cache dependency."""
+    return ResponseCache(get_redis_bytes())
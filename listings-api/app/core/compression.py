@@ -0,0 +1,160 @@
+"""Response compression with Accept-Encoding negotiation."""
+from typing import Dict, List, Optional
+import gzip
+
+from app.core.config import settings
+from app.utils.http_cache import etag_for_encoding
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+# Server preference order when the client accepts several encodings equally
+SUPPORTED_ENCODINGS: List[str] = [
+    encoding for encoding, available in (
+        ("br", brotli is not None),
+        ("zstd", zstandard is not None),
+        ("gzip", True),
+    )
+    if available
+]
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compress_all(body: bytes) -> Dict[str, bytes]:
+    """Compress a body with every supported encoding, if it is worth it."""
+    if len(body) < settings.COMPRESSION_MIN_SIZE:
+        return {}
+    return {encoding: compress(body, encoding) for encoding in SUPPORTED_ENCODINGS}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported encoding for an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON/text responses on the fly. Responses that already carry a
+    Content-Encoding (e.g. precompressed cache hits) pass through untouched,
+    as do streamed bodies and anything under the size threshold.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding)
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            pending, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body") or not self._should_compress(pending, body):
+                await send(pending)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers = []
+            vary = b"Accept-Encoding"
+            for name, value in pending["headers"]:
+                if name == b"content-length":
+                    continue
+                if name == b"etag":
+                    value = _encoded_etag(value, encoding)
+                elif name == b"vary":
+                    if b"accept-encoding" not in value.lower():
+                        vary = value + b", Accept-Encoding"
+                    else:
+                        vary = value
+                    continue
+                headers.append((name, value))
+            headers.extend([
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary),
+            ])
+            await send({**pending, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _should_compress(start_message, body: bytes) -> bool:
+        if len(body) < settings.COMPRESSION_MIN_SIZE:
+            return False
+        content_type = b""
+        for name, value in start_message["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+
+def _encoded_etag(etag: bytes, encoding: str) -> bytes:
+    return etag_for_encoding(etag.decode("latin-1"), encoding).encode("latin-1")
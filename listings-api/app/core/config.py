@@ -13,6 +13,9 @@ class Settings:
     DATABASE_USER: str = os.getenv("DATABASE_USER", "postgres")
     DATABASE_PASSWORD: str = os.getenv("DATABASE_PASSWORD", "")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "postgres")
+    # Connections per worker process: kept open, and opened on demand beyond that
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
     
     # Redis settings
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
@@ -27,10 +30,102 @@ class Settings:
     # Pagination Settings
     PAGE_SIZE_DEFAULT: int = 20
     PAGE_SIZE_MAX: int = 100
+    BATCH_MAX_LISTING_KEYS: int = int(os.getenv("BATCH_MAX_LISTING_KEYS", "50"))
+    BATCH_MAX_OFFICE_KEYS: int = int(os.getenv("BATCH_MAX_OFFICE_KEYS", "50"))
     
     # Cache Settings (in seconds)
     CACHE_TTL_SECONDS: int = 300
     SEARCH_CACHE_TTL: int = 180
+    MAP_CACHE_TTL: int = 60
+    
+    # Featured feeds pre-rendered after each ingestion run
+    FEATURED_FEED_TTL: int = int(os.getenv("FEATURED_FEED_TTL", "86400"))
+    
+    # Popular request capture and post-ingestion cache warming
+    QUERY_LOG_ENABLED: bool = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+    QUERY_LOG_FLUSH_SECONDS: int = 5
+    QUERY_LOG_MAX_ENTRIES: int = 5000
+    CACHE_WARM_TOP_K: int = int(os.getenv("CACHE_WARM_TOP_K", "200"))
+    CACHE_WARM_CONCURRENCY: int = int(os.getenv("CACHE_WARM_CONCURRENCY", "2"))
+    
+    # Prometheus metrics on /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    
+    # SQL statement accounting: slow-query log (optionally with EXPLAIN) and N+1 detection
+    SQL_INSTRUMENTATION: bool = os.getenv("SQL_INSTRUMENTATION", "true").lower() == "true"
+    SLOW_QUERY_MS: int = int(os.getenv("SLOW_QUERY_MS", "250"))
+    SLOW_QUERY_EXPLAIN: bool = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+    
+    # Per-phase request timing: Server-Timing header ("off", "on", or "header" = only when
+    # the request sends X-Server-Timing) and a structured log line for slow requests (0 = off)
+    SERVER_TIMING: str = os.getenv("SERVER_TIMING", "off").lower()
+    SLOW_REQUEST_LOG_MS: int = int(os.getenv("SLOW_REQUEST_LOG_MS", "0"))
+    
+    # Request tracing: head sampling rate, slow requests always kept (0 = off),
+    # exported as rotating JSONL ("jsonl", {pid} in TRACE_FILE) or OTLP/JSON over HTTP ("otlp")
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    TRACE_SLOW_MS: int = int(os.getenv("TRACE_SLOW_MS", "1000"))
+    TRACE_EXPORT: str = os.getenv("TRACE_EXPORT", "jsonl").lower()
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "traces-{pid}.jsonl")
+    TRACE_FILE_MAX_BYTES: int = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+    TRACE_FILE_BACKUPS: int = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    
+    # tracemalloc from startup (otherwise started from /admin/memory/tracing), traceback depth,
+    # and the share of requests whose peak allocation is sampled while it runs
+    MEMORY_TRACING: bool = os.getenv("MEMORY_TRACING", "false").lower() == "true"
+    MEMORY_TRACE_FRAMES: int = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+    MEMORY_REQUEST_SAMPLE_RATE: float = float(os.getenv("MEMORY_REQUEST_SAMPLE_RATE", "0.0"))
+    
+    # Event-loop lag sampling period and the blocking time reported as a stall, with its stack
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL_MS: int = int(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+    LOOP_STALL_MS: int = int(os.getenv("LOOP_STALL_MS", "200"))
+    
+    # Startup warm-up before /readyz passes: pool connections opened and hot statements executed once
+    WARMUP_POOL_CONNECTIONS: int = int(os.getenv("WARMUP_POOL_CONNECTIONS", "5"))
+    WARMUP_STATEMENTS: bool = os.getenv("WARMUP_STATEMENTS", "true").lower() == "true"
+    WARMUP_RETRY_SECONDS: int = int(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+    
+    # Warm-restart snapshots of the in-process indexes; unset SNAPSHOT_DIR disables them
+    SNAPSHOT_DIR: Optional[str] = os.getenv("SNAPSHOT_DIR")
+    SNAPSHOT_INTERVAL_SECONDS: int = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300"))
+    SNAPSHOT_MAX_AGE_SECONDS: int = int(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "86400"))
+    
+    # Listing routing index shared by all workers through one memory-mapped file; unset keeps it per worker
+    LISTING_INDEX_PATH: Optional[str] = os.getenv("LISTING_INDEX_PATH")
+    
+    # Admin endpoints (/admin, profiling) require X-Admin-Token; unset disables them
+    ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN")
+    
+    # Benchmarking: per-request stats headers and workload capture for replay
+    REQUEST_STATS_HEADERS: bool = os.getenv("REQUEST_STATS_HEADERS", "false").lower() == "true"
+    WORKLOAD_CAPTURE_PATH: Optional[str] = os.getenv("WORKLOAD_CAPTURE_PATH")
+    WORKLOAD_CAPTURE_SAMPLE_RATE: float = float(os.getenv("WORKLOAD_CAPTURE_SAMPLE_RATE", "1.0"))
+    
+    # Render listing detail JSON in Postgres instead of via the ORM + Pydantic
+    DETAIL_SQL_RENDERING: bool = os.getenv("DETAIL_SQL_RENDERING", "true").lower() == "true"
+    
+    # How often in-process caches re-check replication_logs for new ingestion runs
+    REPLICATION_POLL_SECONDS: int = int(os.getenv("REPLICATION_POLL_SECONDS", "15"))
+    
+    # Shared background jobs run only on the worker holding the Redis leader lease; false keeps this worker out of the election
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_TICK_SECONDS: int = int(os.getenv("SCHEDULER_TICK_SECONDS", "5"))
+    SCHEDULER_LEASE_SECONDS: int = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+    
+    # Routing index Settings
+    ROUTING_INDEX_REFRESH_SECONDS: int = int(os.getenv("ROUTING_INDEX_REFRESH_SECONDS", "30"))
+    INDEX_CATCHUP_OVERLAP_SECONDS: int = 300
+    MEDIA_FILTER_ERROR_RATE: float = 0.01
+    
+    # Compression Settings
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 6
     
     # CORS Settings
     @property
@@ -39,6 +134,17 @@ class Settings:
         origins_str = "*"
         return [origin.strip() for origin in origins_str.split(",")]
     
+    @property
+    def FEATURED_FEED_LIMITS(self) -> List[int]:
+        limits_str = os.getenv("FEATURED_FEED_LIMITS", "12")
+        return [int(limit) for limit in limits_str.split(",") if limit.strip()]
+    
+    @property
+    def FEATURED_FEED_TRANSACTION_TYPES(self) -> List[Optional[str]]:
+        # An empty entry stands for "no transaction type filter"
+        types_str = os.getenv("FEATURED_FEED_TRANSACTION_TYPES", ",For Sale,For Lease")
+        return [transaction_type.strip() or None for transaction_type in types_str.split(",")]
+    
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
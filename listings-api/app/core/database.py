@@ -2,27 +2,55 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
+import logging
 import redis
 from app.core.config import settings
+from app.core.metrics import MeteredQueuePool, MeteredRedis, install_pool_metrics
+from app.core.request_context import install_query_counter
 
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=300,
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    **({"poolclass": MeteredQueuePool} if settings.METRICS_ENABLED else {})
 )
 
+install_query_counter(engine)
+if settings.METRICS_ENABLED:
+    install_pool_metrics(engine)
+
+redis_class = MeteredRedis if settings.METRICS_ENABLED else redis.Redis
+
+logger = logging.getLogger(__name__)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-try:
-    redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.ping()
-    print("Redis connection established")
-except Exception as e:
-    print(f"Redis connection failed: {e}")
-    redis_client = None
+# Clients connect lazily; check_redis() verifies the server at startup
+redis_client = redis_class.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Separate client for binary payloads such as precompressed responses
+redis_bytes_client = redis_class.from_url(settings.REDIS_URL)
+
+def check_redis() -> bool:
+    """
+    Ping Redis once at startup. If it is unreachable the API runs without
+    Redis for the life of the process, as if it were not configured.
+    """
+    global redis_client, redis_bytes_client
+    if redis_client is None:
+        return False
+    try:
+        redis_client.ping()
+        logger.info("Redis connection established")
+        return True
+    except Exception as e:
+        logger.error(f"Redis connection failed: {e}")
+        redis_client = None
+        redis_bytes_client = None
+        return False
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -40,4 +68,11 @@ def get_redis():
     Redis dependency for caching.
     Returns None if Redis is not available.
     """
-    return redis_client
\ No newline at end of file
+    return redis_client
+
+def get_redis_bytes():
+    """
+    Redis dependency for binary payloads (no response decoding).
+    Returns None if Redis is not available.
+    """
+    return redis_bytes_client
@@ -0,0 +1,161 @@
+"""
+Event-loop lag and threadpool saturation.
+
+A task on the event loop sleeps for ``interval`` and measures how late it
+wakes up: that lateness is the scheduling lag every request on the worker
+sees. A watchdog thread watches the task's heartbeat; when the loop has not
+come back for ``stall_ms`` it captures the loop thread's stack, so blocking
+calls (sync DB or Redis I/O on the loop, heavy serialization) are reported
+with the code that caused them. Each tick also reads the anyio default
+thread limiter, which bounds the threadpool running sync dependencies and
+``run_in_threadpool`` work: busy threads and tasks queued for one.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import sys
+import threading
+import time
+
+import anyio.to_thread
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.profiling import frame_stack
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: int, stall_ms: int, keep_stalls: int = 20):
+        self.interval = interval_ms / 1000
+        self.stall = stall_ms / 1000
+        self.keep_stalls = keep_stalls
+        # (monotonic time, lag seconds) of recent ticks, about a minute's worth
+        self._lags: Deque[Tuple[float, float]] = deque(maxlen=max(1, int(60 / self.interval)))
+        # stack -> [stalls, total seconds, worst seconds, last seen]
+        self._stalls: Dict[Tuple[str, ...], List[float]] = {}
+        self._stall_count = 0
+        self._pending_stack: Optional[Tuple[str, ...]] = None
+        self._heartbeat = time.monotonic()
+        self._threadpool: Dict[str, int] = {}
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start on the running loop; call from a coroutine."""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self._lags.append((now, lag))
+            if lag >= self.stall:
+                self._record_stall(lag)
+            self._sample_threadpool()
+            if settings.METRICS_ENABLED:
+                metrics.EVENT_LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        """Capture the loop thread's stack once per stall while the loop is blocked."""
+        captured_for = None
+        while self.running:
+            time.sleep(max(0.005, self.stall / 4))
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.stall + self.interval or captured_for == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                with self._lock:
+                    self._pending_stack = frame_stack(frame)
+                captured_for = heartbeat
+
+    def _record_stall(self, lag: float) -> None:
+        with self._lock:
+            stack, self._pending_stack = self._pending_stack, None
+            self._stall_count += 1
+            # Stalls shorter than a watchdog period can end before a stack is captured
+            stack = stack or ("(not captured)",)
+            entry = self._stalls.get(stack)
+            if entry is None:
+                self._stalls[stack] = entry = [0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += lag
+            entry[2] = max(entry[2], lag)
+            entry[3] = time.time()
+            if len(self._stalls) > self.keep_stalls:
+                # Forget the stack with the least total stall time
+                del self._stalls[min(self._stalls, key=lambda key: self._stalls[key][1])]
+        if settings.METRICS_ENABLED:
+            metrics.EVENT_LOOP_STALLS.inc()
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms in {stack[-1]}")
+
+    def _sample_threadpool(self) -> None:
+        statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+        self._threadpool = {
+            "capacity": int(statistics.total_tokens),
+            "busy": statistics.borrowed_tokens,
+            "waiting": statistics.tasks_waiting,
+        }
+        if settings.METRICS_ENABLED:
+            metrics.THREADPOOL_CAPACITY.set(statistics.total_tokens)
+            metrics.THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+            metrics.THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+    def worst_stalls(self, limit: int = 5) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._stalls.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [
+            {
+                "stalls": int(count),
+                "total_ms": round(total * 1000, 1),
+                "worst_ms": round(worst * 1000, 1),
+                "last_seen": last_seen,
+                "stack": list(stack[-15:]),
+            }
+            for stack, (count, total, worst, last_seen) in items
+        ]
+
+    def status(self) -> Dict[str, Any]:
+        """Loop lag over the last minute, stall count and threadpool use, with a saturation verdict."""
+        lags = sorted(lag for _, lag in self._lags)
+        threadpool = dict(self._threadpool)
+        if threadpool.get("capacity"):
+            threadpool["utilization"] = round(threadpool["busy"] / threadpool["capacity"], 3)
+        lag_p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+        return {
+            "monitoring": self.running,
+            "saturated": lag_p99 >= self.stall or threadpool.get("waiting", 0) > 0,
+            "event_loop": {
+                "lag_last_ms": round(self._lags[-1][1] * 1000, 2) if self._lags else None,
+                "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2) if lags else None,
+                "lag_p99_ms": round(lag_p99 * 1000, 2),
+                "lag_max_ms": round(lags[-1] * 1000, 2) if lags else None,
+                "stalls": self._stall_count,
+                "stall_threshold_ms": round(self.stall * 1000),
+            },
+            "threadpool": threadpool,
+        }
+
+
+loop_monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL_MS, settings.LOOP_STALL_MS)
@@ -0,0 +1,278 @@
+"""
+Memory profiling: tracemalloc snapshots and diffs, per-request allocation
+peaks and sizes of the in-process caches.
+
+tracemalloc is off unless MEMORY_TRACING is set or it is started from
+/admin/memory/tracing; while it is off, snapshots and request sampling are
+unavailable and cost nothing. Request peaks come from tracemalloc's
+process-wide peak, so a sampled request that overlaps other requests is
+charged for their allocations too; sample on a quiet worker for exact
+numbers.
+"""
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import gc
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+from app.core import metrics
+from app.core.config import settings
+
+# cache name -> (entries, approximate bytes)
+CacheSizes = Dict[str, Tuple[int, int]]
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def deep_size(value: Any, seen: Optional[set] = None, depth: int = 4) -> int:
+    """getsizeof of ``value`` and, down to ``depth`` levels, of what it contains."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, Mapping):
+        size += sum(deep_size(k, seen, depth - 1) + deep_size(v, seen, depth - 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, depth - 1) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += deep_size(vars(value), seen, depth - 1)
+    elif hasattr(value, "__slots__"):
+        size += sum(deep_size(getattr(value, name, None), seen, depth - 1) for name in value.__slots__)
+    return size
+
+
+def approximate_size(container: Any, sample: int = 200) -> int:
+    """
+    Size of a dict, list or set extrapolated from a sample of its items, so
+    large indexes can be measured without walking every entry.
+    """
+    count = len(container)
+    items: Iterable[Any] = container.items() if isinstance(container, dict) else container
+    sampled = list(itertools.islice(items, sample))
+    if not sampled:
+        return sys.getsizeof(container)
+    if isinstance(container, dict):
+        per_item = sum(deep_size(key) + deep_size(value) for key, value in sampled) / len(sampled)
+    else:
+        per_item = sum(deep_size(item) for item in sampled) / len(sampled)
+    return int(sys.getsizeof(container) + per_item * count)
+
+
+def cache_sizes() -> CacheSizes:
+    """
+    Entries and approximate bytes of every in-process cache and index. Each
+    source measures under its own lock, so this can wait for a refresh.
+    """
+    from app.core.profiling import profile_store
+    from app.core.sql_stats import statement_stats
+    from app.services.office_stats import office_stats
+    from app.services.reference_data import reference_data
+    from app.services.routing import listing_router
+
+    sizes: CacheSizes = {}
+    for source in (listing_router, office_stats, reference_data, statement_stats, profile_store):
+        sizes.update(source.cache_sizes())
+    return sizes
+
+
+# (time measured, sizes) from the last update_cache_gauges
+_last_cache_sizes: Tuple[Optional[float], CacheSizes] = (None, {})
+
+
+def update_cache_gauges() -> CacheSizes:
+    """Measure every cache and set the gauges; run by the index job, not per scrape."""
+    global _last_cache_sizes
+    sizes = cache_sizes()
+    for name, (entries, size) in sizes.items():
+        metrics.INPROCESS_CACHE_ENTRIES.labels(name).set(entries)
+        metrics.INPROCESS_CACHE_BYTES.labels(name).set(size)
+    _last_cache_sizes = (time.time(), sizes)
+    return sizes
+
+
+def last_cache_sizes() -> Tuple[Optional[float], CacheSizes]:
+    """When the caches were last measured (None if never) and their sizes then."""
+    return _last_cache_sizes
+
+
+def process_memory() -> Dict[str, Any]:
+    """RSS (Linux), tracemalloc totals and GC counters of this worker."""
+    usage: Dict[str, Any] = {"pid": os.getpid(), "gc_counts": gc.get_count(), "gc_objects": len(gc.get_objects())}
+    try:
+        with open("/proc/self/statm") as statm:
+            usage["rss_bytes"] = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    usage["tracemalloc"] = tracemalloc.is_tracing()
+    if usage["tracemalloc"]:
+        current, peak = tracemalloc.get_traced_memory()
+        usage["traced_bytes"] = current
+        usage["traced_peak_bytes"] = peak
+        usage["traceback_frames"] = tracemalloc.get_traceback_limit()
+    return usage
+
+
+def _statistic(stat, group_by: str) -> Dict[str, Any]:
+    entry = {
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+        "location": _location(stat.traceback[-1]),
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    if group_by == "traceback":
+        entry["traceback"] = [_location(frame) for frame in stat.traceback]
+    return entry
+
+
+def _location(frame) -> str:
+    filename = frame.filename
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep):
+        position = filename.find(marker)
+        if position >= 0:
+            filename = filename[position + len(marker):]
+            break
+    return f"{filename}:{frame.lineno}"
+
+
+class SnapshotStore:
+    """The last few tracemalloc snapshots, by id; snapshots are large, so only ``keep`` are held."""
+
+    def __init__(self, keep: int = 4):
+        self.keep = keep
+        self._snapshots: "OrderedDict[int, Tuple[str, float, tracemalloc.Snapshot]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def take(self, label: str = "") -> int:
+        """Snapshot the traced allocations; tracemalloc must be tracing."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = next(self._ids)
+            self._snapshots[snapshot_id] = (label, time.time(), snapshot)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def get(self, snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+        entry = self._snapshots.get(snapshot_id)
+        return entry[2] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": snapshot_id, "label": label, "taken_at": taken_at, "traces": len(snapshot.traces)}
+            for snapshot_id, (label, taken_at, snapshot) in self._snapshots.items()
+        ]
+
+    def top(self, snapshot_id: int, group_by: str = "lineno", limit: int = 25) -> Optional[Dict[str, Any]]:
+        snapshot = self.get(snapshot_id)
+        if snapshot is None:
+            return None
+        stats = snapshot.statistics(group_by)
+        return {
+            "id": snapshot_id,
+            "total_kb": round(sum(stat.size for stat in stats) / 1024, 1),
+            "top": [_statistic(stat, group_by) for stat in stats[:limit]],
+        }
+
+    def diff(self, base_id: int, current_id: int, group_by: str = "lineno", limit: int = 25) -> Optional[Dict[str, Any]]:
+        """Allocations that grew the most between two snapshots."""
+        base, current = self.get(base_id), self.get(current_id)
+        if base is None or current is None:
+            return None
+        stats = current.compare_to(base, group_by)
+        return {
+            "base": base_id,
+            "current": current_id,
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": [_statistic(stat, group_by) for stat in stats[:limit]],
+        }
+
+
+class AllocationSampler:
+    """
+    Peak traced allocation during sampled requests, per route: tracemalloc's
+    peak is reset when the request starts and read when it finishes.
+    """
+
+    def __init__(self, sample_rate: float):
+        self.sample_rate = sample_rate
+        # route -> [requests, total peak bytes, max peak bytes, max retained bytes]
+        self._routes: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> Optional[int]:
+        """Baseline traced bytes when this request is sampled, else None."""
+        if not self.sample_rate or not tracemalloc.is_tracing() or random.random() >= self.sample_rate:
+            return None
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return current
+
+    def finish(self, scope, baseline: int) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        allocated = max(0, peak - baseline)
+        retained = current - baseline
+        route = metrics.route_template(scope)
+        if settings.METRICS_ENABLED:
+            metrics.REQUEST_PEAK_ALLOCATION.labels(route).observe(allocated)
+        with self._lock:
+            entry = self._routes.setdefault(route, [0, 0, 0, 0])
+            entry[0] += 1
+            entry[1] += allocated
+            entry[2] = max(entry[2], allocated)
+            entry[3] = max(entry[3], retained)
+
+    def routes(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._routes.items(), key=lambda item: item[1][2], reverse=True)
+        return [
+            {
+                "route": route,
+                "requests": count,
+                "mean_peak_kb": round(total / count / 1024, 1),
+                "max_peak_kb": round(largest / 1024, 1),
+                "max_retained_kb": round(retained / 1024, 1),
+            }
+            for route, (count, total, largest, retained) in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+def start_tracing(frames: int) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing() -> None:
+    snapshots.clear()
+    tracemalloc.stop()
+
+
+snapshots = SnapshotStore()
+allocation_sampler = AllocationSampler(settings.MEMORY_REQUEST_SAMPLE_RATE)
@@ -0,0 +1,220 @@
+"""
+Prometheus metrics.
+
+Request metrics are observed once per request by RequestStatsMiddleware from
+the stats it already keeps; pool gauges are updated on checkout/checkin and
+Redis latency is timed around each command, so nothing is computed at scrape
+time. Under several worker processes set PROMETHEUS_MULTIPROC_DIR (a directory
+cleared at deploy) and every worker's samples are aggregated on scrape.
+"""
+from typing import Optional, Tuple
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from redis import Redis
+from redis.client import Pipeline
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond pool_size (negative while the pool is still filling)",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to obtain a pooled connection, including waiting for a free one and opening new ones",
+    buckets=FAST_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip latency by command (PIPELINE for pipelined batches)",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by namespace and result",
+    ["namespace", "result"],
+)
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_MS by route template",
+    ["route"],
+)
+DB_N_PLUS_ONE = Counter(
+    "db_n_plus_one_total",
+    "Statements repeated N_PLUS_ONE_THRESHOLD or more times within one request, by route template",
+    ["route"],
+)
+INPROCESS_CACHE_ENTRIES = Gauge(
+    "inprocess_cache_entries",
+    "Entries in each in-process cache or index, as of this worker's last index refresh",
+    ["cache"],
+    multiprocess_mode="all",
+)
+INPROCESS_CACHE_BYTES = Gauge(
+    "inprocess_cache_bytes",
+    "Approximate memory held by each in-process cache or index (sampled estimate)",
+    ["cache"],
+    multiprocess_mode="all",
+)
+REQUEST_PEAK_ALLOCATION = Histogram(
+    "http_request_peak_allocation_bytes",
+    "Peak traced allocation during sampled requests (MEMORY_REQUEST_SAMPLE_RATE, needs tracemalloc)",
+    ["route"],
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6),
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer scheduled every LOOP_MONITOR_INTERVAL_MS",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total",
+    "Times the event loop was blocked for LOOP_STALL_MS or longer",
+)
+THREADPOOL_CAPACITY = Gauge(
+    "threadpool_capacity_threads",
+    "Size of the anyio default threadpool (sync dependencies and run_in_threadpool)",
+    multiprocess_mode="liveall",
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads",
+    "anyio threadpool threads running work",
+    multiprocess_mode="liveall",
+)
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting_tasks",
+    "Tasks queued for a free anyio threadpool thread",
+    multiprocess_mode="liveall",
+)
+SCHEDULER_LEADER = Gauge(
+    "scheduler_leader",
+    "1 on the worker holding the scheduler leader lease",
+    multiprocess_mode="liveall",
+)
+SCHEDULER_JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds",
+    "Run time of scheduled background jobs",
+    ["job", "status"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+SCHEDULER_JOB_LAST_SUCCESS = Gauge(
+    "scheduler_job_last_success_timestamp_seconds",
+    "Unix time the job last finished without error",
+    ["job"],
+    multiprocess_mode="max",
+)
+
+# Label used for requests that matched no route, to keep cardinality bounded
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def request_started() -> None:
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def request_finished(scope, status: int, duration: float, db_queries: int) -> None:
+    route = route_template(scope)
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(duration)
+    DB_QUERIES_PER_REQUEST.labels(route).observe(db_queries)
+
+
+def record_cache_result(namespace: str, hits: int, misses: int) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(namespace, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(namespace, "miss").inc(misses)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout took to obtain a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def install_pool_metrics(engine: Engine) -> None:
+    """Keep the pool gauges current as connections move in and out of the pool."""
+    pool = engine.pool
+
+    def update(*args):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(pool.overflow())
+
+    event.listen(engine, "checkout", update)
+    event.listen(engine, "checkin", update)
+
+
+class MeteredPipeline(Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - started)
+
+
+class MeteredRedis(Redis):
+    """Redis client that times every command round trip."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return MeteredPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition body and content type for a scrape."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,269 @@
+"""
+On-demand CPU profiling for live workers.
+
+Two modes, both producing flamegraph stacks (collapsed text or speedscope
+JSON):
+
+- Single request: send ``X-Profile: 1`` with a valid ``X-Admin-Token``. The
+  request runs under a deterministic profiler that records every Python and C
+  call of that request's task only (concurrent requests on the same event loop
+  are filtered out; time the request spends awaiting shows as ``(await)``).
+  The response carries ``X-Profile-Id``; fetch the result from
+  ``/admin/profiles/{id}``.
+- Whole worker: ``/admin/profile?seconds=N`` samples the stacks of every
+  thread in the process for N seconds.
+
+Nothing is installed unless ADMIN_TOKEN is set and a profile is asked for.
+"""
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+
+from app.core.config import settings
+from app.core.memory import CacheSizes, approximate_size
+
+Stacks = Dict[Tuple[str, ...], float]
+
+# Leaf functions of threads that are waiting for work rather than running
+IDLE_FUNCTIONS = frozenset({"wait", "select", "poll", "accept", "_wait_for_tstate_lock"})
+
+AWAIT = "(await)"
+
+_STDLIB = os.path.dirname(os.__file__) + os.sep
+
+
+def admin_authorized(token: Optional[str]) -> bool:
+    return bool(settings.ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+@lru_cache(maxsize=8192)
+def _code_label(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages" + os.sep, _STDLIB, os.getcwd() + os.sep):
+        position = filename.find(marker)
+        if position >= 0:
+            filename = filename[position + len(marker):]
+            break
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def _c_label(function) -> str:
+    name = getattr(function, "__qualname__", None) or repr(function)
+    module = getattr(function, "__module__", None)
+    return f"{module}.{name}" if module else name
+
+
+def frame_stack(frame, stop=None) -> Tuple[str, ...]:
+    """Labels from the outermost frame (or the one above ``stop``) down to ``frame``."""
+    labels = []
+    while frame is not None and frame is not stop:
+        labels.append(_code_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+_profiled: ContextVar[Optional["RequestProfiler"]] = ContextVar("profiled_request", default=None)
+
+
+class RequestProfiler:
+    """
+    Deterministic profiler for one request's task, built on sys.setprofile.
+    Time between two profiler events is charged to the stack that was current
+    at the first one, measured from the middleware frame that started it.
+    """
+
+    def __init__(self, profile_id: str, scope):
+        self.id = profile_id
+        self.name = f"{scope['method']} {scope['path']}"
+        self.stacks: Stacks = defaultdict(float)
+        self._keys: Dict[Any, Tuple[str, ...]] = {}
+        self._current: Tuple[str, ...] = ()
+        self._last = 0
+        self._anchor = None
+        self._token = None
+
+    def start(self) -> None:
+        self._anchor = sys._getframe(1)
+        self._token = _profiled.set(self)
+        self._last = time.perf_counter_ns()
+        sys.setprofile(self._event)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+        self._charge(time.perf_counter_ns())
+        _profiled.reset(self._token)
+        self._keys.clear()
+        self._anchor = None
+
+    def _charge(self, now: int) -> None:
+        self.stacks[self._current or (AWAIT,)] += (now - self._last) / 1e6
+        self._last = now
+
+    def _key(self, frame) -> Tuple[str, ...]:
+        """Stack of ``frame`` below the anchor; () for frames outside the request's call chain."""
+        if frame is None or frame is self._anchor:
+            return ()
+        key = self._keys.get(frame)
+        if key is None:
+            parent = self._keys.get(frame.f_back)
+            if frame.f_back is self._anchor:
+                key = (_code_label(frame.f_code),)
+            elif parent is not None:
+                key = parent + (_code_label(frame.f_code),) if parent else ()
+            else:
+                key = frame_stack(frame, self._anchor) if self._reaches_anchor(frame) else ()
+            self._keys[frame] = key
+        return key
+
+    def _reaches_anchor(self, frame) -> bool:
+        while frame is not None:
+            if frame is self._anchor:
+                return True
+            frame = frame.f_back
+        return False
+
+    def _event(self, frame, event, arg) -> None:
+        if _profiled.get() is not self:
+            return
+        self._charge(time.perf_counter_ns())
+        if event == "call":
+            self._current = self._key(frame)
+        elif event == "return":
+            self._current = self._key(frame.f_back)
+        elif event == "c_call":
+            caller = self._key(frame)
+            self._current = caller + (_c_label(arg),) if caller else ()
+        else:  # c_return, c_exception
+            self._current = self._key(frame)
+
+
+class StackSampler:
+    """Samples the stacks of every other thread every ``interval`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval: float, include_idle: bool = False) -> Optional[Stacks]:
+        """Blocks for ``seconds``; returns None when another sampling run is in progress."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            own = threading.get_ident()
+            stacks: Stacks = defaultdict(float)
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own:
+                        continue
+                    if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                        continue
+                    stack = (names.get(thread_id, str(thread_id)),) + frame_stack(frame)
+                    stacks[stack] += interval * 1000
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+
+class ProfileStore:
+    """The most recent request profiles, by id."""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._profiles: "OrderedDict[str, RequestProfiler]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._active: Optional[RequestProfiler] = None
+
+    def start(self, scope) -> Optional[RequestProfiler]:
+        """Profile the calling request; at most one request per process at a time."""
+        if self._active is not None:
+            return None
+        profiler = RequestProfiler(f"{os.getpid()}-{next(self._ids)}", scope)
+        self._active = profiler
+        return profiler
+
+    def finish(self, profiler: RequestProfiler) -> None:
+        self._active = None
+        self._profiles[profiler.id] = profiler
+        while len(self._profiles) > self.keep:
+            self._profiles.popitem(last=False)
+
+    def cache_sizes(self) -> CacheSizes:
+        profiles = list(self._profiles.values())
+        return {
+            "request_profiles": (len(profiles), sum(approximate_size(profiler.stacks) for profiler in profiles)),
+        }
+
+    def get(self, profile_id: str) -> Optional[RequestProfiler]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": profiler.id, "name": profiler.name, "total_ms": round(sum(profiler.stacks.values()), 3)}
+            for profiler in reversed(self._profiles.values())
+        ]
+
+
+def requested(scope) -> bool:
+    """Whether the request asks to be profiled (and is allowed to)."""
+    if not settings.ADMIN_TOKEN:
+        return False
+    headers = dict(scope.get("headers", ()))
+    if headers.get(b"x-profile") not in (b"1", b"true"):
+        return False
+    token = headers.get(b"x-admin-token")
+    return admin_authorized(token.decode("latin-1") if token else None)
+
+
+def collapsed(stacks: Stacks) -> str:
+    """Brendan Gregg's collapsed format (``frame;frame;frame value``), values in microseconds."""
+    lines = []
+    for stack, ms in sorted(stacks.items()):
+        value = int(round(ms * 1000))
+        if value:
+            lines.append(";".join(label.replace(";", ",") for label in stack) + f" {value}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope(stacks: Stacks, name: str) -> Dict[str, Any]:
+    """A speedscope file with one sampled profile, weights in milliseconds."""
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, ms in stacks.items():
+        sample = []
+        for label in stack:
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(round(ms, 6))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 6),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": settings.APP_NAME,
+    }
+
+
+profile_store = ProfileStore()
+stack_sampler = StackSampler()
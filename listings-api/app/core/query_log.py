@@ -0,0 +1,104 @@
+from typing import Any, Dict, List, Tuple
+from collections import Counter
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.core.database import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(route: str, params: Dict[str, Any]) -> str:
+    """
+    Normalized description of a cacheable request: the route name followed by
+    its parameters as canonical JSON, e.g. ``search?{"filters":{},"limit":20,...}``.
+    Equal requests give equal fingerprints in every worker process.
+    """
+    return route + "?" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def parse_fingerprint(fingerprint: str) -> Tuple[str, Dict[str, Any]]:
+    route, _, params = fingerprint.partition("?")
+    return route, json.loads(params)
+
+
+def fingerprint_cache_key(fingerprint: str) -> str:
+    """Stable response cache key for a fingerprint."""
+    route = fingerprint.partition("?")[0]
+    return f"{route}:{hashlib.sha1(fingerprint.encode()).hexdigest()}"
+
+
+class QueryLog:
+    """
+    Request popularity in a Redis sorted set (fingerprint -> hit count).
+
+    Hits are counted in process and flushed in one pipeline at most every
+    ``flush_seconds``, so recording costs no Redis round trip on most
+    requests. The set is trimmed to the ``max_entries`` most popular
+    fingerprints, and ``decay`` ages old counts so popularity follows
+    current traffic.
+    """
+
+    ZSET_KEY = "query_log:fingerprints"
+
+    def __init__(self, enabled: bool, flush_seconds: int, max_entries: int):
+        self.enabled = enabled
+        self.flush_seconds = flush_seconds
+        self.max_entries = max_entries
+        self._pending: Counter = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[fingerprint] += 1
+        if time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        redis_client = get_redis()
+        if not pending or not redis_client:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for fingerprint, hits in pending.items():
+                pipe.zincrby(self.ZSET_KEY, hits, fingerprint)
+            pipe.zremrangebyrank(self.ZSET_KEY, 0, -(self.max_entries + 1))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Query log flush failed: {e}")
+
+    def top(self, count: int) -> List[Tuple[str, float]]:
+        """Most requested fingerprints with their (decayed) hit counts."""
+        redis_client = get_redis()
+        if not redis_client:
+            return []
+        try:
+            return redis_client.zrevrange(self.ZSET_KEY, 0, count - 1, withscores=True)
+        except Exception:
+            return []
+
+    def decay(self, factor: float = 0.5) -> None:
+        redis_client = get_redis()
+        if not redis_client:
+            return
+        try:
+            redis_client.zunionstore(self.ZSET_KEY, {self.ZSET_KEY: factor})
+        except Exception:
+            pass
+
+
+query_log = QueryLog(
+    enabled=settings.QUERY_LOG_ENABLED,
+    flush_seconds=settings.QUERY_LOG_FLUSH_SECONDS,
+    max_entries=settings.QUERY_LOG_MAX_ENTRIES,
+)
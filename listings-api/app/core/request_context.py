@@ -0,0 +1,233 @@
+"""Per-request statistics (DB queries, cache lookups, phase timings) carried in a context variable."""
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import memory, metrics, profiling, sql_stats, tracing
+from app.core.config import settings
+from app.core.workload import workload_recorder
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestStats:
+    started: float
+    db_queries: int = 0
+    db_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # ASGI scope of the request, for the route template
+    scope: Optional[Dict[str, Any]] = None
+    # statement fingerprint -> [executions, seconds]
+    statements: Dict[str, List[float]] = field(default_factory=dict)
+    # Phase timings are only collected when ``timing`` is set for the request
+    timing: bool = False
+    phases: Dict[str, float] = field(default_factory=dict)
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def begin_request(scope: Optional[Dict[str, Any]] = None, timing: bool = False) -> Token:
+    return _current_stats.set(RequestStats(started=time.perf_counter(), scope=scope, timing=timing))
+
+
+def end_request(token: Token) -> None:
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Stats of the request being handled, or None outside a request."""
+    return _current_stats.get()
+
+
+@contextmanager
+def timed(phase: str, trace_as: Optional[str] = None, **attributes) -> Iterator[Optional[tracing.Span]]:
+    """
+    Add the block's duration to ``phase`` of the current request. Also usable
+    as a decorator. Phases may overlap each other and the db total (thumbnail
+    lookups are DB time too); each reports its own wall time.
+
+    With ``trace_as`` the block is also a tracing span of that name carrying
+    ``attributes``; the span is yielded so the block can add more.
+    """
+    stats = _current_stats.get()
+    timing = stats is not None and stats.timing
+    traced = trace_as is not None and tracing.active()
+    if not (timing or traced):
+        yield None
+        return
+    started = time.perf_counter()
+    try:
+        if traced:
+            with tracing.span(trace_as, **attributes) as current:
+                yield current
+        else:
+            yield None
+    finally:
+        if timing:
+            stats.phases[phase] = stats.phases.get(phase, 0.0) + time.perf_counter() - started
+
+
+def serialize(model) -> str:
+    """model_dump_json() timed as the request's serialize phase."""
+    with timed("serialize"):
+        return model.model_dump_json()
+
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    """Server-Timing header value: each phase, db time and statement count, and the total."""
+    entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in stats.phases.items()]
+    entries.append(f"db;dur={stats.db_time * 1000:.2f}")
+    entries.append(f'db_count;desc="{stats.db_queries}"')
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def _timing_requested(scope) -> bool:
+    mode = settings.SERVER_TIMING
+    if mode == "on":
+        return True
+    if mode == "header":
+        return any(name == b"x-server-timing" for name, _ in scope.get("headers", ()))
+    return False
+
+
+def _log_slow_request(scope, status: int, duration: float, stats: RequestStats) -> None:
+    logger.warning("Slow request " + json.dumps({
+        "method": scope["method"],
+        "route": metrics.route_template(scope),
+        "path": scope["path"],
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "db_queries": stats.db_queries,
+        "db_ms": round(stats.db_time * 1000, 2),
+        "cache_hits": stats.cache_hits,
+        "cache_misses": stats.cache_misses,
+        "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in stats.phases.items()},
+    }))
+
+
+def record_cache_lookup(namespace: str, hits: int, misses: int = 0) -> None:
+    """Count cache hits and misses against the current request and the metrics of ``namespace``."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+    if settings.METRICS_ENABLED:
+        metrics.record_cache_result(namespace, hits, misses)
+
+
+def install_query_counter(engine: Engine) -> None:
+    """Count statements and their execution time against the current request and its fingerprints."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += elapsed
+        sql_stats.observe_statement(cursor, statement, parameters, elapsed, stats)
+        if tracing.active():
+            tracing.record_span("db.query", elapsed, **{
+                "db.statement": sql_stats.statement_fingerprint(statement),
+                "db.rows": cursor.rowcount,
+            })
+
+
+class RequestStatsMiddleware:
+    """
+    Opens a RequestStats context for every HTTP request. When
+    REQUEST_STATS_HEADERS is on, the counts are reported in X-DB-Queries,
+    X-DB-Time-Ms, X-Cache-Hits and X-Cache-Misses response headers (for
+    benchmark runs, not production). Phase timings are collected when
+    SERVER_TIMING asks for the header or SLOW_REQUEST_LOG_MS is set. Finished
+    requests are observed in the Prometheus metrics and handed to the
+    workload recorder when capture is enabled. Admin requests sent with
+    X-Profile: 1 run under the request profiler, and a sample of requests
+    has its peak allocation recorded while tracemalloc runs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        emit_timing = _timing_requested(scope)
+        slow_threshold = settings.SLOW_REQUEST_LOG_MS / 1000
+        token = begin_request(scope, timing=emit_timing or slow_threshold > 0)
+        stats = _current_stats.get()
+        trace_tokens = tracing.tracer.start(scope)
+        profiler = profiling.profile_store.start(scope) if profiling.requested(scope) else None
+        allocation_baseline = memory.allocation_sampler.start()
+        status = 500
+        capture = workload_recorder.enabled and workload_recorder.sampled()
+        observe = settings.METRICS_ENABLED
+        if observe:
+            metrics.request_started()
+        body = bytearray()
+
+        async def receive_wrapper():
+            message = await receive()
+            if capture and message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra_headers = []
+                if settings.REQUEST_STATS_HEADERS:
+                    extra_headers += [
+                        (b"x-db-queries", str(stats.db_queries).encode()),
+                        (b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()),
+                        (b"x-cache-hits", str(stats.cache_hits).encode()),
+                        (b"x-cache-misses", str(stats.cache_misses).encode()),
+                    ]
+                if profiler is not None:
+                    extra_headers.append((b"x-profile-id", profiler.id.encode()))
+                if emit_timing:
+                    total = time.perf_counter() - stats.started
+                    extra_headers.append((b"server-timing", server_timing(stats, total).encode()))
+                if extra_headers:
+                    message = {**message, "headers": list(message.get("headers", [])) + extra_headers}
+            await send(message)
+
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                profiling.profile_store.finish(profiler)
+            duration = time.perf_counter() - stats.started
+            if observe:
+                metrics.request_finished(scope, status, duration, stats.db_queries)
+            sql_stats.finish_request(scope, stats)
+            if allocation_baseline is not None:
+                memory.allocation_sampler.finish(scope, allocation_baseline)
+            if slow_threshold and duration >= slow_threshold:
+                _log_slow_request(scope, status, duration, stats)
+            if capture:
+                workload_recorder.record(scope, status, duration, stats, bytes(body))
+            if trace_tokens:
+                tracing.tracer.finish(trace_tokens, scope, status, duration)
+            end_request(token)
@@ -0,0 +1,276 @@
+"""
+On-disk snapshots of the in-process indexes for warm restarts.
+
+Each index (reference data, office stats, listing routing) writes itself to
+``SNAPSHOT_DIR/<name>.snap`` on shutdown and every SNAPSHOT_INTERVAL_SECONDS
+when it has changed. On startup a worker restores from the snapshot and then
+catches up from ``modification_timestamp`` like after any refresh, instead of
+scanning the tables.
+
+File layout: a fixed header (magic, format version, header length), a JSON
+header (kind, schema version, creation time, index metadata and section
+offsets), then 8-byte aligned binary sections: string blocks (``\\0``
+separated), ``array`` columns and raw bytes. Files are opened with a
+copy-on-write memory map, so columns are read in place and Bloom filter bits
+are used without copying. Writes go to a temporary file that is renamed over
+the old snapshot, so readers never see a partial file. Snapshots with another
+format or schema version, or older than SNAPSHOT_MAX_AGE_SECONDS, are
+ignored and the index loads from Postgres.
+"""
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LSNAP"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<5sBxxI")
+_ALIGN = 8
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_to_float(value: Optional[datetime]) -> float:
+    """
+    Seconds since the epoch for ``array('d')`` columns, NaN for None. Naive
+    timestamps are taken as UTC so they round-trip unchanged.
+    """
+    if value is None:
+        return math.nan
+    if value.tzinfo is not None:
+        return value.timestamp()
+    return (value - _EPOCH).total_seconds()
+
+
+def float_to_timestamp(value: float, aware: bool) -> Optional[datetime]:
+    if math.isnan(value):
+        return None
+    if aware:
+        return datetime.fromtimestamp(value, timezone.utc)
+    return _EPOCH + timedelta(seconds=value)
+
+
+def isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def parse_isoformat(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class SnapshotWriter:
+    def __init__(self, kind: str, schema: int, meta: Dict[str, Any]):
+        self.kind = kind
+        self.schema = schema
+        self.meta = meta
+        # name, type ("bytes", "strings" or an array typecode), item count, data
+        self._sections: List[Tuple[str, str, int, bytes]] = []
+
+    def add_bytes(self, name: str, data) -> None:
+        data = bytes(data)
+        self._sections.append((name, "bytes", len(data), data))
+
+    def add_array(self, name: str, values: array) -> None:
+        self._sections.append((name, values.typecode, len(values), values.tobytes()))
+
+    def add_strings(self, name: str, values: Iterable[str]) -> None:
+        values = list(values)
+        self._sections.append((name, "strings", len(values), "\0".join(values).encode()))
+
+    def write(self, path: str, confirm: Optional[Callable[[], bool]] = None) -> Optional[int]:
+        """
+        Write atomically; returns the file size. With ``confirm``, the file
+        replaces ``path`` only if it returns True once written, else None.
+        """
+        sections = {}
+        offset = 0
+        for name, kind, count, data in self._sections:
+            sections[name] = [offset, len(data), kind, count]
+            offset += len(data) + (-len(data) % _ALIGN)
+        header = json.dumps({
+            "kind": self.kind,
+            "schema": self.schema,
+            "created_at": time.time(),
+            "meta": self.meta,
+            "sections": sections,
+        }).encode()
+        header += b" " * (-(len(header) + _PREAMBLE.size) % _ALIGN)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as snapshot_file:
+            snapshot_file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            snapshot_file.write(header)
+            for _, _, _, data in self._sections:
+                snapshot_file.write(data)
+                snapshot_file.write(b"\0" * (-len(data) % _ALIGN))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+            size = snapshot_file.tell()
+        if confirm is not None and not confirm():
+            os.remove(temporary)
+            return None
+        os.replace(temporary, path)
+        return size
+
+
+class Snapshot:
+    """A snapshot file mapped copy-on-write; sections are views into the mapping."""
+
+    def __init__(self, path: str, mapping: mmap.mmap, header: Dict[str, Any], data_offset: int):
+        self.path = path
+        self.meta: Dict[str, Any] = header["meta"]
+        self.created_at: float = header["created_at"]
+        self._mapping = mapping
+        self._sections: Dict[str, List[Any]] = header["sections"]
+        self._data_offset = data_offset
+        # (inode, mtime) of the mapped file; a rename over the path changes it
+        self.file_id: Tuple[int, int] = (0, 0)
+
+    @classmethod
+    def open(cls, path: str, kind: str, schema: int, shared: bool = False) -> Optional["Snapshot"]:
+        """
+        The snapshot at ``path`` if it exists and matches ``kind`` and
+        ``schema``. ``shared`` maps it read-only, so every process mapping the
+        file reads the same page-cache pages.
+        """
+        access = mmap.ACCESS_READ if shared else mmap.ACCESS_COPY
+        try:
+            with open(path, "rb") as snapshot_file:
+                mapping = mmap.mmap(snapshot_file.fileno(), 0, access=access)
+                stat = os.fstat(snapshot_file.fileno())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring snapshot {path}: {e}")
+            return None
+        try:
+            magic, version, header_length = _PREAMBLE.unpack_from(mapping, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"format {magic!r} v{version}")
+            header = json.loads(mapping[_PREAMBLE.size:_PREAMBLE.size + header_length])
+            if header["kind"] != kind or header["schema"] != schema:
+                raise ValueError(f"{header['kind']} schema {header['schema']}")
+            data_offset = _PREAMBLE.size + header_length
+            for name, (offset, length, _, _) in header["sections"].items():
+                if data_offset + offset + length > len(mapping):
+                    raise ValueError(f"section {name} is truncated")
+            snapshot = cls(path, mapping, header, data_offset)
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+            logger.warning(f"Ignoring snapshot {path}: {e}")
+            mapping.close()
+            return None
+        snapshot.file_id = (stat.st_ino, stat.st_mtime_ns)
+        return snapshot
+
+    def close(self) -> None:
+        """Unmap the file; only while no section view of it is still referenced."""
+        try:
+            self._mapping.close()
+        except BufferError:
+            pass
+
+    @property
+    def size(self) -> int:
+        return len(self._mapping)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def bytes(self, name: str) -> memoryview:
+        offset, length, _, _ = self._sections[name]
+        start = self._data_offset + offset
+        return memoryview(self._mapping)[start:start + length]
+
+    def array(self, name: str) -> memoryview:
+        """A typed view of an ``array`` column, read in place."""
+        typecode = self._sections[name][2]
+        return self.bytes(name).cast(typecode)
+
+    def strings(self, name: str) -> List[str]:
+        if not self._sections[name][3]:
+            return []
+        return bytes(self.bytes(name)).decode().split("\0")
+
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, f"{name}.snap")
+
+
+def _indexes():
+    from app.services.office_stats import office_stats
+    from app.services.reference_data import reference_data
+    from app.services.routing import listing_router
+
+    indexes = {
+        "reference_data": reference_data,
+        "office_stats": office_stats,
+    }
+    # The shared listing index file is already what a routing snapshot would be
+    if not settings.LISTING_INDEX_PATH:
+        indexes["listing_routes"] = listing_router
+    return indexes
+
+
+# name -> version written last, to skip unchanged indexes
+_written: Dict[str, Any] = {}
+
+
+def restore_indexes() -> Dict[str, float]:
+    """Restore every index that has a usable snapshot; returns seconds taken per restored index."""
+    if not settings.SNAPSHOT_DIR:
+        return {}
+    restored = {}
+    for name, index in _indexes().items():
+        started = time.perf_counter()
+        snapshot = Snapshot.open(snapshot_path(name), index.SNAPSHOT_KIND, index.SNAPSHOT_SCHEMA)
+        if snapshot is None:
+            continue
+        if snapshot.age > settings.SNAPSHOT_MAX_AGE_SECONDS:
+            logger.info(f"Snapshot {name} is {snapshot.age / 3600:.1f}h old; loading from Postgres")
+            snapshot.close()
+            continue
+        try:
+            index.restore_snapshot(snapshot)
+        except Exception as e:
+            logger.error(f"Restoring snapshot {name} failed: {e}")
+            snapshot.close()
+            continue
+        _written[name] = index.snapshot_version()
+        restored[name] = time.perf_counter() - started
+        logger.info(f"Restored {name} from snapshot ({snapshot.age:.0f}s old) in {restored[name] * 1000:.1f}ms")
+    return restored
+
+
+def write_indexes(force: bool = False) -> Dict[str, int]:
+    """Snapshot every loaded index that changed since its last write; returns bytes written per index."""
+    if not settings.SNAPSHOT_DIR:
+        return {}
+    os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+    written = {}
+    for name, index in _indexes().items():
+        version = index.snapshot_version()
+        if version is None or (not force and _written.get(name) == version):
+            continue
+        try:
+            writer = index.to_snapshot()
+            if writer is None:
+                continue
+            written[name] = writer.write(snapshot_path(name))
+            _written[name] = version
+        except Exception as e:
+            logger.error(f"Writing snapshot {name} failed: {e}")
+    if written:
+        logger.info("Wrote snapshots: " + ", ".join(f"{name} {size // 1024}KB" for name, size in written.items()))
+    return written
@@ -0,0 +1,261 @@
+"""
+SQL statement accounting: fingerprints, slow-query log, N+1 detection and
+query budgets.
+
+Statements are reduced to a fingerprint (literals and bound parameters
+replaced, expanded IN lists collapsed) so the same query shape is counted
+together regardless of its values or list length.
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+import re
+import threading
+import time
+
+from app.core import metrics
+from app.core.memory import CacheSizes, approximate_size
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|%s")
+_PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def statement_fingerprint(statement: str) -> str:
+    """Normalized statement text shared by every execution of the same query shape."""
+    fingerprint = _STRING.sub("?", statement)
+    fingerprint = _PARAMETER.sub("?", fingerprint)
+    fingerprint = _NUMBER.sub("?", fingerprint)
+    fingerprint = _PARAMETER_LIST.sub("?...", fingerprint)
+    return _WHITESPACE.sub(" ", fingerprint).strip()
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Types and sizes of bound parameters, never their values."""
+    if isinstance(parameters, dict):
+        return {name: parameter_shape(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one shape for the batch
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return f"{type(parameters).__name__}[{len(parameters)}]"
+    if isinstance(parameters, str):
+        return f"str({len(parameters)})"
+    return type(parameters).__name__
+
+
+class StatementStats:
+    """Process-wide count, total and max time per statement fingerprint."""
+
+    def __init__(self):
+        self._stats: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._stats.get(fingerprint)
+            if entry is None:
+                self._stats[fingerprint] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def top(self, limit: int = 20, order_by: str = "total") -> List[Dict[str, Any]]:
+        index = {"count": 0, "total": 1, "max": 2}[order_by]
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        return [
+            {
+                "statement": fingerprint,
+                "count": int(count),
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(slowest * 1000, 3),
+            }
+            for fingerprint, (count, total, slowest) in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def cache_sizes(self) -> CacheSizes:
+        with self._lock:
+            return {"sql_statement_stats": (len(self._stats), approximate_size(self._stats))}
+
+
+class SlowQueryLog:
+    """
+    Logs statements slower than ``threshold_ms`` with their parameter shapes.
+    With ``explain`` on, SELECTs also get their plan, at most once per
+    fingerprint every ``explain_interval`` seconds. The EXPLAIN runs on the
+    same connection inside a savepoint so a failure cannot abort the caller's
+    transaction.
+    """
+
+    def __init__(self, threshold_ms: int, explain: bool, explain_interval: int = 600):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._explained: Dict[str, float] = {}
+
+    def observe(self, cursor, statement: str, parameters: Any, fingerprint: str, seconds: float, route: str) -> None:
+        if seconds < self.threshold:
+            return
+        metrics.DB_SLOW_QUERIES.labels(route).inc()
+        message = (
+            f"Slow query {seconds * 1000:.1f}ms on {route}: {fingerprint} "
+            f"params={parameter_shape(parameters)}"
+        )
+        plan = self._explain(cursor, statement, parameters, fingerprint) if self.explain else None
+        if plan:
+            message += "\n" + plan
+        logger.warning(message)
+
+    def _explain(self, cursor, statement: str, parameters: Any, fingerprint: str) -> Optional[str]:
+        if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+            return None
+        now = time.monotonic()
+        if now - self._explained.get(fingerprint, -self.explain_interval) < self.explain_interval:
+            return None
+        self._explained[fingerprint] = now
+
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                explain_cursor.execute("EXPLAIN " + statement, parameters)
+                plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+                return plan
+            except Exception as e:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                return f"(EXPLAIN failed: {e})"
+        except Exception:
+            return None
+        finally:
+            explain_cursor.close()
+
+
+class NPlusOneDetector:
+    """
+    Flags fingerprints executed ``threshold`` or more times within one
+    request. Every occurrence is counted in the metrics; the warning for a
+    given route and statement is logged at most once per ``log_interval``.
+    """
+
+    def __init__(self, threshold: int, log_interval: int = 600):
+        self.threshold = threshold
+        self.log_interval = log_interval
+        self._logged: Dict[Tuple[str, str], float] = {}
+
+    def check(self, route: str, statements: Dict[str, List[float]]) -> List[str]:
+        flagged = [
+            fingerprint for fingerprint, (count, _) in statements.items() if count >= self.threshold
+        ]
+        now = time.monotonic()
+        for fingerprint in flagged:
+            count, seconds = statements[fingerprint]
+            metrics.DB_N_PLUS_ONE.labels(route).inc()
+            last = self._logged.get((route, fingerprint))
+            if last is None or now - last >= self.log_interval:
+                self._logged[(route, fingerprint)] = now
+                logger.warning(
+                    f"Possible N+1 on {route}: {int(count)} executions ({seconds * 1000:.1f}ms) of {fingerprint}"
+                )
+        return flagged
+
+
+statement_stats = StatementStats()
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN)
+n_plus_one_detector = NPlusOneDetector(settings.N_PLUS_ONE_THRESHOLD)
+
+# Open query_budget blocks; statements from any thread are added to each
+_captures: List[List[Tuple[str, float]]] = []
+
+
+def observe_statement(cursor, statement: str, parameters: Any, seconds: float, stats) -> None:
+    """Account one executed statement; ``stats`` is the current RequestStats or None."""
+    if not (settings.SQL_INSTRUMENTATION or _captures):
+        return
+    fingerprint = statement_fingerprint(statement)
+    for captured in list(_captures):
+        captured.append((fingerprint, seconds))
+    if not settings.SQL_INSTRUMENTATION:
+        return
+
+    statement_stats.record(fingerprint, seconds)
+    route = "background"
+    if stats is not None:
+        entry = stats.statements.get(fingerprint)
+        if entry is None:
+            stats.statements[fingerprint] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+        if stats.scope is not None:
+            route = metrics.route_template(stats.scope)
+    slow_query_log.observe(cursor, statement, parameters, fingerprint, seconds, route)
+
+
+def finish_request(scope, stats) -> None:
+    if settings.SQL_INSTRUMENTATION and stats.statements:
+        n_plus_one_detector.check(metrics.route_template(scope), stats.statements)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def budget_violations(
+    captured: List[Tuple[str, float]],
+    max_queries: int,
+    max_repeats: Optional[int] = None
+) -> List[str]:
+    problems = []
+    if len(captured) > max_queries:
+        problems.append(f"{len(captured)} statements, budget {max_queries}")
+    if max_repeats is not None:
+        counts: Dict[str, int] = {}
+        for fingerprint, _ in captured:
+            counts[fingerprint] = counts.get(fingerprint, 0) + 1
+        for fingerprint, count in counts.items():
+            if count > max_repeats:
+                problems.append(f"{count} executions (max {max_repeats}) of {fingerprint}")
+    return problems
+
+
+@contextmanager
+def query_budget(
+    max_queries: int,
+    max_repeats: Optional[int] = None,
+    label: str = "block"
+) -> Iterator[List[Tuple[str, float]]]:
+    """
+    Assert that the block executes at most ``max_queries`` statements and,
+    if given, no single fingerprint more than ``max_repeats`` times:
+
+        with query_budget(2, max_repeats=1, label="GET /listings/{key}"):
+            client.get(f"/api/v1/listings/{key}")
+
+    Statements are captured from every thread, so requests served by a
+    TestClient are included. Raises QueryBudgetExceeded (an AssertionError).
+    """
+    captured: List[Tuple[str, float]] = []
+    _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        _captures.remove(captured)
+    problems = budget_violations(captured, max_queries, max_repeats)
+    if problems:
+        raise QueryBudgetExceeded(f"{label}: " + "; ".join(problems))
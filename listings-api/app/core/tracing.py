@@ -0,0 +1,317 @@
+"""
+In-process request tracing.
+
+Each traced request gets a root span (named after its route template) with
+nested spans for cache reads and writes, service methods and SQL statements.
+Finished traces are handed to a background exporter that writes rotating
+JSONL files or posts OTLP/JSON batches to a collector, so exporting never
+blocks a request.
+
+Sampling is decided when the request starts: TRACE_SAMPLE_RATE of requests
+are traced. With TRACE_SLOW_MS set, spans are also collected for the other
+requests and kept when the request turns out slow, so slow requests are
+always traced. Each exported root span carries ``sampling.weight`` to keep
+aggregates unbiased: 1 / rate for head-sampled requests, 1 for slow ones,
+and 1 for requests whose caller made the decision in ``traceparent``, since
+the caller's rate is unknown here (``sampling.reason`` says which).
+"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import types
+import urllib.request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+        }
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    sampled: bool
+    # Sampling decided by the caller's traceparent rather than TRACE_SAMPLE_RATE
+    upstream: bool = False
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def active() -> bool:
+    return _current_trace.get() is not None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Child span of the current one; yields None (and costs nothing more) outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(
+        trace.trace_id, _new_id(64), parent.span_id if parent else None, name, time.time_ns(), attributes=attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+
+def record_span(name: str, seconds: float, **attributes) -> None:
+    """Add an already finished span (e.g. a SQL statement timed by an event hook)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    end_ns = time.time_ns()
+    trace.spans.append(Span(
+        trace.trace_id, _new_id(64), parent.span_id if parent else None, name,
+        end_ns - int(seconds * 1e9), end_ns, attributes
+    ))
+
+
+def traced_methods(cls):
+    """Class decorator: every public method runs in a ``Class.method`` span."""
+    for name, function in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(function, types.FunctionType):
+            continue
+        setattr(cls, name, _traced(function, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _traced(function, span_name: str):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return function(*args, **kwargs)
+        with span(span_name) as current:
+            result = function(*args, **kwargs)
+            if isinstance(result, (list, dict)):
+                current.set("result.count", len(result))
+            elif isinstance(result, tuple) and result and isinstance(result[0], list):
+                current.set("result.count", len(result[0]))
+            return result
+    return wrapper
+
+
+class Tracer:
+    def __init__(self, enabled: bool, sample_rate: float, slow_ms: int):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow = slow_ms / 1000
+        self.exporter = None
+
+    def start(self, scope) -> Optional[Tuple[Token, Token]]:
+        """Open a trace for the request when sampled, or when slow capture needs it."""
+        if not self.enabled:
+            return None
+        trace_id, parent_id, sampled = _parse_traceparent(scope)
+        upstream = sampled is not None
+        if not upstream:
+            sampled = random.random() < self.sample_rate
+        if not sampled and not self.slow:
+            return None
+        trace = Trace(trace_id or _new_id(128), sampled, upstream)
+        root = Span(trace.trace_id, _new_id(64), parent_id, "request", time.time_ns(), attributes={
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        return _current_trace.set(trace), _current_span.set(root)
+
+    def finish(self, tokens: Tuple[Token, Token], scope, status: int, duration: float) -> None:
+        trace = _current_trace.get()
+        root = _current_span.get()
+        _current_span.reset(tokens[1])
+        _current_trace.reset(tokens[0])
+        slow = bool(self.slow) and duration >= self.slow
+        if not (trace.sampled or slow):
+            return
+
+        if slow:
+            weight, reason = 1.0, "slow"
+        elif trace.upstream or not self.sample_rate:
+            weight, reason = 1.0, "parent" if trace.upstream else "head"
+        else:
+            weight, reason = round(1 / self.sample_rate, 3), "head"
+        route = scope.get("route")
+        root.name = f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+        root.end_ns = time.time_ns()
+        root.attributes.update({
+            "http.route": getattr(route, "path", None),
+            "http.status_code": status,
+            "sampling.weight": weight,
+            "sampling.reason": reason,
+        })
+        trace.spans.append(root)
+        if self.exporter is None:
+            self.exporter = _build_exporter()
+        self.exporter.submit(trace)
+
+
+def _parse_traceparent(scope) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """W3C traceparent: continue the caller's trace and honour its sampling flag."""
+    for name, value in scope.get("headers", ()):
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and len(parts[3]) == 2:
+                try:
+                    return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+                except ValueError:
+                    pass
+    return None, None, None
+
+
+class _Exporter(ABC):
+    """Background thread draining finished traces; traces are dropped when the queue is full."""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logger.error(f"Trace export failed: {e}")
+
+    @abstractmethod
+    def export(self, batch: List[Trace]) -> None:
+        """Write one batch; runs on the exporter thread."""
+
+
+class JsonlExporter(_Exporter):
+    """One JSON line per span in TRACE_FILE, rotated at TRACE_FILE_MAX_BYTES."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+        super().__init__()
+
+    def export(self, batch: List[Trace]) -> None:
+        for trace in batch:
+            for finished in trace.spans:
+                self._handler.emit(logging.makeLogRecord({"msg": json.dumps(finished.to_dict(), default=str)}))
+
+
+class OtlpHttpExporter(_Exporter):
+    """POSTs OTLP/JSON ExportTraceServiceRequest batches to TRACE_OTLP_ENDPOINT."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        super().__init__()
+
+    def export(self, batch: List[Trace]) -> None:
+        spans = [_otlp_span(finished) for trace in batch for finished in trace.spans]
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                _otlp_attribute("service.name", settings.APP_NAME),
+                _otlp_attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+def _otlp_span(finished: Span) -> Dict[str, Any]:
+    return {
+        "traceId": finished.trace_id,
+        "spanId": finished.span_id,
+        "parentSpanId": finished.parent_id or "",
+        "name": finished.name,
+        "kind": 2 if finished.parent_id is None else 1,
+        "startTimeUnixNano": str(finished.start_ns),
+        "endTimeUnixNano": str(finished.end_ns),
+        "attributes": [_otlp_attribute(key, value) for key, value in finished.attributes.items()],
+    }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _build_exporter() -> _Exporter:
+    if settings.TRACE_EXPORT == "otlp":
+        return OtlpHttpExporter(settings.TRACE_OTLP_ENDPOINT)
+    return JsonlExporter(
+        settings.TRACE_FILE.format(pid=os.getpid()), settings.TRACE_FILE_MAX_BYTES, settings.TRACE_FILE_BACKUPS
+    )
+
+
+tracer = Tracer(settings.TRACING_ENABLED, settings.TRACE_SAMPLE_RATE, settings.TRACE_SLOW_MS)
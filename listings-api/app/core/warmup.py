@@ -0,0 +1,154 @@
+"""
+Startup warm-up and readiness.
+
+The lifespan runs ``warm_up`` before the worker accepts traffic: Redis is
+checked, pooled connections are opened, reference data and in-memory
+indexes are restored from their snapshots (app.core.snapshots) and caught
+up, or loaded from scratch without one, and each hot query shape is executed once so SQLAlchemy
+has compiled and cached it. /readyz answers 200 only once this has
+succeeded, so a load balancer never routes to a cold worker; /livez only
+says the process is serving.
+"""
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+import time
+
+from app.core import database, snapshots
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.attempts = 0
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready and not self.draining,
+            "draining": self.draining,
+            "attempts": self.attempts,
+            "warmup_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()},
+            "errors": self.errors,
+        }
+
+
+def prewarm_pool(connections: int) -> None:
+    """Open ``connections`` pool connections, held together so each is a distinct one."""
+    held = []
+    try:
+        for _ in range(connections):
+            connection = database.engine.connect()
+            held.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in held:
+            connection.close()
+
+
+def load_indexes() -> None:
+    """Load each index, or catch up the ones restored from snapshots."""
+    from app.jobs.listing_index import ensure_listing_index
+    from app.services.office_stats import office_stats
+    from app.services.reference_data import reference_data
+    from app.services.routing import listing_router
+
+    db = database.SessionLocal()
+    try:
+        reference_data.refresh(db)
+        office_stats.refresh(db)
+        ensure_listing_index(db)
+        listing_router.refresh(db)
+    finally:
+        db.close()
+
+
+def compile_hot_statements() -> None:
+    """
+    Run every hot endpoint's queries once against real keys, so their SQL is
+    compiled into the engine's statement cache and the Pydantic models have
+    validated a row before the first request.
+    """
+    from app.models.database import ResidentialProperty
+    from app.models.schemas import SearchFilters
+    from app.services.featured import FeaturedService
+    from app.services.listings import ListingsService
+    from app.services.media import MediaService
+    from app.services.office_stats import office_stats
+    from app.services.search import SearchService
+
+    db = database.SessionLocal()
+    try:
+        listing = (
+            db.query(ResidentialProperty)
+            .filter(ResidentialProperty.latitude.isnot(None), ResidentialProperty.list_office_key.isnot(None))
+            .first()
+        )
+        if listing is None:
+            return
+        listings_service = ListingsService(db)
+        search_service = SearchService(db)
+        listing_key = listing.listing_key
+
+        listings_service.get_listing_detail_json(listing_key)
+        listings_service.get_listing_by_key(listing_key)
+        listings_service.get_listings_by_keys([listing_key])
+        listings_service.get_similar_listings(listing_key, limit=1)
+        MediaService(db).get_media_bundle(listing_key)
+        search_service.search_listings(SearchFilters(), limit=1)
+        search_service.search_listings_for_map(SearchFilters(
+            ne_lat=listing.latitude + 0.01, ne_lng=listing.longitude + 0.01,
+            sw_lat=listing.latitude - 0.01, sw_lng=listing.longitude - 0.01,
+        ), limit=2)
+        search_service.get_city_suggestions((listing.city_region or "a")[:2], limit=1)
+        featured_service = FeaturedService(db)
+        featured_service.get_featured_listings(listing.list_office_key, limit=1)
+        if not office_stats.loaded:
+            featured_service.get_office_info(listing.list_office_key)
+    finally:
+        db.close()
+
+
+def warm_up(readiness: Readiness) -> bool:
+    """
+    Run every warm-up phase, timing each. Only a database failure leaves the
+    worker unready; other phases fall back to loading on first use.
+    """
+    readiness.attempts += 1
+    readiness.errors = {}
+    # name, phase, whether the worker is unready without it
+    phases: List[Tuple[str, Callable[[], Any], bool]] = [
+        ("redis", database.check_redis, False),
+        ("pool", lambda: prewarm_pool(settings.WARMUP_POOL_CONNECTIONS), True),
+        ("snapshots", snapshots.restore_indexes, False),
+        ("indexes", load_indexes, False),
+    ]
+    if settings.WARMUP_STATEMENTS:
+        phases.append(("statements", compile_hot_statements, False))
+
+    ok = True
+    for name, phase, required in phases:
+        started = time.perf_counter()
+        try:
+            phase()
+        except Exception as e:
+            logger.error(f"Warm-up phase {name} failed: {e}")
+            readiness.errors[name] = str(e)
+            if required:
+                ok = False
+                break
+        finally:
+            readiness.phases[name] = time.perf_counter() - started
+    readiness.ready = ok
+    if ok:
+        logger.info(
+            "Warm-up finished: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in readiness.phases.items())
+        )
+    return ok
+
+
+readiness = Readiness()
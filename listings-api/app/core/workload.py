@@ -0,0 +1,91 @@
+"""
+Workload capture: sanitized request records for replay with
+``python -m benchmarks.workload``.
+"""
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_CAPTURED_BODY = 64 * 1024
+
+
+class WorkloadRecorder:
+    """
+    Appends one JSON line per sampled request to WORKLOAD_CAPTURE_PATH
+    (``{pid}`` in the path is replaced so each worker writes its own file).
+
+    Records are sanitized: only the matched route template, its path
+    parameters, the query parameters that route declares and JSON request
+    bodies are kept. Headers, client addresses and unknown query parameters
+    are never written.
+    """
+
+    def __init__(self, path: Optional[str], sample_rate: float):
+        self.path = path.format(pid=os.getpid()) if path else None
+        self.sample_rate = sample_rate
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, scope, status: int, duration: float, stats, body: bytes) -> None:
+        route = scope.get("route")
+        if route is None or not hasattr(route, "dependant"):
+            return
+
+        declared = {param.alias for param in route.dependant.query_params}
+        entry: Dict[str, Any] = {
+            "ts": round(time.time(), 3),
+            "method": scope["method"],
+            "route": route.path,
+            "path_params": scope.get("path_params", {}),
+            "query": [
+                [name, value]
+                for name, value in parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+                if name in declared
+            ],
+            "body": self._parse_body(body),
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "db_queries": stats.db_queries,
+            "cache_hits": stats.cache_hits,
+            "cache_misses": stats.cache_misses,
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(line)
+        except Exception as e:
+            logger.error(f"Workload capture write failed: {e}")
+            self.path = None
+
+    @staticmethod
+    def _parse_body(body: bytes) -> Any:
+        if not body or len(body) > MAX_CAPTURED_BODY:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+
+workload_recorder = WorkloadRecorder(
+    settings.WORKLOAD_CAPTURE_PATH,
+    settings.WORKLOAD_CAPTURE_SAMPLE_RATE,
+)
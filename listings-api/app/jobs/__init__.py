@@ -0,0 +1 @@
+"""Background jobs run after ingestion"""
\ No newline at end of file
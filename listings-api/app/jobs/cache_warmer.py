@@ -0,0 +1,144 @@
+"""
+Re-renders the most requested search, map and featured responses into the
+response cache right after an ingestion run, so popular pages do not pay a
+cold-cache miss once their stale entries expire.
+
+Run once by hand with:
+    python -m app.jobs.cache_warmer
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import ResponseCache
+from app.core.config import settings
+from app.core.database import SessionLocal, get_redis_bytes
+from app.core.query_log import fingerprint_cache_key, parse_fingerprint, query_log
+from app.jobs.featured_feeds import feed_variants
+from app.models.schemas import PropertyType, SearchFilters, SortOption
+from app.services.featured import FeaturedService, featured_cache_key
+from app.services.search import SearchService
+from app.utils.http_cache import latest_timestamp
+
+logger = logging.getLogger(__name__)
+
+# (cache key, body, ttl, last modified), or None when the endpoint would not cache
+Rendered = Optional[Tuple[str, str, int, Optional[datetime]]]
+
+
+def _render_search(db: Session, fingerprint: str, params: Dict[str, Any]) -> Rendered:
+    response = SearchService(db).build_search_response(
+        SearchFilters.model_validate(params["filters"]),
+        params["page"],
+        params["limit"],
+        SortOption(params["sort"])
+    )
+    return (
+        fingerprint_cache_key(fingerprint),
+        response.model_dump_json(),
+        settings.SEARCH_CACHE_TTL,
+        latest_timestamp(listing.modification_timestamp for listing in response.listings),
+    )
+
+
+def _render_map(db: Session, fingerprint: str, params: Dict[str, Any]) -> Rendered:
+    response = SearchService(db).build_map_response(
+        SearchFilters.model_validate(params["filters"]),
+        params["limit"]
+    )
+    return (
+        fingerprint_cache_key(fingerprint),
+        response.model_dump_json(),
+        settings.MAP_CACHE_TTL,
+        latest_timestamp(listing.modification_timestamp for listing in response.listings),
+    )
+
+
+def _render_featured(db: Session, fingerprint: str, params: Dict[str, Any]) -> Rendered:
+    property_type = PropertyType(params["property_type"]) if params["property_type"] else None
+    response = FeaturedService(db).get_featured_listings(
+        office_key=params["office_key"],
+        property_type=property_type,
+        limit=params["limit"],
+        transaction_type=params["transaction_type"]
+    )
+    if not response:
+        return None
+    return (
+        featured_cache_key(params["office_key"], property_type, params["limit"], params["transaction_type"]),
+        response.model_dump_json(),
+        settings.CACHE_TTL_SECONDS,
+        latest_timestamp(listing.modification_timestamp for listing in response.listings),
+    )
+
+
+RENDERERS: Dict[str, Callable[[Session, str, Dict[str, Any]], Rendered]] = {
+    "search": _render_search,
+    "map": _render_map,
+    "featured": _render_featured,
+}
+
+
+def warm_popular_queries(db: Session) -> Dict[str, int]:
+    """
+    Re-render the top CACHE_WARM_TOP_K fingerprints. At most
+    CACHE_WARM_CONCURRENCY run at once, each on its own session, so warming
+    never holds more than that many pool connections away from live traffic.
+    """
+    response_cache = ResponseCache(get_redis_bytes())
+    if not response_cache.redis:
+        return {}
+
+    query_log.flush()
+    # Featured variants pre-rendered by the featured feeds job are already fresh
+    pre_rendered = set(
+        (property_type.value if property_type else None, limit, transaction_type)
+        for property_type, limit, transaction_type in feed_variants()
+    )
+    work = []
+    for fingerprint, _ in query_log.top(settings.CACHE_WARM_TOP_K):
+        route, params = parse_fingerprint(fingerprint)
+        if route not in RENDERERS:
+            continue
+        if route == "featured" and (
+            params["property_type"], params["limit"], params["transaction_type"]
+        ) in pre_rendered:
+            continue
+        work.append((route, fingerprint, params))
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.CACHE_WARM_CONCURRENCY)) as pool:
+        outcomes = list(pool.map(lambda item: _warm(response_cache, *item), work))
+
+    # Age the counts so next run follows current traffic
+    query_log.decay()
+
+    warmed = sum(1 for outcome in outcomes if outcome)
+    logger.info(f"Cache warming: {warmed} of {len(work)} popular queries re-rendered")
+    return {"warmed": warmed, "failed": len(work) - warmed}
+
+
+def _warm(response_cache: ResponseCache, route: str, fingerprint: str, params: Dict[str, Any]) -> bool:
+    db = SessionLocal()
+    try:
+        rendered = RENDERERS[route](db, fingerprint, params)
+        if rendered:
+            cache_key, body, ttl, last_modified = rendered
+            response_cache.set(cache_key, body, ttl, last_modified)
+        return True
+    except Exception as e:
+        logger.warning(f"Cache warming failed for {fingerprint}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(warm_popular_queries(session))
+    finally:
+        session.close()
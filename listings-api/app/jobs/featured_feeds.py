@@ -0,0 +1,118 @@
+"""
+Pre-renders the common variants of every office's featured feed into the
+response cache after each ingestion run, so /featured/{office_key} is a
+cache read for broker widgets.
+
+Run once by hand with:
+    python -m app.jobs.featured_feeds
+"""
+from typing import Dict, List
+import logging
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import ResponseCache
+from app.core.config import settings
+from app.core.database import SessionLocal, get_redis, get_redis_bytes
+from app.models.schemas import PropertyType
+from app.services.featured import FeaturedService, FeedVariant, featured_cache_key
+from app.services.office_stats import OfficeStats, office_stats
+from app.utils.http_cache import latest_timestamp
+
+logger = logging.getLogger(__name__)
+
+# office_key -> "<fingerprint>|<rendered at>" for offices whose feeds are cached
+FEED_STATE_KEY = "featured_feeds:offices"
+
+
+def feed_variants() -> List[FeedVariant]:
+    """The limit / property_type / transaction_type combinations kept pre-rendered."""
+    return [
+        (property_type, limit, transaction_type)
+        for property_type in (None, PropertyType.RESIDENTIAL, PropertyType.COMMERCIAL)
+        for limit in settings.FEATURED_FEED_LIMITS
+        for transaction_type in settings.FEATURED_FEED_TRANSACTION_TYPES
+    ]
+
+
+def refresh_featured_feeds(db: Session) -> Dict[str, int]:
+    """
+    Re-render feeds for offices whose listings changed since their feeds were
+    last written, and drop feeds of offices that no longer have listings.
+    """
+    redis_client = get_redis()
+    response_cache = ResponseCache(get_redis_bytes())
+    if not redis_client or not response_cache.redis:
+        return {}
+    if not office_stats.refresh(db):
+        logger.error("Featured feeds skipped: office stats unavailable")
+        return {}
+
+    variants = feed_variants()
+    service = FeaturedService(db)
+    previous = redis_client.hgetall(FEED_STATE_KEY)
+    now = time.time()
+    rendered = skipped = 0
+    state = {}
+
+    for stats in office_stats.offices():
+        fingerprint = _fingerprint(stats)
+        known, _, rendered_at = previous.get(stats.office_key, "").rpartition("|")
+        # Re-render unchanged feeds well before the cached copies expire
+        if known == fingerprint and now - float(rendered_at or 0) < settings.FEATURED_FEED_TTL / 2:
+            skipped += 1
+            continue
+
+        feeds = service.build_featured_feeds(stats.office_key, variants)
+        response_cache.set_many(
+            {
+                featured_cache_key(stats.office_key, *variant): (
+                    feed.model_dump_json(),
+                    latest_timestamp(listing.modification_timestamp for listing in feed.listings)
+                )
+                for variant, feed in feeds.items()
+            },
+            settings.FEATURED_FEED_TTL
+        )
+        # Variants that came back empty would otherwise keep serving old listings
+        response_cache.delete_many([
+            featured_cache_key(stats.office_key, *variant)
+            for variant in variants if variant not in feeds
+        ])
+        state[stats.office_key] = f"{fingerprint}|{now:.0f}"
+        rendered += 1
+        db.expunge_all()
+
+    active = {stats.office_key for stats in office_stats.offices()}
+    removed = [office_key for office_key in previous if office_key not in active]
+    for office_key in removed:
+        response_cache.delete_many([featured_cache_key(office_key, *variant) for variant in variants])
+
+    pipe = redis_client.pipeline(transaction=False)
+    if state:
+        pipe.hset(FEED_STATE_KEY, mapping=state)
+    if removed:
+        pipe.hdel(FEED_STATE_KEY, *removed)
+    pipe.execute()
+
+    logger.info(f"Featured feeds: {rendered} offices rendered, {skipped} unchanged, {len(removed)} removed")
+    return {"rendered": rendered, "skipped": skipped, "removed": len(removed)}
+
+
+def _fingerprint(stats: OfficeStats) -> str:
+    """
+    Changes whenever a listing of the office is added, removed or modified:
+    edits bump the latest modification time, removals change the counts.
+    """
+    latest = stats.latest_modification.isoformat() if stats.latest_modification else ""
+    return f"{latest}/{stats.residential_listings}/{stats.commercial_listings}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(refresh_featured_feeds(session))
+    finally:
+        session.close()
@@ -0,0 +1,34 @@
+"""
+Keeps this worker's in-process indexes current. Registered as a local
+scheduler job, so it runs on every worker in the threadpool and requests
+only ever read the state it leaves behind.
+
+Run once by hand with:
+    python -m app.jobs.indexes
+"""
+import logging
+
+from app.core.database import SessionLocal
+from app.core.memory import update_cache_gauges
+from app.services.office_stats import office_stats
+from app.services.reference_data import reference_data
+from app.services.routing import listing_router
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_indexes() -> None:
+    """Load, catch up or follow each index when it is due, then measure the caches for /metrics."""
+    db = SessionLocal()
+    try:
+        reference_data.refresh(db)
+        office_stats.refresh(db)
+        listing_router.refresh(db)
+    finally:
+        db.close()
+    update_cache_gauges()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    refresh_indexes()
@@ -0,0 +1,133 @@
+"""
+Builds the shared listing index file (LISTING_INDEX_PATH) after each
+ingestion run. Every API worker maps the file read-only and swaps to the new
+generation once it is renamed into place (see SharedListingIndex), so the
+index is built once per host instead of once per worker.
+
+Run once by hand with:
+    python -m app.jobs.listing_index
+"""
+from contextlib import contextmanager
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+import fcntl
+import logging
+import os
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.snapshots import SnapshotWriter, isoformat
+from app.jobs.scheduler import fencing_token, lease_current
+from app.services.replication import replication_watcher
+from app.services.routing import PROPERTY_MODELS, SharedListingIndex, build_media_filter
+
+logger = logging.getLogger(__name__)
+
+
+def build_listing_index(db: Session, force: bool = False) -> Dict[str, int]:
+    """
+    Write a new generation unless the file already matches the current
+    ingestion run or another process on this host is writing one. A leader
+    that lost its lease while building does not replace the file.
+    """
+    path = settings.LISTING_INDEX_PATH
+    if not path:
+        return {}
+    generation = replication_watcher.current(db)
+    with _build_lock(path, blocking=False) as locked:
+        if not locked:
+            logger.info("Listing index build skipped: another process is building it")
+            return {}
+        current = SharedListingIndex.open(path)
+        if not force and current is not None and generation is not None and current.generation == generation:
+            return {}
+        return _write_index(db, path, generation, fencing_token())
+
+
+def ensure_listing_index(db: Session) -> None:
+    """
+    At startup, build the first generation if there is none yet. Workers
+    starting together wait for whichever one takes the lock first.
+    """
+    path = settings.LISTING_INDEX_PATH
+    if not path or os.path.exists(path):
+        return
+    with _build_lock(path, blocking=True):
+        if not os.path.exists(path):
+            _write_index(db, path, replication_watcher.current(db), None)
+
+
+@contextmanager
+def _build_lock(path: str, blocking: bool) -> Iterator[bool]:
+    """Exclusive flock on ``<path>.lock``; yields whether it was acquired."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_index(db: Session, path: str, generation: Optional[datetime], token: Optional[int]) -> Dict[str, int]:
+    started = time.monotonic()
+    type_ids = {property_type: i for i, property_type in enumerate(PROPERTY_MODELS)}
+    routes: Dict[bytes, int] = {}
+    for property_type, model in PROPERTY_MODELS.items():
+        for (listing_key,) in db.query(model.listing_key).yield_per(10000):
+            routes[listing_key.encode()] = type_ids[property_type]
+
+    # UTF-8 byte order is code point order, so readers can bisect on encoded keys
+    keys = bytearray()
+    offsets = array("Q", [0])
+    types = array("b")
+    for listing_key in sorted(routes):
+        keys += listing_key
+        offsets.append(len(keys))
+        types.append(routes[listing_key])
+
+    media_filters = {
+        property_type: build_media_filter(db, property_type, settings.MEDIA_FILTER_ERROR_RATE)
+        for property_type in PROPERTY_MODELS
+    }
+    writer = SnapshotWriter(SharedListingIndex.SNAPSHOT_KIND, SharedListingIndex.SNAPSHOT_SCHEMA, {
+        "generation": isoformat(generation),
+        "fence": token,
+        "property_types": list(type_ids),
+        "media_filters": {
+            property_type: [media_filter.capacity, media_filter.error_rate, media_filter.count]
+            for property_type, media_filter in media_filters.items()
+        },
+    })
+    writer.add_array("key_offsets", offsets)
+    writer.add_bytes("keys", keys)
+    writer.add_array("property_type", types)
+    for property_type, media_filter in media_filters.items():
+        writer.add_bytes(f"media.{property_type}", media_filter.bits)
+    # The lease is checked once more right before the rename, so a stale leader never replaces the file
+    size = writer.write(path, confirm=lambda: lease_current(token))
+    if size is None:
+        logger.warning(f"Listing index not written: the lease for fencing token {token} was lost")
+        return {}
+    logger.info(
+        f"Listing index written: {len(types)} listings, {size // 1024}KB, generation {generation} in "
+        f"{time.monotonic() - started:.2f}s"
+    )
+    return {"listings": len(types), "bytes": size}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(build_listing_index(session, force=True))
+    finally:
+        session.close()
@@ -0,0 +1,376 @@
+"""
+Leader-elected scheduler for background jobs.
+
+Every API worker runs the scheduler loop, but only the worker holding the
+Redis leader lease runs jobs: periodic ones every N seconds and ingestion
+ones once per new ``replication_logs`` generation. Each ingestion job
+records the generation it completed, so one that fails is retried without
+running the others again. A failed job waits one tick before its next try,
+twice as long after each further failure, up to ten minutes. The lease is
+renewed every tick while jobs run in the threadpool; if the leader dies,
+another worker takes over once the lease expires. Jobs registered as ``local`` (per-worker
+housekeeping such as refreshing the worker's own in-process indexes) run on
+every worker, leader or not.
+
+Each lease comes with a fencing token from a counter in Redis. Jobs can
+read it with ``fencing_token()`` and call ``lease_current(token)`` right
+before committing a write, so a leader whose lease was already taken over
+does not overwrite its successor's work (the shared listing index does).
+The counter only grows while Redis keeps it, so tokens are never compared
+with ones stored outside Redis. Without Redis every worker leads with token
+0, as jobs ran before there was a scheduler, and writes are unfenced.
+
+Watch the election against a local Redis by starting this in two shells and
+stopping the leader:
+    python -m app.jobs.scheduler --seconds 120
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+
+from redis.exceptions import WatchError
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import SessionLocal, check_redis, get_redis
+from app.services.replication import replication_watcher
+
+logger = logging.getLogger(__name__)
+
+# Longest wait before retrying a failed job; the wait doubles from one tick
+_MAX_RETRY_SECONDS = 600
+
+_fencing_token: ContextVar[Optional[int]] = ContextVar("fencing_token", default=None)
+
+
+def fencing_token() -> Optional[int]:
+    """Token of the lease the current job runs under; None outside the scheduler."""
+    return _fencing_token.get()
+
+
+def lease_current(token: Optional[int]) -> bool:
+    """
+    Whether a job running under ``token`` still holds the lease, checked
+    against Redis. Always True outside the scheduler and without Redis.
+    """
+    if not token:
+        return True
+    return scheduler.lock.token == token and scheduler.lock.verify()
+
+
+class LeaderLock:
+    """
+    Redis lease naming the scheduler leader. The key holds
+    ``<owner>:<token>`` and expires after ``ttl`` seconds unless renewed;
+    renewing and releasing check the value inside a WATCH transaction, so a
+    worker never extends or deletes a lease another worker took over.
+    """
+
+    KEY = "scheduler:leader"
+    FENCE_KEY = "scheduler:fence"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: Optional[int] = None
+        self._expires_at = 0.0
+
+    @property
+    def held(self) -> bool:
+        """Whether this worker leads; judged locally, so it turns False once the lease may have lapsed."""
+        return self.token is not None and time.monotonic() < self._expires_at
+
+    def hold(self) -> bool:
+        """Acquire or renew the lease. Returns whether this worker leads."""
+        redis_client = get_redis()
+        if not redis_client:
+            self.token = 0
+            self._expires_at = math.inf
+            return True
+        started = time.monotonic()
+        try:
+            if self.token is not None and self._renew(redis_client):
+                self._expires_at = started + self.ttl
+            else:
+                self._acquire(redis_client, started)
+        except Exception as e:
+            # Keep leading only until the lease would have expired in Redis
+            logger.error(f"Scheduler lease check failed: {e}")
+        if not self.held:
+            self.token = None
+        return self.held
+
+    def release(self) -> None:
+        redis_client = get_redis()
+        if redis_client and self.token:
+            try:
+                self._compare_and(redis_client, lambda pipe: pipe.delete(self.KEY))
+            except Exception:
+                pass
+        self.token = None
+
+    def verify(self) -> bool:
+        """Ask Redis whether this worker still holds the lease."""
+        redis_client = get_redis()
+        if not redis_client or not self.held:
+            return self.held
+        try:
+            return redis_client.get(self.KEY) == self._value
+        except Exception:
+            return self.held
+
+    @property
+    def _value(self) -> str:
+        return f"{self.owner}:{self.token}"
+
+    def _acquire(self, redis_client, started: float) -> None:
+        self.token = None
+        if redis_client.exists(self.KEY):
+            return
+        token = redis_client.incr(self.FENCE_KEY)
+        if redis_client.set(self.KEY, f"{self.owner}:{token}", nx=True, px=int(self.ttl * 1000)):
+            self.token = token
+            self._expires_at = started + self.ttl
+            logger.info(f"Scheduler leader: {self.owner} (fencing token {token})")
+
+    def _renew(self, redis_client) -> bool:
+        return self._compare_and(redis_client, lambda pipe: pipe.pexpire(self.KEY, int(self.ttl * 1000)))
+
+    def _compare_and(self, redis_client, command: Callable[[Any], Any]) -> bool:
+        """Run ``command`` in a transaction only while the key still holds this worker's value."""
+        with redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(self.KEY)
+                if pipe.get(self.KEY) != self._value:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                command(pipe)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    func: Callable[..., Any]
+    # Seconds between runs, or None to run after each ingestion run (with a session)
+    every: Optional[float]
+    # Runs on every worker instead of only the leader
+    local: bool = False
+    started_at: float = -math.inf
+    runs: int = 0
+    failures: int = 0
+    # Failures since the last success, and when the job may run again after them
+    consecutive_failures: int = 0
+    retry_at: float = 0.0
+    last_duration: Optional[float] = None
+    last_success: Optional[float] = None
+    last_error: Optional[str] = None
+    # Ingestion generation this job last completed; a failed run leaves it behind, so it is retried
+    generation: Optional[datetime] = None
+
+
+class Scheduler:
+    # Hash of job name -> ingestion generation it completed, shared by every leader
+    GENERATION_KEY = "scheduler:ingestion_generations"
+
+    def __init__(self, lock: LeaderLock, tick_seconds: float):
+        self.lock = lock
+        self.tick_seconds = tick_seconds
+        self._jobs: List[ScheduledJob] = []
+        self._running: Optional[asyncio.Task] = None
+        self._running_local: Optional[asyncio.Task] = None
+
+    def every(self, name: str, seconds: float, func: Callable[[], Any], local: bool = False) -> None:
+        self._jobs.append(ScheduledJob(name, func, seconds, local))
+
+    def after_ingestion(self, name: str, func: Callable[[Any], Any]) -> None:
+        """Run ``func(db)`` once for every new ``replication_logs`` generation."""
+        self._jobs.append(ScheduledJob(name, func, None))
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    def run_due(self) -> None:
+        """Run the periodic jobs that are due, then the ingestion jobs not yet completed for the current generation."""
+        now = time.monotonic()
+        for job in self._jobs:
+            if job.every is not None and not job.local and self._due(job, now):
+                self._run(job)
+
+        ingestion_jobs = [job for job in self._jobs if job.every is None]
+        if not ingestion_jobs:
+            return
+        db = SessionLocal()
+        try:
+            generation = replication_watcher.current(db)
+            if generation is None:
+                return
+            for job in ingestion_jobs:
+                if time.monotonic() < job.retry_at:
+                    continue
+                if job.generation == generation or self._completed_elsewhere(job, generation):
+                    continue
+                if not self._run(job, db):
+                    db.rollback()
+                    continue
+                job.generation = generation
+                if self.lock.verify():
+                    self._mark_generation(job, generation)
+        finally:
+            db.close()
+
+    def run_local(self) -> None:
+        """Run the local jobs that are due."""
+        now = time.monotonic()
+        for job in self._jobs:
+            if job.local and self._due(job, now):
+                self._run(job)
+
+    async def run_forever(self, elect: bool = True) -> None:
+        """
+        Run due local jobs every tick and, unless ``elect`` is off, renew or
+        seek the lease and run the leader's due jobs, all in the threadpool.
+        """
+        while True:
+            try:
+                # Each group runs beside the loop, so a long job only delays the next run of its own group
+                if self._running_local is None or self._running_local.done():
+                    self._running_local = asyncio.create_task(run_in_threadpool(self.run_local))
+                    self._running_local.add_done_callback(_log_failure)
+                leader = elect and await run_in_threadpool(self.lock.hold)
+                if settings.METRICS_ENABLED:
+                    metrics.SCHEDULER_LEADER.set(1 if leader else 0)
+                if leader and (self._running is None or self._running.done()):
+                    self._running = asyncio.create_task(run_in_threadpool(self.run_due))
+                    self._running.add_done_callback(_log_failure)
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def stop(self) -> None:
+        """Give up the lease so another worker takes over without waiting for it to expire."""
+        self.lock.release()
+        if settings.METRICS_ENABLED:
+            metrics.SCHEDULER_LEADER.set(0)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "owner": self.lock.owner,
+            "leader": self.lock.held,
+            "fencing_token": self.lock.token,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "every_seconds": job.every,
+                    "local": job.local,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_duration_ms": round(job.last_duration * 1000, 1) if job.last_duration is not None else None,
+                    "last_success": job.last_success,
+                    "last_error": job.last_error,
+                    "retry_in_seconds": round(max(job.retry_at - time.monotonic(), 0.0), 1),
+                    "ingestion_generation": job.generation.isoformat() if job.generation else None,
+                }
+                for job in self._jobs
+            ],
+        }
+
+    def _run(self, job: ScheduledJob, *args) -> bool:
+        if not job.local and not self.lock.held:
+            return False
+        job.started_at = time.monotonic()
+        job.runs += 1
+        token = _fencing_token.set(None if job.local else self.lock.token)
+        status = "success"
+        try:
+            job.func(*args)
+            job.last_success = time.time()
+            job.last_error = None
+            job.consecutive_failures = 0
+            job.retry_at = 0.0
+            if settings.METRICS_ENABLED:
+                metrics.SCHEDULER_JOB_LAST_SUCCESS.labels(job.name).set(job.last_success)
+        except Exception as e:
+            status = "error"
+            job.failures += 1
+            job.consecutive_failures += 1
+            job.last_error = str(e)
+            delay = min(self.tick_seconds * 2 ** (job.consecutive_failures - 1), _MAX_RETRY_SECONDS)
+            job.retry_at = time.monotonic() + delay
+            logger.error(f"Scheduled job {job.name} failed, retrying in {delay}s: {e}")
+        finally:
+            _fencing_token.reset(token)
+            job.last_duration = time.monotonic() - job.started_at
+            if settings.METRICS_ENABLED:
+                metrics.SCHEDULER_JOB_DURATION.labels(job.name, status).observe(job.last_duration)
+        # Local jobs run every few seconds on every worker
+        log = logger.debug if job.local else logger.info
+        log(f"Scheduled job {job.name} finished in {job.last_duration:.2f}s ({status})")
+        return status == "success"
+
+    @staticmethod
+    def _due(job: ScheduledJob, now: float) -> bool:
+        return now - job.started_at >= job.every and now >= job.retry_at
+
+    def _completed_elsewhere(self, job: ScheduledJob, generation: datetime) -> bool:
+        """Whether a previous leader already completed ``job`` for ``generation``."""
+        redis_client = get_redis()
+        if not redis_client:
+            return False
+        try:
+            completed = redis_client.hget(self.GENERATION_KEY, job.name) == generation.isoformat()
+        except Exception:
+            return False
+        if completed:
+            job.generation = generation
+        return completed
+
+    def _mark_generation(self, job: ScheduledJob, generation: datetime) -> None:
+        redis_client = get_redis()
+        if redis_client:
+            try:
+                redis_client.hset(self.GENERATION_KEY, job.name, generation.isoformat())
+            except Exception:
+                pass
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Scheduled jobs failed: {task.exception()}")
+
+
+scheduler = Scheduler(LeaderLock(settings.SCHEDULER_LEASE_SECONDS), settings.SCHEDULER_TICK_SECONDS)
+
+
+async def _demo(seconds: float) -> None:
+    scheduler.every("heartbeat", scheduler.tick_seconds, lambda: logger.info(f"heartbeat, token {fencing_token()}"))
+    loop = asyncio.create_task(scheduler.run_forever())
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        loop.cancel()
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run only the scheduler loop, with a heartbeat job")
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    check_redis()
+    asyncio.run(_demo(args.seconds))
@@ -1,11 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import logging
 import sys
 
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.memory import start_tracing
+from app.core.metrics import render_metrics
+from app.core.sql_stats import statement_stats
+from app.core.request_context import RequestStatsMiddleware
+from app.core.warmup import readiness, warm_up
 from app.api.v1.api import api_router
+from app.api import admin
 
 logging.basicConfig(
     level=logging.INFO if settings.ENVIRONMENT == "production" else logging.DEBUG,
@@ -17,7 +27,69 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+if settings.MEMORY_TRACING:
+    start_tracing(settings.MEMORY_TRACE_FRAMES)
+
+async def _warm_up_until_ready():
+    """Retry warm-up in the background after a failed first attempt (database unreachable)."""
+    while True:
+        await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+        if await run_in_threadpool(warm_up, readiness):
+            return
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm the worker before it takes traffic (see app.core.warmup), then start
+    the loop monitor and the job scheduler (per-worker index refresh and
+    leader-elected jobs). Heavy imports stay in here so importing the app
+    stays cheap.
+    """
+    from app.core.database import engine
+    from app.core.loop_monitor import loop_monitor
+    from app.core.snapshots import write_indexes
+    from app.jobs.cache_warmer import warm_popular_queries
+    from app.jobs.featured_feeds import refresh_featured_feeds
+    from app.jobs.indexes import refresh_indexes
+    from app.jobs.listing_index import build_listing_index
+    from app.jobs.scheduler import scheduler
+    
+    background = []
+    if not await run_in_threadpool(warm_up, readiness):
+        background.append(asyncio.create_task(_warm_up_until_ready()))
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
+    # Every worker keeps its own in-process indexes current
+    scheduler.every("indexes", scheduler.tick_seconds, refresh_indexes, local=True)
+    
+    # Background jobs run on whichever worker holds the scheduler lease
+    if settings.LISTING_INDEX_PATH:
+        scheduler.after_ingestion("listing_index", build_listing_index)
+    scheduler.after_ingestion("featured_feeds", refresh_featured_feeds)
+    scheduler.after_ingestion("cache_warmer", warm_popular_queries)
+    if settings.SNAPSHOT_DIR:
+        scheduler.every("snapshots", settings.SNAPSHOT_INTERVAL_SECONDS, write_indexes)
+    background.append(asyncio.create_task(scheduler.run_forever(elect=settings.SCHEDULER_ENABLED)))
+    
+    yield
+    
+    readiness.draining = True
+    was_leader = scheduler.is_leader
+    for task in background:
+        task.cancel()
+    loop_monitor.stop()
+    if settings.SCHEDULER_ENABLED:
+        await run_in_threadpool(scheduler.stop)
+    
+    # Leave current snapshots behind so the next start is warm
+    if settings.SNAPSHOT_DIR and was_leader:
+        await run_in_threadpool(write_indexes)
+    engine.dispose()
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.APP_NAME,
     version="1.0.0",
     description="Real Estate MLS Listings API",
@@ -34,11 +106,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestStatsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(admin.router, prefix="/admin", include_in_schema=False)
+
+@app.get("/livez", include_in_schema=False)
+async def liveness():
+    """Liveness: the process is up and its event loop is serving."""
+    return {"status": "alive"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness_check():
+    """Readiness: warm-up finished and the worker is not shutting down."""
+    status = readiness.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint for load balancers and monitoring."""
+async def health_check(detail: bool = False):
+    """Health check endpoint for load balancers and monitoring; ``detail`` adds worker saturation."""
     
     # Test database connection - just test the connection, no query
     db_status = "unhealthy"
@@ -69,12 +156,36 @@ async def health_check():
         "environment": settings.ENVIRONMENT,
         "database": db_status,
         "redis": redis_status,
+        "ready": readiness.ready,
         "debug": settings.DEBUG
     }
     
+    if detail:
+        from app.core.loop_monitor import loop_monitor
+        health_status["worker"] = loop_monitor.status()
+        health_status["worker"]["worst_stalls"] = loop_monitor.worst_stalls()
+    
     status_code = 200 if health_status["status"] == "healthy" else 503
     return JSONResponse(content=health_status, status_code=status_code)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/sql", include_in_schema=False)
+async def sql_statement_stats(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: str = Query("total", pattern="^(total|count|max)$")
+):
+    """Statement fingerprints by total time, executions or slowest run (DEBUG only)."""
+    if not settings.DEBUG:
+        raise HTTPException(status_code=404, detail="Not available")
+    return {"statements": statement_stats.top(limit, order_by)}
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
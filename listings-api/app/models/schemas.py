@@ -248,6 +248,22 @@ class ListingDetail(ListingBase):
         )
 
 
+class ListingBatchRequest(BaseModel):
+    listing_keys: List[str] = Field(..., min_length=1, description="Listing keys to fetch")
+
+
+class ListingBatchItem(BaseModel):
+    listing_key: str
+    found: bool
+    listing: Optional[ListingDetail] = None
+
+
+class ListingBatchResponse(BaseModel):
+    results: List[ListingBatchItem]
+    count: int
+    not_found: List[str]
+
+
 # Search request/response schemas
 class SearchFilters(BaseModel):
     transaction_type: Optional[TransactionType] = None
@@ -289,4 +305,16 @@ class FeaturedListingsResponse(BaseModel):
     listings: List[ListingSummary]
     office_name: Optional[str] = None
     office_key: str
-    count: int
\ No newline at end of file
+    count: int
+
+
+class FeaturedBatchItem(BaseModel):
+    office_key: str
+    found: bool
+    feed: Optional[FeaturedListingsResponse] = None
+
+
+class FeaturedBatchResponse(BaseModel):
+    results: List[FeaturedBatchItem]
+    count: int
+    not_found: List[str]
\ No newline at end of file
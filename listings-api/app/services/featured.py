@@ -1,13 +1,30 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc
-from typing import List, Optional, Dict, Any
+from collections import defaultdict
+from typing import List, Optional, Dict, Any, Tuple
+from app.core.request_context import timed
+from app.core.tracing import traced_methods
 from app.models.database import (
     ResidentialProperty, CommercialProperty, 
     ResidentialMedia, CommercialMedia
 )
 from app.models.schemas import FeaturedListingsResponse, ListingSummary, PropertyType
 
+FeedVariant = Tuple[Optional[PropertyType], int, Optional[str]]
 
+
+def featured_cache_key(
+    office_key: str,
+    property_type: Optional[PropertyType],
+    limit: int,
+    transaction_type: Optional[str]
+) -> str:
+    """Response cache key for one variant of an office's featured feed."""
+    property_type_value = property_type.value if property_type else None
+    return f"featured:{office_key}:{property_type_value}:{limit}:{transaction_type}"
+
+
+@traced_methods
 class FeaturedService:
     def __init__(self, db: Session):
         self.db = db
@@ -56,6 +73,90 @@ class FeaturedService:
             count=len(listings[:limit])
         )
     
+    def build_featured_feeds(
+        self,
+        office_key: str,
+        variants: List[FeedVariant]
+    ) -> Dict[FeedVariant, FeaturedListingsResponse]:
+        """
+        Render several variants of an office's featured feed at once, with the
+        same result get_featured_listings gives for each. One ranked query per
+        property table fetches the newest listings per transaction type (which
+        also covers the unfiltered variant), and one query per table fetches
+        their thumbnails. Variants without listings are left out.
+        """
+        depth = max(limit for _, limit, _ in variants)
+        residential = self._get_ranked_listings(
+            ResidentialProperty, [office_key], depth, per_transaction_type=True
+        )
+        commercial = self._get_ranked_listings(
+            CommercialProperty, [office_key], depth, per_transaction_type=True
+        )
+        thumbnails = self._get_thumbnail_urls(
+            [result.listing_key for result in residential], "residential"
+        )
+        thumbnails.update(self._get_thumbnail_urls(
+            [result.listing_key for result in commercial], "commercial"
+        ))
+        
+        feeds = {}
+        for variant in variants:
+            property_type, limit, transaction_type = variant
+            feed = self._assemble_feed(
+                office_key, residential, commercial, thumbnails,
+                property_type, limit, transaction_type
+            )
+            if feed:
+                feeds[variant] = feed
+        return feeds
+    
+    def get_featured_listings_batch(
+        self,
+        office_keys: List[str],
+        property_type: Optional[PropertyType] = None,
+        limit: int = 12,
+        transaction_type: Optional[str] = None
+    ) -> Dict[str, FeaturedListingsResponse]:
+        """
+        Featured listings for several offices, each as get_featured_listings
+        would return it, from one ranked query per property table and one
+        thumbnail query per table. Offices without listings are left out.
+        """
+        residential, commercial = [], []
+        if not property_type or property_type == PropertyType.RESIDENTIAL:
+            residential = self._get_ranked_listings(
+                ResidentialProperty, office_keys, limit, transaction_type
+            )
+        if not property_type or property_type == PropertyType.COMMERCIAL:
+            commercial = self._get_ranked_listings(
+                CommercialProperty, office_keys, limit, transaction_type
+            )
+        thumbnails = self._get_thumbnail_urls(
+            [result.listing_key for result in residential], "residential"
+        )
+        thumbnails.update(self._get_thumbnail_urls(
+            [result.listing_key for result in commercial], "commercial"
+        ))
+        
+        residential_by_office = defaultdict(list)
+        for result in residential:
+            residential_by_office[result.list_office_key].append(result)
+        commercial_by_office = defaultdict(list)
+        for result in commercial:
+            commercial_by_office[result.list_office_key].append(result)
+        
+        feeds = {}
+        for office_key in office_keys:
+            feed = self._assemble_feed(
+                office_key,
+                residential_by_office.get(office_key, []),
+                commercial_by_office.get(office_key, []),
+                thumbnails, property_type, limit, transaction_type
+            )
+            if feed:
+                feeds[office_key] = feed
+        return feeds
+    
     def get_office_info(self, office_key: str) -> Optional[Dict[str, Any]]:
         """Get basic information about a broker office."""
         # Try to get office name from residential properties first
@@ -109,9 +210,9 @@ class FeaturedService:
     def get_active_offices(
         self,
         property_type: Optional[PropertyType] = None,
-        limit: int = 50
+        limit: Optional[int] = 50
     ) -> List[Dict[str, Any]]:
-        """Get list of active broker offices that have listings."""
+        """Get list of active broker offices that have listings (all of them when limit is None)."""
         offices = {}
         
         # Get residential offices
@@ -249,6 +350,125 @@ class FeaturedService:
         
         return listings, office_name
     
+    def _assemble_feed(
+        self,
+        office_key: str,
+        residential: list,
+        commercial: list,
+        thumbnails: Dict[str, str],
+        property_type: Optional[PropertyType],
+        limit: int,
+        transaction_type: Optional[str]
+    ) -> Optional[FeaturedListingsResponse]:
+        """
+        Build a feed from pre-fetched candidates (newest first) the way
+        get_featured_listings does: residential first, commercial fills the
+        remaining slots, then everything is ordered by modification time.
+        """
+        listings = []
+        office_name = None
+        
+        if not property_type or property_type == PropertyType.RESIDENTIAL:
+            results = _take(residential, limit, transaction_type)
+            listings.extend(
+                ListingSummary.from_db_model(result, thumbnails.get(result.listing_key))
+                for result in results
+            )
+            if results:
+                office_name = results[0].list_office_name
+        
+        if not property_type or property_type == PropertyType.COMMERCIAL:
+            remaining_limit = limit - len(listings)
+            if remaining_limit > 0:
+                results = _take(commercial, remaining_limit, transaction_type)
+                listings.extend(
+                    ListingSummary.from_db_model(result, thumbnails.get(result.listing_key))
+                    for result in results
+                )
+                if not office_name and results:
+                    office_name = results[0].list_office_name
+        
+        if not listings:
+            return None
+        
+        listings.sort(key=lambda x: x.modification_timestamp or "", reverse=True)
+        return FeaturedListingsResponse(
+            listings=listings[:limit],
+            office_name=office_name,
+            office_key=office_key,
+            count=len(listings[:limit])
+        )
+    
+    def _get_ranked_listings(
+        self,
+        model,
+        office_keys: List[str],
+        depth: int,
+        transaction_type: Optional[str] = None,
+        per_transaction_type: bool = False
+    ) -> list:
+        """
+        Active listings of the given offices that rank within the newest
+        ``depth`` of their office (or of their office and transaction type),
+        newest first.
+        """
+        partition_by = [model.list_office_key]
+        if per_transaction_type:
+            partition_by.append(model.transaction_type)
+        
+        ranked = (
+            self.db.query(
+                model.listing_key,
+                func.row_number().over(
+                    partition_by=partition_by,
+                    order_by=desc(model.modification_timestamp)
+                ).label("rank")
+            )
+            .filter(
+                and_(
+                    model.list_office_key.in_(office_keys),
+                    model.standard_status == "Active"
+                )
+            )
+        )
+        if transaction_type:
+            ranked = ranked.filter(model.transaction_type == transaction_type)
+        ranked = ranked.subquery()
+        
+        return (
+            self.db.query(model)
+            .join(ranked, ranked.c.listing_key == model.listing_key)
+            .filter(ranked.c.rank <= depth)
+            .order_by(desc(model.modification_timestamp))
+            .all()
+        )
+    
+    @timed("thumbnails")
+    def _get_thumbnail_urls(self, listing_keys: List[str], property_type: str) -> Dict[str, str]:
+        """Thumbnail URL per listing in one query, picked like _get_thumbnail_url."""
+        if not listing_keys:
+            return {}
+        media_model = ResidentialMedia if property_type == "residential" else CommercialMedia
+        rows = (
+            self.db.query(media_model.resource_record_key, media_model.media_url)
+            .filter(
+                and_(
+                    media_model.resource_record_key.in_(listing_keys),
+                    media_model.image_size_description == "Thumbnail",
+                    media_model.media_url.isnot(None)
+                )
+            )
+            .distinct(media_model.resource_record_key)
+            .order_by(
+                media_model.resource_record_key,
+                media_model.preferred_photo_yn.desc(),
+                media_model.order.asc()
+            )
+            .all()
+        )
+        return {row.resource_record_key: row.media_url for row in rows}
+    
+    @timed("thumbnails")
     def _get_thumbnail_url(self, listing_key: str, property_type: str) -> Optional[str]:
         """Get thumbnail URL for a listing."""
         try:
@@ -287,4 +507,10 @@ class FeaturedService:
             
             return media.media_url if media else None
         except Exception:
-            return None
\ No newline at end of file
+            return None
+
+
+def _take(results: list, limit: int, transaction_type: Optional[str]) -> list:
+    if transaction_type:
+        results = [result for result in results if result.transaction_type == transaction_type]
+    return results[:limit]
@@ -1,55 +1,165 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from typing import List, Optional, Tuple, Union
+from sqlalchemy import and_, or_, func, text
+from typing import Dict, List, Optional, Tuple, Union
+from collections import defaultdict
+from datetime import datetime
+from app.core.request_context import timed
+from app.core.tracing import traced_methods
 from app.models.database import (
     ResidentialProperty, CommercialProperty, 
     ResidentialMedia, CommercialMedia
 )
-from app.models.schemas import ListingDetail, MediaItem, ListingSummary
+from app.models.schemas import (
+    ListingDetail, MediaItem, ListingSummary, PropertyAddress, PropertyCoordinates
+)
+from app.services.routing import listing_router, PROPERTY_MODELS, MEDIA_MODELS
+
+# json_build_object accepts at most 100 arguments (50 key/value pairs)
+JSON_BUILD_OBJECT_MAX_PAIRS = 50
+
+
+def json_object(fields: List[Tuple[str, str]], max_pairs: int = JSON_BUILD_OBJECT_MAX_PAIRS) -> str:
+    """
+    SQL for a json object of ``(key, expression)`` pairs in order. Objects
+    with more than ``max_pairs`` keys are built in chunks whose text is
+    spliced together, since jsonb's ``||`` would not keep the key order.
+    """
+    chunks = [
+        "json_build_object(" + ", ".join(
+            f"'{name}', {expression}" for name, expression in fields[start:start + max_pairs]
+        ) + ")"
+        for start in range(0, len(fields), max_pairs)
+    ]
+    if len(chunks) <= 1:
+        return chunks[0] if chunks else "json_build_object()"
+    # Strip each chunk's outer braces and join the members into one object
+    members = ", ".join(f"regexp_replace({chunk}::text, '^\\{{|\\}}$', '', 'g')" for chunk in chunks)
+    return f"('{{' || concat_ws(', ', {members}) || '}}')::json"
+
+
+def _build_detail_document_query(property_model, media_model, max_pairs: int = JSON_BUILD_OBJECT_MAX_PAIRS):
+    """
+    Build a statement that renders a complete ListingDetail document in
+    Postgres: the property as json_build_object plus its media as an ordered
+    json_agg. Keys follow the Pydantic field order so the output has the same
+    shape as ListingDetail.model_dump_json(). Fields the table lacks are null.
+    """
+    columns = property_model.__table__.columns
+    
+    def column(name: str) -> str:
+        return f'p."{name}"' if name in columns else "NULL"
+    
+    media_fields = [
+        (name, 'COALESCE(m."order", 0)' if name == "order" else f'm."{name}"')
+        for name in MediaItem.model_fields
+    ]
+    media_expression = (
+        f"COALESCE((SELECT json_agg({json_object(media_fields, max_pairs)} "
+        f'ORDER BY m.preferred_photo_yn DESC, m."order" ASC) '
+        f"FROM {media_model.__tablename__} m "
+        f"WHERE m.resource_record_key = p.listing_key), '[]'::json)"
+    )
+    
+    fields = []
+    for name in ListingDetail.model_fields:
+        if name == "address":
+            expression = json_object([(field, column(field)) for field in PropertyAddress.model_fields], max_pairs)
+        elif name == "coordinates":
+            expression = json_object([(field, column(field)) for field in PropertyCoordinates.model_fields], max_pairs)
+        elif name == "media":
+            expression = media_expression
+        else:
+            expression = column(name)
+        fields.append((name, expression))
+    
+    return text(
+        f"SELECT {json_object(fields, max_pairs)}::text AS document, p.modification_timestamp "
+        f"FROM {property_model.__tablename__} p "
+        f"WHERE p.listing_key = :listing_key"
+    )
+
 
+_DETAIL_DOCUMENT_QUERIES = {
+    property_type: _build_detail_document_query(model, MEDIA_MODELS[property_type])
+    for property_type, model in PROPERTY_MODELS.items()
+}
 
+
+@traced_methods
 class ListingsService:
     def __init__(self, db: Session):
         self.db = db
     
     def get_listing_by_key(self, listing_key: str) -> Optional[ListingDetail]:
         """Get detailed listing information by listing key."""
-        # Try residential first
-        residential = (
-            self.db.query(ResidentialProperty)
-            .filter(ResidentialProperty.listing_key == listing_key)
-            .first()
-        )
-        
-        if residential:
-            media = self._get_media_for_listing(listing_key, "residential")
-            return ListingDetail.from_db_model(residential, media)
+        property_type = listing_router.resolve(self.db, listing_key)
+        if not property_type:
+            return None
         
-        # Try commercial
-        commercial = (
-            self.db.query(CommercialProperty)
-            .filter(CommercialProperty.listing_key == listing_key)
+        model = PROPERTY_MODELS[property_type]
+        listing = (
+            self.db.query(model)
+            .filter(model.listing_key == listing_key)
             .first()
         )
+        if not listing:
+            return None
         
-        if commercial:
-            media = self._get_media_for_listing(listing_key, "commercial")
-            return ListingDetail.from_db_model(commercial, media)
-        
-        return None
+        media = self._get_media_for_listing(listing_key, property_type)
+        return ListingDetail.from_db_model(listing, media)
     
-    def get_listing_media(
-        self, 
-        listing_key: str, 
-        size_filter: Optional[str] = None
-    ) -> Optional[List[MediaItem]]:
-        """Get all media for a listing, optionally filtered by size."""
-        # Check if listing exists and determine type
-        exists, property_type = self.check_listing_exists(listing_key)
-        if not exists:
+    def get_listing_detail_json(self, listing_key: str) -> Optional[Tuple[bytes, Optional[datetime]]]:
+        """
+        Get a listing detail document rendered by Postgres in one statement.
+        Returns the JSON bytes and the listing modification timestamp.
+        """
+        property_type = listing_router.resolve(self.db, listing_key)
+        if not property_type:
             return None
         
-        return self._get_media_for_listing(listing_key, property_type, size_filter)
+        row = self.db.execute(
+            _DETAIL_DOCUMENT_QUERIES[property_type],
+            {"listing_key": listing_key}
+        ).first()
+        if not row:
+            return None
+        
+        return row.document.encode(), row.modification_timestamp
+    
+    def get_listings_by_keys(self, listing_keys: List[str]) -> Dict[str, ListingDetail]:
+        """
+        Get detailed listings for many keys at once.
+        Issues one IN query per property table and one media query per table.
+        Keys that do not exist are absent from the result.
+        """
+        details: Dict[str, ListingDetail] = {}
+        routed = listing_router.partition(self.db, listing_keys)
+        
+        for property_type, property_model in PROPERTY_MODELS.items():
+            if routed is not None:
+                candidates = routed.get(property_type, [])
+            else:
+                candidates = [key for key in listing_keys if key not in details]
+            if not candidates:
+                continue
+            
+            properties = (
+                self.db.query(property_model)
+                .filter(property_model.listing_key.in_(candidates))
+                .all()
+            )
+            if not properties:
+                continue
+            
+            media_by_listing = self._get_media_for_listings(
+                [prop.listing_key for prop in properties], MEDIA_MODELS[property_type]
+            )
+            for prop in properties:
+                details[prop.listing_key] = ListingDetail.from_db_model(
+                    prop, media_by_listing.get(prop.listing_key, [])
+                )
+        
+        return details
     
     def get_similar_listings(
         self, 
@@ -74,62 +184,60 @@ class ListingsService:
     
     def check_listing_exists(self, listing_key: str) -> Tuple[bool, Optional[str]]:
         """Check if a listing exists and return its property type."""
-        # Check residential
-        residential_exists = (
-            self.db.query(ResidentialProperty.listing_key)
-            .filter(ResidentialProperty.listing_key == listing_key)
-            .first()
-        )
-        if residential_exists:
-            return True, "residential"
-        
-        # Check commercial
-        commercial_exists = (
-            self.db.query(CommercialProperty.listing_key)
-            .filter(CommercialProperty.listing_key == listing_key)
+        property_type = listing_router.resolve(self.db, listing_key)
+        if not property_type:
+            return False, None
+        
+        # Confirm against the routed table only, in case the listing was removed
+        model = PROPERTY_MODELS[property_type]
+        exists = (
+            self.db.query(model.listing_key)
+            .filter(model.listing_key == listing_key)
             .first()
         )
-        if commercial_exists:
-            return True, "commercial"
+        if exists:
+            return True, property_type
         
         return False, None
     
-    def _get_media_for_listing(
-        self, 
-        listing_key: str, 
-        property_type: str, 
-        size_filter: Optional[str] = None
-    ) -> List[MediaItem]:
+    def _get_media_for_listing(self, listing_key: str, property_type: str) -> List[MediaItem]:
         """Get media items for a listing."""
-        if property_type == "residential":
-            query = (
-                self.db.query(ResidentialMedia)
-                .filter(ResidentialMedia.resource_record_key == listing_key)
-            )
-        else:
-            query = (
-                self.db.query(CommercialMedia)
-                .filter(CommercialMedia.resource_record_key == listing_key)
-            )
-        
-        # Apply size filter if provided
-        if size_filter:
-            query = query.filter(
-                func.lower(query.column_descriptions[0]['type'].image_size_description) == size_filter.lower()
+        media_model = MEDIA_MODELS[property_type]
+        media_results = (
+            self.db.query(media_model)
+            .filter(media_model.resource_record_key == listing_key)
+            .order_by(
+                media_model.preferred_photo_yn.desc(),
+                media_model.order.asc()
             )
+            .all()
+        )
         
-        # Order by preference and order
+        return [MediaItem.model_validate(media.__dict__) for media in media_results]
+    
+    def _get_media_for_listings(
+        self,
+        listing_keys: List[str],
+        media_model
+    ) -> Dict[str, List[MediaItem]]:
+        """Get media for several listings in one query, grouped by listing key."""
         media_results = (
-            query.order_by(
-                ResidentialMedia.preferred_photo_yn.desc() if property_type == "residential" 
-                else CommercialMedia.preferred_photo_yn.desc(),
-                ResidentialMedia.order.asc() if property_type == "residential" 
-                else CommercialMedia.order.asc()
+            self.db.query(media_model)
+            .filter(media_model.resource_record_key.in_(listing_keys))
+            .order_by(
+                media_model.resource_record_key,
+                media_model.preferred_photo_yn.desc(),
+                media_model.order.asc()
             )
             .all()
         )
         
-        return [MediaItem.model_validate(media.__dict__) for media in media_results]
+        media_by_listing: Dict[str, List[MediaItem]] = defaultdict(list)
+        for media in media_results:
+            media_by_listing[media.resource_record_key].append(
+                MediaItem.model_validate(media.__dict__)
+            )
+        return media_by_listing
     
     def _find_similar_residential(
         self, 
@@ -246,6 +354,7 @@ class ListingsService:
         
         return similar_listings
     
+    @timed("thumbnails")
     def _get_thumbnail_url(self, listing_key: str, property_type: str) -> Optional[str]:
         """Get thumbnail URL for a listing."""
         try:
@@ -1,13 +1,20 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
+from app.core.config import settings
+from app.core.request_context import record_cache_lookup, timed
+from app.core.tracing import traced_methods
 from app.models.database import ResidentialMedia, CommercialMedia
 from app.models.schemas import MediaItem
+from app.services.media_bundle import MediaBundle
+from app.services.routing import listing_router, PROPERTY_MODELS, MEDIA_MODELS
 
 
+@traced_methods
 class MediaService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, redis_client=None):
         self.db = db
+        self.redis = redis_client
     
     def get_media_by_listing(
         self,
@@ -15,63 +22,73 @@ class MediaService:
         size_filter: Optional[str] = None,
         media_type_filter: Optional[str] = None,
         limit: Optional[int] = None
-    ) -> Optional[List[MediaItem]]:
+    ) -> Optional[List[Dict[str, Any]]]:
         """Get media items for a specific listing with optional filtering."""
-        # Check if listing exists in either table
-        residential_exists = self._check_residential_listing_exists(listing_key)
-        commercial_exists = self._check_commercial_listing_exists(listing_key)
-        
-        if not residential_exists and not commercial_exists:
+        bundle = self.get_media_bundle(listing_key)
+        if bundle is None:
             return None
         
-        media_items = []
+        return bundle.select(size_filter, media_type_filter, limit)
+    
+    def get_media_bundle(self, listing_key: str) -> Optional[MediaBundle]:
+        """
+        Get all media for a listing as a cached bundle.
+        Fetched with one query against the routed media table.
+        """
+        cache_key = f"media_bundle:{listing_key}"
+        if self.redis:
+            try:
+                with timed("cache", "cache.get", namespace="media_bundle") as current:
+                    cached = self.redis.get(cache_key)
+                    if current:
+                        current.set("cache.hit", cached is not None)
+                record_cache_lookup("media_bundle", 1 if cached else 0, 0 if cached else 1)
+                if cached:
+                    return MediaBundle.from_json(cached)
+            except Exception:
+                pass
+        
+        property_type = listing_router.resolve(self.db, listing_key)
+        if not property_type:
+            return None
         
-        # Get residential media
-        if residential_exists:
-            residential_media = self._get_residential_media(
-                listing_key, size_filter, media_type_filter, limit
+        media_model = MEDIA_MODELS[property_type]
+        media_rows = (
+            self.db.query(media_model)
+            .filter(media_model.resource_record_key == listing_key)
+            .order_by(
+                media_model.preferred_photo_yn.desc(),
+                media_model.order.asc()
             )
-            media_items.extend(residential_media)
+            .all()
+        )
         
-        # Get commercial media
-        if commercial_exists:
-            remaining_limit = None
-            if limit and residential_exists:
-                remaining_limit = max(0, limit - len(media_items))
-            elif limit and not residential_exists:
-                remaining_limit = limit
-            
-            commercial_media = self._get_commercial_media(
-                listing_key, size_filter, media_type_filter, remaining_limit
-            )
-            media_items.extend(commercial_media)
+        # No media may also mean the listing was removed since it was indexed
+        if not media_rows and not self._listing_exists(listing_key, property_type):
+            return None
+        
+        bundle = MediaBundle.from_media_rows(listing_key, property_type, media_rows)
         
-        # Sort by preferred photo and order
-        media_items.sort(key=lambda x: (not x.preferred_photo_yn, x.order))
+        if self.redis:
+            try:
+                with timed("cache", "cache.set", namespace="media_bundle"):
+                    self.redis.setex(cache_key, settings.CACHE_TTL_SECONDS, bundle.to_json())
+            except Exception:
+                pass
         
-        return media_items[:limit] if limit else media_items
+        return bundle
     
     def get_media_by_key(self, media_key: str) -> Optional[MediaItem]:
         """Get a specific media item by its key."""
-        # Try residential media first
-        residential_media = (
-            self.db.query(ResidentialMedia)
-            .filter(ResidentialMedia.media_key == media_key)
-            .first()
-        )
-        
-        if residential_media:
-            return MediaItem.model_validate(residential_media.__dict__)
-        
-        # Try commercial media
-        commercial_media = (
-            self.db.query(CommercialMedia)
-            .filter(CommercialMedia.media_key == media_key)
-            .first()
-        )
-        
-        if commercial_media:
-            return MediaItem.model_validate(commercial_media.__dict__)
+        for property_type in listing_router.media_tables(self.db, media_key):
+            media_model = MEDIA_MODELS[property_type]
+            media = (
+                self.db.query(media_model)
+                .filter(media_model.media_key == media_key)
+                .first()
+            )
+            if media:
+                return MediaItem.model_validate(media.__dict__)
         
         return None
     
@@ -123,94 +140,12 @@ class MediaService:
         
         return sorted(list(types))
     
-    def _check_residential_listing_exists(self, listing_key: str) -> bool:
-        """Check if a residential listing exists."""
-        from app.models.database import ResidentialProperty
-        
+    def _listing_exists(self, listing_key: str, property_type: str) -> bool:
+        """Check if a listing exists in the given property table."""
+        model = PROPERTY_MODELS[property_type]
         exists = (
-            self.db.query(ResidentialProperty.listing_key)
-            .filter(ResidentialProperty.listing_key == listing_key)
+            self.db.query(model.listing_key)
+            .filter(model.listing_key == listing_key)
             .first()
         )
         return exists is not None
-    
-    def _check_commercial_listing_exists(self, listing_key: str) -> bool:
-        """Check if a commercial listing exists."""
-        from app.models.database import CommercialProperty
-        
-        exists = (
-            self.db.query(CommercialProperty.listing_key)
-            .filter(CommercialProperty.listing_key == listing_key)
-            .first()
-        )
-        return exists is not None
-    
-    def _get_residential_media(
-        self,
-        listing_key: str,
-        size_filter: Optional[str] = None,
-        media_type_filter: Optional[str] = None,
-        limit: Optional[int] = None
-    ) -> List[MediaItem]:
-        """Get residential media for a listing."""
-        query = self.db.query(ResidentialMedia).filter(
-            ResidentialMedia.resource_record_key == listing_key
-        )
-        
-        # Apply filters
-        if size_filter:
-            query = query.filter(
-                func.lower(ResidentialMedia.image_size_description) == size_filter.lower()
-            )
-        
-        if media_type_filter:
-            query = query.filter(
-                func.lower(ResidentialMedia.media_type) == media_type_filter.lower()
-            )
-        
-        # Order by preference and order
-        query = query.order_by(
-            ResidentialMedia.preferred_photo_yn.desc(),
-            ResidentialMedia.order.asc()
-        )
-        
-        if limit:
-            query = query.limit(limit)
-        
-        results = query.all()
-        return [MediaItem.model_validate(media.__dict__) for media in results]
-    
-    def _get_commercial_media(
-        self,
-        listing_key: str,
-        size_filter: Optional[str] = None,
-        media_type_filter: Optional[str] = None,
-        limit: Optional[int] = None
-    ) -> List[MediaItem]:
-        """Get commercial media for a listing."""
-        query = self.db.query(CommercialMedia).filter(
-            CommercialMedia.resource_record_key == listing_key
-        )
-        
-        # Apply filters
-        if size_filter:
-            query = query.filter(
-                func.lower(CommercialMedia.image_size_description) == size_filter.lower()
-            )
-        
-        if media_type_filter:
-            query = query.filter(
-                func.lower(CommercialMedia.media_type) == media_type_filter.lower()
-            )
-        
-        # Order by preference and order
-        query = query.order_by(
-            CommercialMedia.preferred_photo_yn.desc(),
-            CommercialMedia.order.asc()
-        )
-        
-        if limit:
-            query = query.limit(limit)
-        
-        results = query.all()
-        return [MediaItem.model_validate(media.__dict__) for media in results]
\ No newline at end of file
@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional
+import json
+
+from app.models.schemas import MediaItem
+
+
+class MediaBundle:
+    """
+    Every media item of one listing, fetched once and grouped by image size
+    and media type (case-insensitively), so any size/type/limit variant can be
+    answered from the same cached structure.
+    """
+
+    def __init__(
+        self,
+        listing_key: str,
+        property_type: str,
+        items: List[Dict[str, Any]],
+        by_size: Optional[Dict[str, List[int]]] = None,
+        by_type: Optional[Dict[str, List[int]]] = None
+    ):
+        self.listing_key = listing_key
+        self.property_type = property_type
+        self.items = items
+        self.by_size = by_size if by_size is not None else self._group(items, "image_size_description")
+        self.by_type = by_type if by_type is not None else self._group(items, "media_type")
+
+    @classmethod
+    def from_media_rows(cls, listing_key: str, property_type: str, media_rows) -> "MediaBundle":
+        """Build a bundle from ORM rows already ordered by preference and order."""
+        items = [
+            MediaItem.model_validate(media.__dict__).model_dump(mode="json")
+            for media in media_rows
+        ]
+        return cls(listing_key, property_type, items)
+
+    def select(
+        self,
+        size: Optional[str] = None,
+        media_type: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Return items matching the filters, keeping preference order."""
+        if size is None and media_type is None:
+            selected = self.items
+        else:
+            positions = None
+            if size is not None:
+                positions = self.by_size.get(size.lower(), [])
+            if media_type is not None:
+                type_positions = self.by_type.get(media_type.lower(), [])
+                if positions is None:
+                    positions = type_positions
+                else:
+                    allowed = set(type_positions)
+                    positions = [position for position in positions if position in allowed]
+            selected = [self.items[position] for position in positions]
+
+        return selected[:limit] if limit else selected
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "listing_key": self.listing_key,
+            "property_type": self.property_type,
+            "items": self.items,
+            "by_size": self.by_size,
+            "by_type": self.by_type,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "MediaBundle":
+        data = json.loads(raw)
+        return cls(
+            data["listing_key"],
+            data["property_type"],
+            data["items"],
+            by_size=data["by_size"],
+            by_type=data["by_type"],
+        )
+
+    @staticmethod
+    def _group(items: List[Dict[str, Any]], field: str) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = {}
+        for position, item in enumerate(items):
+            value = item.get(field)
+            if value:
+                groups.setdefault(value.lower(), []).append(position)
+        return groups
@@ -0,0 +1,388 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func
+from typing import Any, Dict, List, Optional, Set, Tuple
+from array import array
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+import logging
+import math
+import threading
+import time
+
+from app.core.config import settings
+from app.core.memory import CacheSizes, approximate_size
+from app.core.snapshots import (
+    Snapshot, SnapshotWriter, float_to_timestamp, isoformat, parse_isoformat, timestamp_to_float
+)
+from app.models.schemas import PropertyType
+from app.services.replication import replication_watcher
+from app.services.routing import PROPERTY_MODELS, RESIDENTIAL, COMMERCIAL
+
+logger = logging.getLogger(__name__)
+
+# First and longest wait before retrying a failed refresh
+_RETRY_SECONDS = 15
+_MAX_RETRY_SECONDS = 600
+
+# listing_key -> (office_key, office_name, property type, list price, modification timestamp)
+Contribution = Tuple[str, Optional[str], str, Optional[float], Optional[datetime]]
+
+
+@dataclass(frozen=True)
+class OfficeStats:
+    """Rollup of one office's active listings."""
+    office_key: str
+    office_name: Optional[str]
+    residential_listings: int
+    commercial_listings: int
+    latest_modification: Optional[datetime]
+    min_price: Optional[float]
+    max_price: Optional[float]
+
+    @property
+    def total_listings(self) -> int:
+        return self.residential_listings + self.commercial_listings
+
+
+class OfficeStatsIndex:
+    """
+    Per-office active listing counts, name, latest modification and price
+    range, held in memory so office endpoints never aggregate the property
+    tables per request.
+
+    Built once from the active listings, then kept current from rows whose
+    ``modification_timestamp`` moved past the last watermark whenever
+    ``replication_logs`` advances. Only offices touched by changed rows are
+    recomputed. Rows deleted by the replicator's cleanup leave no timestamp
+    behind. Once the changed rows are applied, the active count of each table
+    must equal the index's, so a key-only scan to drop them runs only when
+    it does not. Refreshing runs in the per-worker index job
+    (app.jobs.indexes); requests only read.
+    """
+
+    SNAPSHOT_KIND = "office_stats"
+    SNAPSHOT_SCHEMA = 1
+
+    def __init__(self, overlap_seconds: int):
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._offices: Dict[str, OfficeStats] = {}
+        self._contributions: Dict[str, Contribution] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._watermark: Optional[datetime] = None
+        self._generation: Optional[datetime] = None
+        self._loaded = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def refresh(self, db: Session) -> bool:
+        """
+        Load, or catch up once ingestion has advanced. After a failure the
+        next attempt waits twice as long. Returns whether stats are usable.
+        """
+        if time.monotonic() < self._retry_at:
+            return self._loaded
+        if self._is_current(replication_watcher.current(db)):
+            return True
+
+        with self._lock:
+            generation = replication_watcher.current(db)
+            if self._is_current(generation):
+                return True
+            try:
+                if not self._loaded:
+                    self._full_load(db)
+                else:
+                    self._catch_up(db)
+                self._generation = generation
+                self._failures = 0
+                self._retry_at = 0.0
+            except Exception as e:
+                db.rollback()
+                self._failures += 1
+                delay = min(_RETRY_SECONDS * 2 ** (self._failures - 1), _MAX_RETRY_SECONDS)
+                self._retry_at = time.monotonic() + delay
+                logger.error(f"Office stats refresh failed, retrying in {delay}s: {e}")
+        return self._loaded
+
+    def offices(self) -> List[OfficeStats]:
+        """Every office with at least one active listing."""
+        return list(self._offices.values())
+
+    def cache_sizes(self) -> CacheSizes:
+        # Catch-ups change contributions and members in place
+        with self._lock:
+            return {
+                "office_stats": (len(self._offices), approximate_size(self._offices)),
+                "office_contributions": (len(self._contributions), approximate_size(self._contributions)),
+                "office_members": (len(self._members), approximate_size(self._members)),
+            }
+
+    def snapshot_version(self) -> Optional[Tuple[Optional[datetime], Optional[datetime]]]:
+        return (self._watermark, self._generation) if self._loaded else None
+
+    def to_snapshot(self) -> Optional[SnapshotWriter]:
+        """Contributions as columns; offices and names are dictionary-encoded."""
+        with self._lock:
+            if not self._loaded:
+                return None
+            office_ids: Dict[str, int] = {}
+            name_ids: Dict[str, int] = {}
+            type_ids = {property_type: i for i, property_type in enumerate(PROPERTY_MODELS)}
+            offices, names, types = array("i"), array("i"), array("b")
+            prices, modified = array("d"), array("d")
+            for office_key, office_name, property_type, price, timestamp in self._contributions.values():
+                offices.append(office_ids.setdefault(office_key, len(office_ids)))
+                names.append(name_ids.setdefault(office_name, len(name_ids)) if office_name is not None else -1)
+                types.append(type_ids[property_type])
+                prices.append(price if price is not None else math.nan)
+                modified.append(timestamp_to_float(timestamp))
+            writer = SnapshotWriter(self.SNAPSHOT_KIND, self.SNAPSHOT_SCHEMA, {
+                "watermark": isoformat(self._watermark),
+                "generation": isoformat(self._generation),
+                "property_types": list(type_ids),
+                "timezone_aware": self._watermark is not None and self._watermark.tzinfo is not None,
+            })
+            writer.add_strings("listing_keys", self._contributions)
+            writer.add_strings("office_keys", office_ids)
+            writer.add_strings("office_names", name_ids)
+            writer.add_array("office", offices)
+            writer.add_array("name", names)
+            writer.add_array("type", types)
+            writer.add_array("price", prices)
+            writer.add_array("modified", modified)
+            return writer
+
+    def restore_snapshot(self, snapshot: Snapshot) -> None:
+        """Install the index from a snapshot; refresh catches up once ingestion moves past its generation."""
+        office_keys = snapshot.strings("office_keys")
+        office_names = snapshot.strings("office_names")
+        property_types = snapshot.meta["property_types"]
+        aware = snapshot.meta["timezone_aware"]
+        contributions: Dict[str, Contribution] = {}
+        members: Dict[str, Set[str]] = {}
+        columns = zip(
+            snapshot.strings("listing_keys"), snapshot.array("office"), snapshot.array("name"),
+            snapshot.array("type"), snapshot.array("price"), snapshot.array("modified"),
+        )
+        for listing_key, office, name, property_type, price, modified in columns:
+            office_key = office_keys[office]
+            contributions[listing_key] = (
+                office_key,
+                office_names[name] if name >= 0 else None,
+                property_types[property_type],
+                None if math.isnan(price) else price,
+                float_to_timestamp(modified, aware),
+            )
+            members.setdefault(office_key, set()).add(listing_key)
+        offices = {
+            office_key: _rollup(office_key, listing_keys, contributions)
+            for office_key, listing_keys in members.items()
+        }
+        with self._lock:
+            self._contributions = contributions
+            self._members = members
+            self._offices = offices
+            self._watermark = parse_isoformat(snapshot.meta["watermark"])
+            self._generation = parse_isoformat(snapshot.meta["generation"])
+            self._loaded = True
+
+    def get_active_offices(
+        self,
+        property_type: Optional[PropertyType] = None,
+        limit: Optional[int] = 50
+    ) -> List[Dict[str, Any]]:
+        """Same result as FeaturedService.get_active_offices."""
+        offices = []
+        for stats in self._offices.values():
+            residential = stats.residential_listings
+            commercial = stats.commercial_listings
+            if property_type == PropertyType.RESIDENTIAL:
+                commercial = 0
+            elif property_type == PropertyType.COMMERCIAL:
+                residential = 0
+            if residential + commercial == 0:
+                continue
+            offices.append({
+                "office_key": stats.office_key,
+                "office_name": stats.office_name,
+                "residential_listings": residential,
+                "commercial_listings": commercial,
+                "total_listings": residential + commercial,
+            })
+        offices.sort(key=lambda x: x["total_listings"], reverse=True)
+        return offices[:limit]
+
+    def get_office_info(self, office_key: str) -> Optional[Dict[str, Any]]:
+        """FeaturedService.get_office_info plus the rollup's extra fields."""
+        stats = self._offices.get(office_key)
+        if stats is None:
+            return None
+        return {
+            "office_key": stats.office_key,
+            "office_name": stats.office_name,
+            "total_listings": stats.total_listings,
+            "residential_listings": stats.residential_listings,
+            "commercial_listings": stats.commercial_listings,
+            "latest_modification": stats.latest_modification,
+            "min_price": stats.min_price,
+            "max_price": stats.max_price,
+        }
+
+    def _is_current(self, generation: Optional[datetime]) -> bool:
+        if not self._loaded:
+            return False
+        return generation is None or (self._generation is not None and generation <= self._generation)
+
+    def _full_load(self, db: Session) -> None:
+        started = time.monotonic()
+        contributions: Dict[str, Contribution] = {}
+        members: Dict[str, Set[str]] = {}
+        watermark = None
+
+        for property_type, model in PROPERTY_MODELS.items():
+            rows = (
+                db.query(
+                    model.listing_key,
+                    model.list_office_key,
+                    model.list_office_name,
+                    model.list_price,
+                    model.modification_timestamp
+                )
+                .filter(_counted(model))
+                .yield_per(10000)
+            )
+            for listing_key, office_key, office_name, price, modified in rows:
+                contributions[listing_key] = (office_key, office_name, property_type, price, modified)
+                members.setdefault(office_key, set()).add(listing_key)
+
+            latest = db.query(func.max(model.modification_timestamp)).scalar()
+            if latest and (watermark is None or latest > watermark):
+                watermark = latest
+
+        offices = {}
+        for office_key, listing_keys in members.items():
+            offices[office_key] = _rollup(office_key, listing_keys, contributions)
+
+        self._contributions = contributions
+        self._members = members
+        self._offices = offices
+        self._watermark = watermark
+        self._loaded = True
+        logger.info(
+            f"Office stats loaded: {len(offices)} offices, {len(contributions)} listings in "
+            f"{time.monotonic() - started:.2f}s"
+        )
+
+    def _catch_up(self, db: Session) -> None:
+        since = self._watermark - self.overlap if self._watermark else None
+        watermark = self._watermark
+        dirty: Set[str] = set()
+
+        for property_type, model in PROPERTY_MODELS.items():
+            query = db.query(
+                model.listing_key,
+                model.list_office_key,
+                model.list_office_name,
+                model.list_price,
+                model.modification_timestamp,
+                model.standard_status
+            )
+            if since is not None:
+                query = query.filter(model.modification_timestamp > since)
+
+            for listing_key, office_key, office_name, price, modified, status in query:
+                if modified and (watermark is None or modified > watermark):
+                    watermark = modified
+                dirty.update(self._discard(listing_key))
+                if status == "Active" and office_key is not None:
+                    self._contributions[listing_key] = (office_key, office_name, property_type, price, modified)
+                    self._members.setdefault(office_key, set()).add(listing_key)
+                    dirty.add(office_key)
+
+            # After the changed rows, so a deletion offset by an insertion still shows in the counts
+            dirty.update(self._drop_deleted(db, property_type, model))
+
+        if dirty:
+            # Copy-on-write so readers never iterate a dict being resized
+            offices = dict(self._offices)
+            for office_key in dirty:
+                listing_keys = self._members.get(office_key)
+                if listing_keys:
+                    offices[office_key] = _rollup(office_key, listing_keys, self._contributions)
+                else:
+                    self._members.pop(office_key, None)
+                    offices.pop(office_key, None)
+            self._offices = offices
+        self._watermark = watermark
+
+    def _drop_deleted(self, db: Session, property_type: str, model) -> Set[str]:
+        """Remove contributions of listings no longer active in ``model``'s table."""
+        expected = sum(
+            1 for contribution in self._contributions.values() if contribution[2] == property_type
+        )
+        actual = db.query(func.count(model.listing_key)).filter(_counted(model)).scalar() or 0
+        if actual == expected:
+            return set()
+
+        present = {
+            listing_key for (listing_key,) in
+            db.query(model.listing_key).filter(_counted(model)).yield_per(50000)
+        }
+        stale = [
+            listing_key for listing_key, contribution in self._contributions.items()
+            if contribution[2] == property_type and listing_key not in present
+        ]
+        dirty = set()
+        for listing_key in stale:
+            dirty.update(self._discard(listing_key))
+        return dirty
+
+    def _discard(self, listing_key: str) -> Set[str]:
+        contribution = self._contributions.pop(listing_key, None)
+        if contribution is None:
+            return set()
+        office_key = contribution[0]
+        listing_keys = self._members.get(office_key)
+        if listing_keys is not None:
+            listing_keys.discard(listing_key)
+        return {office_key}
+
+
+def _counted(model):
+    return and_(model.standard_status == "Active", model.list_office_key.isnot(None))
+
+
+def _rollup(office_key: str, listing_keys: Set[str], contributions: Dict[str, Contribution]) -> OfficeStats:
+    counts = {RESIDENTIAL: 0, COMMERCIAL: 0}
+    office_name = None
+    name_modified = None
+    latest = None
+    prices = []
+    for listing_key in listing_keys:
+        _, name, property_type, price, modified = contributions[listing_key]
+        counts[property_type] += 1
+        if price is not None:
+            prices.append(price)
+        if modified is not None and (latest is None or modified > latest):
+            latest = modified
+        # Name from the most recently modified listing that carries one
+        if name and (office_name is None or (modified is not None and (name_modified is None or modified > name_modified))):
+            office_name = name
+            name_modified = modified
+    return OfficeStats(
+        office_key=office_key,
+        office_name=office_name,
+        residential_listings=counts[RESIDENTIAL],
+        commercial_listings=counts[COMMERCIAL],
+        latest_modification=latest,
+        min_price=min(prices) if prices else None,
+        max_price=max(prices) if prices else None,
+    )
+
+
+office_stats = OfficeStatsIndex(overlap_seconds=settings.INDEX_CATCHUP_OVERLAP_SECONDS)
@@ -0,0 +1,187 @@
+from sqlalchemy.orm import Session
+from typing import List, Mapping, Optional, Tuple
+from types import MappingProxyType
+from datetime import datetime
+from dataclasses import dataclass
+import logging
+import threading
+import time
+
+from app.core.memory import CacheSizes, deep_size
+from app.core.snapshots import Snapshot, SnapshotWriter, isoformat, parse_isoformat
+from app.models.schemas import PropertyType
+from app.services.media import MediaService
+from app.services.replication import replication_watcher
+from app.services.search import SearchService
+
+logger = logging.getLogger(__name__)
+
+# First and longest wait before retrying a failed rebuild
+_RETRY_SECONDS = 15
+_MAX_RETRY_SECONDS = 600
+
+_PROPERTY_TYPES = {
+    "residential": PropertyType.RESIDENTIAL,
+    "commercial": PropertyType.COMMERCIAL,
+}
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """
+    Immutable snapshot of slow-changing dictionaries: property sub-types and
+    media sizes and types. Keyed by lower-case property type
+    ("residential" / "commercial").
+    """
+    generation: Optional[datetime]
+    loaded_at: float
+    property_subtypes: Mapping[str, Tuple[str, ...]]
+    media_sizes: Mapping[str, Tuple[str, ...]]
+    media_types: Mapping[str, Tuple[str, ...]]
+
+    def get_property_subtypes(self, property_type: Optional[PropertyType] = None) -> List[str]:
+        return self._union(self.property_subtypes, property_type.value if property_type else None)
+
+    def get_media_sizes(self, property_type: Optional[str] = None) -> List[str]:
+        return self._union(self.media_sizes, property_type)
+
+    def get_media_types(self, property_type: Optional[str] = None) -> List[str]:
+        return self._union(self.media_types, property_type)
+
+    @staticmethod
+    def _union(values: Mapping[str, Tuple[str, ...]], property_type: Optional[str]) -> List[str]:
+        if property_type:
+            return list(values.get(property_type.lower(), ()))
+        merged = set()
+        for items in values.values():
+            merged.update(items)
+        return sorted(merged)
+
+
+def build_reference_data(db: Session, generation: Optional[datetime] = None) -> ReferenceData:
+    """Load every reference dictionary from Postgres into a new snapshot."""
+    search_service = SearchService(db)
+    media_service = MediaService(db)
+
+    return ReferenceData(
+        generation=generation,
+        loaded_at=time.time(),
+        property_subtypes=MappingProxyType({
+            key: tuple(search_service.get_property_subtypes(property_type))
+            for key, property_type in _PROPERTY_TYPES.items()
+        }),
+        media_sizes=MappingProxyType({
+            key: tuple(media_service.get_available_sizes(key)) for key in _PROPERTY_TYPES
+        }),
+        media_types=MappingProxyType({
+            key: tuple(media_service.get_available_types(key)) for key in _PROPERTY_TYPES
+        }),
+    )
+
+
+class ReferenceDataRegistry:
+    """
+    Holds the current ReferenceData snapshot. Readers always get a complete
+    snapshot; once ``replication_logs`` shows new data, the per-worker index
+    job (app.jobs.indexes) builds the next one while readers keep the old
+    one, and swaps it in with a single assignment.
+    """
+
+    SNAPSHOT_KIND = "reference_data"
+    SNAPSHOT_SCHEMA = 1
+
+    def __init__(self):
+        self._snapshot: Optional[ReferenceData] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> Optional[ReferenceData]:
+        return self._snapshot
+
+    def cache_sizes(self) -> CacheSizes:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"reference_data": (0, 0)}
+        entries = sum(
+            len(values) for mapping in (snapshot.property_subtypes, snapshot.media_sizes, snapshot.media_types)
+            for values in mapping.values()
+        )
+        return {"reference_data": (entries, deep_size(snapshot))}
+
+    def snapshot_version(self) -> Optional[Tuple[Optional[datetime], float]]:
+        snapshot = self._snapshot
+        return (snapshot.generation, snapshot.loaded_at) if snapshot is not None else None
+
+    def to_snapshot(self) -> Optional[SnapshotWriter]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return SnapshotWriter(self.SNAPSHOT_KIND, self.SNAPSHOT_SCHEMA, {
+            "generation": isoformat(snapshot.generation),
+            "loaded_at": snapshot.loaded_at,
+            "property_subtypes": dict(snapshot.property_subtypes),
+            "media_sizes": dict(snapshot.media_sizes),
+            "media_types": dict(snapshot.media_types),
+        })
+
+    def restore_snapshot(self, snapshot: Snapshot) -> None:
+        """Install reference data from a snapshot; refresh rebuilds once ingestion moves past its generation."""
+        meta = snapshot.meta
+        self._snapshot = ReferenceData(
+            generation=parse_isoformat(meta["generation"]),
+            loaded_at=meta["loaded_at"],
+            property_subtypes=MappingProxyType({key: tuple(values) for key, values in meta["property_subtypes"].items()}),
+            media_sizes=MappingProxyType({key: tuple(values) for key, values in meta["media_sizes"].items()}),
+            media_types=MappingProxyType({key: tuple(values) for key, values in meta["media_types"].items()}),
+        )
+
+    def load(self, db: Session) -> ReferenceData:
+        """Build and install a fresh snapshot."""
+        with self._lock:
+            return self._rebuild(db)
+
+    def get(self, db: Session) -> ReferenceData:
+        """Current snapshot; only built here when nothing has loaded one yet."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            return self._snapshot or self._rebuild(db)
+
+    def refresh(self, db: Session) -> None:
+        """
+        Build the first snapshot, or the next one once ingestion has advanced
+        past it. After a failure the next attempt waits twice as long.
+        """
+        if time.monotonic() < self._retry_at:
+            return
+        snapshot = self._snapshot
+        if snapshot is not None:
+            generation = replication_watcher.current(db)
+            if generation is None or (snapshot.generation is not None and generation <= snapshot.generation):
+                return
+        with self._lock:
+            if self._snapshot is not snapshot:
+                return
+            try:
+                self._rebuild(db)
+                self._failures = 0
+                self._retry_at = 0.0
+            except Exception as e:
+                db.rollback()
+                self._failures += 1
+                delay = min(_RETRY_SECONDS * 2 ** (self._failures - 1), _MAX_RETRY_SECONDS)
+                self._retry_at = time.monotonic() + delay
+                logger.error(f"Reference data rebuild failed, retrying in {delay}s: {e}")
+
+    def _rebuild(self, db: Session) -> ReferenceData:
+        started = time.monotonic()
+        snapshot = build_reference_data(db, replication_watcher.current(db))
+        self._snapshot = snapshot
+        logger.info(f"Reference data loaded in {time.monotonic() - started:.2f}s")
+        return snapshot
+
+
+reference_data = ReferenceDataRegistry()
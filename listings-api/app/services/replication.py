@@ -0,0 +1,40 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Optional
+from datetime import datetime
+import logging
+import time
+
+from app.core.config import settings
+from app.models.database import ReplicationLog
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicationWatcher:
+    """
+    Throttled view of the newest ``replication_logs.last_replicated_at``.
+    In-process caches compare it with the generation they were built from to
+    decide when ingestion has produced new data.
+    """
+
+    def __init__(self, poll_seconds: int):
+        self.poll_seconds = poll_seconds
+        self._generation: Optional[datetime] = None
+        self._checked_at: Optional[float] = None
+
+    def current(self, db: Session) -> Optional[datetime]:
+        """Latest replication timestamp, re-read at most every poll interval."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.poll_seconds:
+            return self._generation
+
+        try:
+            self._generation = db.query(func.max(ReplicationLog.last_replicated_at)).scalar()
+        except Exception as e:
+            logger.error(f"Failed to read replication_logs: {e}")
+        self._checked_at = now
+        return self._generation
+
+
+replication_watcher = ReplicationWatcher(settings.REPLICATION_POLL_SECONDS)
@@ -0,0 +1,428 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime, timedelta
+from bisect import bisect_left
+import logging
+import os
+import threading
+import time
+
+from app.core.config import settings
+from app.core.memory import CacheSizes, approximate_size
+from app.core.snapshots import Snapshot, SnapshotWriter, isoformat, parse_isoformat
+from app.models.database import (
+    ResidentialProperty, CommercialProperty,
+    ResidentialMedia, CommercialMedia
+)
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+RESIDENTIAL = "residential"
+COMMERCIAL = "commercial"
+
+PROPERTY_MODELS = {
+    RESIDENTIAL: ResidentialProperty,
+    COMMERCIAL: CommercialProperty,
+}
+
+MEDIA_MODELS = {
+    RESIDENTIAL: ResidentialMedia,
+    COMMERCIAL: CommercialMedia,
+}
+
+_IN_CHUNK_SIZE = 1000
+
+# Longest wait before retrying a failed load
+_MAX_RETRY_SECONDS = 600
+
+# Keys found by probing the tables, kept until the index itself has them
+_FOUND_MAX_ENTRIES = 10000
+
+# Keys the tables did not have when probed, answered as 404 until the next catch-up or generation
+_MISSING_MAX_ENTRIES = 50000
+
+
+def build_media_filter(db: Session, property_type: str, error_rate: float) -> BloomFilter:
+    """Bloom filter over every media key of ``property_type``'s media table."""
+    media_model = MEDIA_MODELS[property_type]
+    media_count = db.query(func.count(media_model.media_key)).scalar() or 0
+    # Headroom so incremental additions do not force an early rebuild
+    media_filter = BloomFilter(int(media_count * 1.5), error_rate)
+    for (media_key,) in db.query(media_model.media_key).yield_per(50000):
+        media_filter.add(media_key)
+    return media_filter
+
+
+class SharedListingIndex:
+    """
+    Read side of the shared listing index file (LISTING_INDEX_PATH), written
+    by app.jobs.listing_index after each ingestion run.
+
+    Listing keys are stored sorted as one byte string plus an offsets column,
+    next to a property type column and the media Bloom filter bits. The file
+    is mapped read-only, so all workers share the same page-cache pages and
+    lookups binary-search the mapping without building any per-worker copy.
+    """
+
+    SNAPSHOT_KIND = "listing_index"
+    SNAPSHOT_SCHEMA = 1
+
+    def __init__(self, snapshot: Snapshot):
+        meta = snapshot.meta
+        self.file_id = snapshot.file_id
+        self.size = snapshot.size
+        self.generation = parse_isoformat(meta["generation"])
+        # Scheduler fencing token it was written under (None when built outside the scheduler); informational only
+        self.fence: Optional[int] = meta.get("fence")
+        self._property_types: List[str] = meta["property_types"]
+        self._offsets = snapshot.array("key_offsets")
+        self._keys = snapshot.bytes("keys")
+        self._types = snapshot.array("property_type")
+        self.media_filters = {
+            property_type: BloomFilter.from_buffer(capacity, error_rate, count, snapshot.bytes(f"media.{property_type}"))
+            for property_type, (capacity, error_rate, count) in meta["media_filters"].items()
+        }
+
+    @classmethod
+    def open(cls, path: str) -> Optional["SharedListingIndex"]:
+        snapshot = Snapshot.open(path, cls.SNAPSHOT_KIND, cls.SNAPSHOT_SCHEMA, shared=True)
+        if snapshot is None:
+            return None
+        try:
+            return cls(snapshot)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring shared listing index {path}: {e}")
+            snapshot.close()
+            return None
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def resolve(self, listing_key: str) -> Optional[str]:
+        target = listing_key.encode()
+        position = bisect_left(range(len(self._types)), target, key=self._key)
+        if position < len(self._types) and self._key(position) == target:
+            return self._property_types[self._types[position]]
+        return None
+
+    def _key(self, position: int) -> bytes:
+        return self._keys[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+
+class ListingRouter:
+    """
+    In-process routing index so lookups hit the right table on the first try.
+
+    Listing keys map exactly to their property table. Media keys are far more
+    numerous, so each media table gets a Bloom filter instead: a miss in every
+    filter is a definite 404 without touching Postgres.
+
+    The index loads once and then catches up incrementally from
+    ``modification_timestamp`` (with an overlap window for late writes).
+    Loading and catching up happen in ``refresh``, run by the per-worker
+    index job (app.jobs.indexes), never on a request. Until the index is
+    loaded, and for listing keys it does not know yet, callers fall back to
+    probing both tables. Keys the probe did not find either are remembered
+    as 404s until the next catch-up, so repeated unknown keys (scrapers) do
+    not reach Postgres again.
+
+    With a ``shared_path`` the worker keeps no index of its own: it maps the
+    SharedListingIndex file and swaps to each new generation in one
+    assignment once the builder has renamed it into place. Keys added since
+    that generation was written are probed like any miss, and remembered
+    per worker until the next generation is mapped.
+    """
+
+    SNAPSHOT_KIND = "listing_routes"
+    SNAPSHOT_SCHEMA = 1
+
+    def __init__(
+        self,
+        refresh_seconds: int,
+        overlap_seconds: int,
+        media_error_rate: float,
+        shared_path: Optional[str] = None
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.media_error_rate = media_error_rate
+        self.shared_path = shared_path
+        self._shared: Optional[SharedListingIndex] = None
+        self._routes: Dict[str, str] = {}
+        # Written by request threads; swapped out whole by refresh
+        self._found: Dict[str, str] = {}
+        self._missing: Set[str] = set()
+        self._media_filters: Dict[str, BloomFilter] = {}
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._refreshed_at = 0.0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded or self._shared is not None
+
+    def refresh(self, db: Session) -> bool:
+        """
+        Load or catch up the index when due, or follow the shared file.
+        Requests keep using the current state meanwhile; after a failed load
+        the next attempt waits twice as long. Returns whether it is usable.
+        """
+        if self.shared_path:
+            return self._follow_shared()
+        now = time.monotonic()
+        if now < self._retry_at or (self._loaded and now - self._refreshed_at < self.refresh_seconds):
+            return self._loaded
+
+        with self._lock:
+            try:
+                if not self._loaded or self._needs_rebuild():
+                    self._full_load(db)
+                else:
+                    self._catch_up(db)
+                self._failures = 0
+                self._retry_at = 0.0
+            except Exception as e:
+                db.rollback()
+                self._failures += 1
+                delay = min(self.refresh_seconds * 2 ** (self._failures - 1), _MAX_RETRY_SECONDS)
+                self._retry_at = time.monotonic() + delay
+                logger.error(f"Listing routing index refresh failed, retrying in {delay}s: {e}")
+            finally:
+                self._refreshed_at = time.monotonic()
+        return self._loaded
+
+    def resolve(self, db: Session, listing_key: str) -> Optional[str]:
+        """Return the property table a listing lives in, or None if it does not exist."""
+        if self.loaded:
+            property_type = self._route(listing_key)
+            if property_type is not None or listing_key in self._missing:
+                return property_type
+        return self._probe(db, [listing_key]).get(listing_key)
+
+    def partition(self, db: Session, listing_keys: List[str]) -> Optional[Dict[str, List[str]]]:
+        """
+        Group listing keys by property table, dropping unknown keys.
+        Returns None while the index is unavailable.
+        """
+        if not self.loaded:
+            return None
+        grouped: Dict[str, List[str]] = {}
+        missing = []
+        for listing_key in listing_keys:
+            property_type = self._route(listing_key)
+            if property_type:
+                grouped.setdefault(property_type, []).append(listing_key)
+            elif listing_key not in self._missing:
+                missing.append(listing_key)
+        if missing:
+            for listing_key, property_type in self._probe(db, missing).items():
+                grouped.setdefault(property_type, []).append(listing_key)
+        return grouped
+
+    def media_tables(self, db: Session, media_key: str) -> List[str]:
+        """Return the media tables that may contain ``media_key``, most likely first."""
+        if not self.loaded:
+            return list(MEDIA_MODELS)
+        media_filters = self._shared.media_filters if self._shared is not None else self._media_filters
+        return [
+            property_type for property_type, media_filter in media_filters.items()
+            if media_key in media_filter
+        ]
+
+    def cache_sizes(self) -> CacheSizes:
+        # Request threads add probed keys without the lock, so measure copies
+        found = dict(self._found)
+        missing = set(self._missing)
+        probed = {
+            "listing_routes_probed": (len(found), approximate_size(found)),
+            "listing_routes_missing": (len(missing), approximate_size(missing)),
+        }
+        shared = self._shared
+        if shared is not None:
+            # Mapped file pages, shared with the other workers
+            return {"listing_index_mapped": (len(shared), shared.size), **probed}
+        # Catch-ups add routes in place
+        with self._lock:
+            return {
+                "listing_routes": (len(self._routes), approximate_size(self._routes)),
+                "media_filters": (
+                    sum(media_filter.count for media_filter in self._media_filters.values()),
+                    sum(len(media_filter.bits) for media_filter in self._media_filters.values()),
+                ),
+                **probed,
+            }
+
+    def snapshot_version(self) -> Optional[datetime]:
+        return self._watermark if self._loaded else None
+
+    def to_snapshot(self) -> Optional[SnapshotWriter]:
+        """Listing keys per table and the raw Bloom filter bits."""
+        with self._lock:
+            if not self._loaded:
+                return None
+            keys: Dict[str, List[str]] = {property_type: [] for property_type in PROPERTY_MODELS}
+            for listing_key, property_type in self._routes.items():
+                keys[property_type].append(listing_key)
+            writer = SnapshotWriter(self.SNAPSHOT_KIND, self.SNAPSHOT_SCHEMA, {
+                "watermark": isoformat(self._watermark),
+                "media_filters": {
+                    property_type: [media_filter.capacity, media_filter.error_rate, media_filter.count]
+                    for property_type, media_filter in self._media_filters.items()
+                },
+            })
+            for property_type, media_filter in self._media_filters.items():
+                writer.add_strings(f"keys.{property_type}", keys[property_type])
+                writer.add_bytes(f"media.{property_type}", media_filter.bits)
+            return writer
+
+    def restore_snapshot(self, snapshot: Snapshot) -> None:
+        """
+        Install the index from a snapshot; the next refresh catches up
+        from its watermark. Filter bits stay in the copy-on-write mapping.
+        """
+        routes: Dict[str, str] = {}
+        media_filters: Dict[str, BloomFilter] = {}
+        for property_type, (capacity, error_rate, count) in snapshot.meta["media_filters"].items():
+            routes.update(dict.fromkeys(snapshot.strings(f"keys.{property_type}"), property_type))
+            media_filters[property_type] = BloomFilter.from_buffer(
+                capacity, error_rate, count, snapshot.bytes(f"media.{property_type}")
+            )
+        with self._lock:
+            self._routes = routes
+            self._found = {}
+            self._missing = set()
+            self._media_filters = media_filters
+            self._watermark = parse_isoformat(snapshot.meta["watermark"])
+            self._loaded = True
+            self._refreshed_at = 0.0
+
+    def _route(self, listing_key: str) -> Optional[str]:
+        shared = self._shared
+        if shared is not None:
+            return shared.resolve(listing_key) or self._found.get(listing_key)
+        return self._routes.get(listing_key) or self._found.get(listing_key)
+
+    def _probe(self, db: Session, listing_keys: List[str]) -> Dict[str, str]:
+        """Look keys up in the property tables, remembering hits and misses until the index catches up."""
+        found: Dict[str, str] = {}
+        remaining = list(dict.fromkeys(listing_keys))
+        for property_type, model in PROPERTY_MODELS.items():
+            if not remaining:
+                break
+            for chunk in _chunks(remaining, _IN_CHUNK_SIZE):
+                for (listing_key,) in db.query(model.listing_key).filter(model.listing_key.in_(chunk)):
+                    found[listing_key] = property_type
+            remaining = [listing_key for listing_key in remaining if listing_key not in found]
+        if self.loaded:
+            if found and len(self._found) < _FOUND_MAX_ENTRIES:
+                self._found.update(found)
+            if remaining:
+                # Start over rather than stop adding, so a scraper's current keys are the ones kept
+                if len(self._missing) >= _MISSING_MAX_ENTRIES:
+                    self._missing = set()
+                self._missing.update(remaining)
+        return found
+
+    def _follow_shared(self) -> bool:
+        """Map the shared index file, or its newer generation once one replaced it."""
+        if not self._lock.acquire(blocking=False):
+            return self._shared is not None
+        try:
+            stat = os.stat(self.shared_path)
+            if self._shared is None or self._shared.file_id != (stat.st_ino, stat.st_mtime_ns):
+                shared = SharedListingIndex.open(self.shared_path)
+                if shared is not None:
+                    # The new generation has every key found by probing since the last one, and may have the missing ones
+                    self._shared = shared
+                    self._found = {}
+                    self._missing = set()
+                    logger.info(f"Mapped shared listing index: {len(shared)} listings, generation {shared.generation}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Mapping shared listing index failed: {e}")
+        finally:
+            self._lock.release()
+        return self._shared is not None
+
+    def _needs_rebuild(self) -> bool:
+        return any(media_filter.saturated for media_filter in self._media_filters.values())
+
+    def _full_load(self, db: Session) -> None:
+        started = time.monotonic()
+        routes: Dict[str, str] = {}
+        media_filters: Dict[str, BloomFilter] = {}
+        watermark = None
+
+        for property_type, model in PROPERTY_MODELS.items():
+            for (listing_key,) in db.query(model.listing_key).yield_per(10000):
+                routes[listing_key] = property_type
+
+            latest = db.query(func.max(model.modification_timestamp)).scalar()
+            if latest and (watermark is None or latest > watermark):
+                watermark = latest
+
+            media_filters[property_type] = build_media_filter(db, property_type, self.media_error_rate)
+
+        # Swap in the new state in one step
+        self._routes = routes
+        self._found = {}
+        self._missing = set()
+        self._media_filters = media_filters
+        self._watermark = watermark
+        self._loaded = True
+        logger.info(
+            f"Listing routing index loaded: {len(routes)} listings in "
+            f"{time.monotonic() - started:.2f}s"
+        )
+
+    def _catch_up(self, db: Session) -> None:
+        since = self._watermark - self.overlap if self._watermark else None
+        watermark = self._watermark
+        # Probed keys may be older than the overlap window, so keep them
+        found, self._found = self._found, {}
+        self._routes.update(found)
+        # Keys missing before may have arrived; the catch-up below adds them
+        self._missing = set()
+
+        for property_type, model in PROPERTY_MODELS.items():
+            query = db.query(model.listing_key, model.modification_timestamp)
+            if since is not None:
+                query = query.filter(model.modification_timestamp > since)
+
+            changed_keys = []
+            for listing_key, modified in query:
+                self._routes[listing_key] = property_type
+                changed_keys.append(listing_key)
+                if modified and (watermark is None or modified > watermark):
+                    watermark = modified
+
+            media_model = MEDIA_MODELS[property_type]
+            media_filter = self._media_filters[property_type]
+            for chunk in _chunks(changed_keys, _IN_CHUNK_SIZE):
+                media_keys = (
+                    db.query(media_model.media_key)
+                    .filter(media_model.resource_record_key.in_(chunk))
+                )
+                for (media_key,) in media_keys:
+                    media_filter.add(media_key)
+
+        self._watermark = watermark
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+listing_router = ListingRouter(
+    refresh_seconds=settings.ROUTING_INDEX_REFRESH_SECONDS,
+    overlap_seconds=settings.INDEX_CATCHUP_OVERLAP_SECONDS,
+    media_error_rate=settings.MEDIA_FILTER_ERROR_RATE,
+    shared_path=settings.LISTING_INDEX_PATH,
+)
@@ -1,10 +1,16 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc, asc
 from typing import List, Tuple, Optional, Union
+from app.core.request_context import timed
+from app.core.tracing import traced_methods
 from app.models.database import ResidentialProperty, CommercialProperty, ResidentialMedia, CommercialMedia
-from app.models.schemas import SearchFilters, ListingSummary, SortOption, PropertyType
+from app.models.schemas import (
+    SearchFilters, ListingSummary, SortOption, PropertyType,
+    SearchResponse, MapResponse, PaginationInfo
+)
 
 
+@traced_methods
 class SearchService:
     def __init__(self, db: Session):
         self.db = db
@@ -26,10 +32,11 @@ class SearchService:
         
         # Get total count
         total_count = 0
-        if not filters.property_type or filters.property_type == PropertyType.RESIDENTIAL:
-            total_count += residential_query.count()
-        if not filters.property_type or filters.property_type == PropertyType.COMMERCIAL:
-            total_count += commercial_query.count()
+        with timed("search_count"):
+            if not filters.property_type or filters.property_type == PropertyType.RESIDENTIAL:
+                total_count += residential_query.count()
+            if not filters.property_type or filters.property_type == PropertyType.COMMERCIAL:
+                total_count += commercial_query.count()
         
         # Apply sorting and pagination
         residential_query = self._apply_sorting(residential_query, sort, ResidentialProperty)
@@ -39,7 +46,8 @@ class SearchService:
         listings = []
         
         if not filters.property_type or filters.property_type == PropertyType.RESIDENTIAL:
-            residential_results = residential_query.offset((page - 1) * limit).limit(limit).all()
+            with timed("search_page"):
+                residential_results = residential_query.offset((page - 1) * limit).limit(limit).all()
             for result in residential_results:
                 thumbnail_url = self._get_thumbnail_url(result.listing_key, "residential")
                 listings.append(ListingSummary.from_db_model(result, thumbnail_url))
@@ -48,7 +56,8 @@ class SearchService:
             remaining_limit = limit - len(listings)
             if remaining_limit > 0:
                 commercial_offset = max(0, (page - 1) * limit - len(listings))
-                commercial_results = commercial_query.offset(commercial_offset).limit(remaining_limit).all()
+                with timed("search_page"):
+                    commercial_results = commercial_query.offset(commercial_offset).limit(remaining_limit).all()
                 for result in commercial_results:
                     thumbnail_url = self._get_thumbnail_url(result.listing_key, "commercial")
                     listings.append(ListingSummary.from_db_model(result, thumbnail_url))
@@ -59,6 +68,40 @@ class SearchService:
         
         return listings[:limit], total_count
     
+    def build_search_response(
+        self,
+        filters: SearchFilters,
+        page: int = 1,
+        limit: int = 20,
+        sort: SortOption = SortOption.NEWEST
+    ) -> SearchResponse:
+        """Run a search and wrap it with pagination info."""
+        listings, total_count = self.search_listings(
+            filters=filters,
+            page=page,
+            limit=limit,
+            sort=sort
+        )
+        
+        total_pages = (total_count + limit - 1) // limit
+        pagination = PaginationInfo(
+            page=page,
+            limit=limit,
+            total=total_count,
+            pages=total_pages
+        )
+        
+        return SearchResponse(
+            listings=listings,
+            pagination=pagination,
+            filters_applied=filters
+        )
+    
+    def build_map_response(self, filters: SearchFilters, limit: int = 500) -> MapResponse:
+        """Run a map search and wrap it as a MapResponse."""
+        listings = self.search_listings_for_map(filters=filters, limit=limit)
+        return MapResponse(listings=listings, count=len(listings))
+    
     def search_listings_for_map(
         self, 
         filters: SearchFilters, 
@@ -77,7 +120,8 @@ class SearchService:
         # Search residential properties
         if not filters.property_type or filters.property_type == PropertyType.RESIDENTIAL:
             residential_query = self._build_residential_query(filters, require_coordinates=True)
-            residential_results = residential_query.limit(limit // 2 if not filters.property_type else limit).all()
+            with timed("search_page"):
+                residential_results = residential_query.limit(limit // 2 if not filters.property_type else limit).all()
             
             for result in residential_results:
                 thumbnail_url = self._get_thumbnail_url(result.listing_key, "residential")
@@ -88,7 +132,8 @@ class SearchService:
             remaining_limit = limit - len(listings)
             if remaining_limit > 0:
                 commercial_query = self._build_commercial_query(filters, require_coordinates=True)
-                commercial_results = commercial_query.limit(remaining_limit).all()
+                with timed("search_page"):
+                    commercial_results = commercial_query.limit(remaining_limit).all()
                 
                 for result in commercial_results:
                     thumbnail_url = self._get_thumbnail_url(result.listing_key, "commercial")
@@ -302,6 +347,7 @@ class SearchService:
         else:  # NEWEST
             return sorted(listings, key=lambda x: x.original_entry_timestamp or "", reverse=True)
     
+    @timed("thumbnails")
     def _get_thumbnail_url(self, listing_key: str, property_type: str) -> Optional[str]:
         """Get thumbnail URL for a listing."""
         try:
@@ -0,0 +1,64 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys.
+    Answers "definitely absent" or "possibly present" in O(k) without I/O.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def from_buffer(cls, capacity: int, error_rate: float, count: int, bits) -> "BloomFilter":
+        """
+        Filter over existing bits, e.g. a copy-on-write memory map of a
+        snapshot: pages are only copied once an add() touches them.
+        """
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        bloom.hash_count = max(1, round(bloom.size / capacity * math.log(2)))
+        if len(bits) != (bloom.size + 7) // 8:
+            raise ValueError("Bloom filter bits do not match its capacity and error rate")
+        bloom.bits = bits
+        bloom.count = count
+        return bloom
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        """Add a key. Re-adding a key that already matches does not count twice."""
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """True once more keys were added than the filter was sized for."""
+        return self.count > self.capacity
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def make_etag(body: bytes) -> str:
+    """Build a strong ETag from the response payload."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_for_encoding(etag: str, encoding: Optional[str]) -> str:
+    """
+    Derive the ETag of an encoded representation. Each content-coding is a
+    different byte sequence, so it gets its own strong validator.
+    """
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    tag = etag.removeprefix("W/")
+    base, sep, suffix = tag[:-1].rpartition("-")
+    if sep and suffix in ("br", "gzip", "zstd"):
+        return f'{base}"'
+    return tag
+
+
+def latest_timestamp(timestamps: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    """Return the most recent non-null timestamp, if any."""
+    values = [ts for ts in timestamps if ts is not None]
+    return max(values) if values else None
+
+
+def http_date(value: datetime) -> str:
+    """Format a timestamp as an IMF-fixdate. Naive values are treated as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_conditional(request: Request) -> bool:
+    """Whether the request carries any cache validator."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+    If-None-Match takes precedence when both are present (RFC 9110 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison is what GET revalidation uses; any encoded
+        # variant of the current representation still matches.
+        return any(_strip_encoding(tag) == etag for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        since = _parse_http_date(if_modified_since)
+        modified = _parse_http_date(last_modified)
+        if since and modified:
+            return modified <= since
+
+    return False
+
+
+def validator_headers(
+    etag: str,
+    last_modified: Optional[str],
+    encoding: Optional[str] = None
+) -> dict:
+    headers = {
+        "ETag": etag_for_encoding(etag, encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def not_modified_response(
+    etag: str,
+    last_modified: Optional[str],
+    encoding: Optional[str] = None
+) -> Response:
+    headers = validator_headers(etag, last_modified, encoding)
+    headers.pop("Content-Encoding", None)
+    return Response(status_code=304, headers=headers)
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    last_modified: Optional[str],
+    encoding: Optional[str] = None
+) -> Response:
+    """
+    Answer with 304 when the client copy is current, otherwise send the body.
+    ``body`` must already be encoded with ``encoding`` when one is given.
+    """
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified, encoding)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=validator_headers(etag, last_modified, encoding)
+    )
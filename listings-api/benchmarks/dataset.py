@@ -0,0 +1,393 @@
+"""
+Synthetic MLS dataset generator.
+
+Fills residential_properties, commercial_properties and both media tables
+with realistic distributions using Postgres COPY:
+
+- coordinates clustered around GTA city centres;
+- listing offices chosen with a Zipf-like skew (a few large brokerages);
+- log-normal prices by type and transaction;
+- modification times skewed towards the last few days;
+- 20-60 media rows per listing, spread across image sizes.
+
+Usage:
+    python -m benchmarks.dataset --size 100k --truncate
+    python -m benchmarks.dataset --listings 250000 --seed 7 --defer-indexes
+
+Tables are created if missing. --truncate empties them first (destructive).
+--defer-indexes drops the secondary indexes during the load and recreates
+them afterwards, which is much faster at 1M listings.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import sys
+import time
+
+from app.core.database import Base, engine
+import app.models.database  # noqa: F401 - registers the tables on Base
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# (city, county, latitude, longitude, weight)
+CITIES = [
+    ("Toronto", "Toronto", 43.6532, -79.3832, 40),
+    ("Mississauga", "Peel", 43.5890, -79.6441, 12),
+    ("Brampton", "Peel", 43.7315, -79.7624, 9),
+    ("Markham", "York", 43.8561, -79.3370, 7),
+    ("Vaughan", "York", 43.8361, -79.4983, 7),
+    ("Richmond Hill", "York", 43.8828, -79.4403, 5),
+    ("Oakville", "Halton", 43.4675, -79.6877, 5),
+    ("Burlington", "Halton", 43.3255, -79.7990, 4),
+    ("Oshawa", "Durham", 43.8971, -78.8658, 4),
+    ("Pickering", "Durham", 43.8384, -79.0868, 3),
+    ("Newmarket", "York", 44.0592, -79.4613, 2),
+    ("Milton", "Halton", 43.5183, -79.8774, 2),
+]
+
+STREET_NAMES = [
+    "Yonge", "King", "Queen", "Bloor", "Dundas", "College", "Bathurst", "Spadina",
+    "Eglinton", "Lawrence", "Finch", "Steeles", "Sheppard", "Kennedy", "Victoria Park",
+    "Lakeshore", "Main", "Church", "Maple", "Oak", "Cedar", "Elm", "Birch", "Willow",
+]
+STREET_SUFFIXES = ["St", "Ave", "Rd", "Blvd", "Dr", "Cres", "Crt", "Way", "Lane"]
+
+RESIDENTIAL_SUBTYPES = [
+    ("Detached", 35), ("Condo Apartment", 30), ("Semi-Detached", 10),
+    ("Att/Row/Townhouse", 12), ("Condo Townhouse", 8), ("Duplex", 3), ("Triplex", 2),
+]
+COMMERCIAL_SUBTYPES = [
+    ("Office", 30), ("Retail", 25), ("Industrial", 20), ("Commercial/Retail", 10),
+    ("Investment", 8), ("Land", 7),
+]
+TRANSACTION_TYPES = [("For Sale", 75), ("For Lease", 23), ("For Sub-Lease", 2)]
+STATUSES = [("Active", 85), ("Pending", 8), ("Inactive", 7)]
+STYLES = ["2-Storey", "Bungalow", "Backsplit 3", "Sidesplit 4", "Apartment", "Loft", "3-Storey"]
+BASEMENTS = ["Finished", "Unfinished", "Full", "Walk-Out", "Separate Entrance", "None"]
+COOLING = ["Central Air", "Window Unit", "None"]
+HEAT_TYPES = ["Forced Air", "Radiant", "Baseboard", "Heat Pump"]
+HEAT_SOURCES = ["Gas", "Electric", "Oil"]
+
+# One media row per photo per size
+MEDIA_SIZES = ["Thumbnail", "Medium", "Large", "Largest"]
+
+RESIDENTIAL_COLUMNS = [
+    "listing_key", "list_price", "street_name", "street_number", "street_suffix",
+    "city_region", "county_or_parish", "state_or_province", "postal_code",
+    "apartment_number", "unit_number", "bedrooms_total", "bathrooms_total_integer",
+    "parking_spaces", "rooms_above_grade", "rooms_below_grade",
+    "original_entry_timestamp", "modification_timestamp", "standard_status",
+    "transaction_type", "property_type", "property_sub_type", "public_remarks",
+    "architectural_style", "basement", "cooling", "lot_depth", "lot_width",
+    "lot_size_units", "tax_annual_amount", "cross_street", "heat_type", "heat_source",
+    "has_fireplace", "list_office_name", "list_office_key", "virtual_tour_url_unbranded",
+    "latitude", "longitude", "created_at", "updated_at",
+]
+
+COMMERCIAL_COLUMNS = [
+    "listing_key", "list_price", "street_name", "street_number", "street_suffix",
+    "city_region", "county_or_parish", "state_or_province", "postal_code",
+    "unit_number", "parking_spaces", "original_entry_timestamp", "modification_timestamp",
+    "standard_status", "transaction_type", "property_type", "property_sub_type",
+    "public_remarks", "lot_depth", "lot_width", "lot_size_units", "tax_annual_amount",
+    "cross_street", "zoning_designation", "list_office_name", "list_office_key",
+    "latitude", "longitude", "created_at", "updated_at",
+]
+
+MEDIA_COLUMNS = [
+    "media_key", "resource_record_key", "media_url", "media_category", "media_type",
+    "order", "media_modification_timestamp", "preferred_photo_yn",
+    "image_size_description", "created_at", "updated_at",
+]
+
+PROPERTY_TABLES = ["residential_properties", "commercial_properties"]
+MEDIA_TABLES = ["residential_media", "commercial_media"]
+
+
+class Generator:
+    """Deterministic row generator for a given seed and listing count."""
+
+    def __init__(self, listings: int, commercial_share: float, seed: int):
+        self.rng = random.Random(seed)
+        self.listings = listings
+        self.commercial = int(listings * commercial_share)
+        self.residential = listings - self.commercial
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+
+        office_count = max(20, listings // 150)
+        self.offices = [
+            (f"OFF{index:05d}", f"{self.rng.choice(STREET_NAMES)} Realty {index}")
+            for index in range(office_count)
+        ]
+        # Zipf-like: office rank r gets weight 1 / r^1.1
+        self.office_weights = _cumulative([1 / (rank + 1) ** 1.1 for rank in range(office_count)])
+        self.city_weights = _cumulative([city[4] for city in CITIES])
+
+    def residential_rows(self) -> Iterator[List[Any]]:
+        rng = self.rng
+        for index in range(self.residential):
+            listing_key = f"R{index:08d}"
+            city, county, latitude, longitude = self._location()
+            subtype = _weighted(rng, RESIDENTIAL_SUBTYPES)
+            transaction = _weighted(rng, TRANSACTION_TYPES)
+            condo = subtype.startswith("Condo")
+            bedrooms = max(0, min(7, int(rng.gauss(2.2 if condo else 3.4, 1.1))))
+            entered, modified = self._timestamps()
+            office_key, office_name = self._office()
+            price = (
+                rng.lognormvariate(math.log(2900 if condo else 3600), 0.35)
+                if transaction != "For Sale"
+                else rng.lognormvariate(math.log(680_000 if condo else 1_250_000), 0.45)
+            )
+            yield [
+                listing_key, round(price, -2 if transaction == "For Sale" else 0),
+                rng.choice(STREET_NAMES), str(rng.randint(1, 9999)), rng.choice(STREET_SUFFIXES),
+                city, county, "Ontario", _postal_code(rng),
+                str(rng.randint(100, 3500)) if condo else None,
+                str(rng.randint(1, 40)) if condo and rng.random() < 0.3 else None,
+                bedrooms, max(1, bedrooms - rng.randint(0, 1)),
+                rng.randint(0, 1) if condo else rng.randint(1, 4),
+                bedrooms + rng.randint(2, 5), 0 if condo else rng.randint(0, 4),
+                entered, modified, _weighted(rng, STATUSES), transaction, "Residential", subtype,
+                _remarks(rng, subtype, city),
+                _array(rng.sample(STYLES, 1)),
+                None if condo else _array(rng.sample(BASEMENTS, rng.randint(1, 2))),
+                _array([rng.choice(COOLING)]),
+                None if condo else round(rng.uniform(80, 200), 1),
+                None if condo else round(rng.uniform(20, 60), 1),
+                None if condo else "Feet",
+                round(price * 0.008, 2) if transaction == "For Sale" else None,
+                f"{rng.choice(STREET_NAMES)} & {rng.choice(STREET_NAMES)}",
+                rng.choice(HEAT_TYPES), rng.choice(HEAT_SOURCES),
+                "t" if rng.random() < 0.35 else "f",
+                office_name, office_key,
+                f"https://tours.example.com/{listing_key}" if rng.random() < 0.2 else None,
+                latitude, longitude, entered, modified,
+            ]
+
+    def commercial_rows(self) -> Iterator[List[Any]]:
+        rng = self.rng
+        for index in range(self.commercial):
+            listing_key = f"C{index:08d}"
+            city, county, latitude, longitude = self._location()
+            subtype = _weighted(rng, COMMERCIAL_SUBTYPES)
+            transaction = _weighted(rng, TRANSACTION_TYPES)
+            entered, modified = self._timestamps()
+            office_key, office_name = self._office()
+            price = (
+                rng.lognormvariate(math.log(25), 0.6)
+                if transaction != "For Sale"
+                else rng.lognormvariate(math.log(1_800_000), 0.8)
+            )
+            yield [
+                listing_key, round(price, 2),
+                rng.choice(STREET_NAMES), str(rng.randint(1, 9999)), rng.choice(STREET_SUFFIXES),
+                city, county, "Ontario", _postal_code(rng),
+                str(rng.randint(1, 300)) if rng.random() < 0.4 else None,
+                rng.randint(0, 80), entered, modified, _weighted(rng, STATUSES),
+                transaction, "Commercial", subtype, _remarks(rng, subtype, city),
+                round(rng.uniform(50, 600), 1), round(rng.uniform(20, 300), 1), "Feet",
+                round(price * 0.012, 2) if transaction == "For Sale" else None,
+                f"{rng.choice(STREET_NAMES)} & {rng.choice(STREET_NAMES)}",
+                rng.choice(["C1", "C2", "M1", "M2", "CR", "EMP"]),
+                office_name, office_key, latitude, longitude, entered, modified,
+            ]
+
+    def media_rows(self, prefix: str, count: int) -> Iterator[List[Any]]:
+        rng = self.rng
+        for index in range(count):
+            listing_key = f"{prefix}{index:08d}"
+            photos = rng.randint(20, 60) // len(MEDIA_SIZES)
+            modified = self.now - timedelta(days=rng.randint(0, 120))
+            for photo in range(photos):
+                for size_index, size in enumerate(MEDIA_SIZES):
+                    yield [
+                        f"{listing_key}-{photo:02d}-{size_index}",
+                        listing_key,
+                        f"https://media.example.com/{listing_key}/{photo}/{size.lower()}.jpg",
+                        "Photo", "image/jpeg", photo, modified,
+                        "t" if photo == 0 else "f", size, modified, modified,
+                    ]
+
+    def _location(self) -> Tuple[str, str, float, float]:
+        city, county, latitude, longitude, _ = CITIES[_pick(self.rng, self.city_weights)]
+        # Neighbourhood clusters within each city
+        cluster = self.rng.randint(0, 7)
+        latitude += (cluster % 3 - 1) * 0.03 + self.rng.gauss(0, 0.012)
+        longitude += (cluster // 3 - 1) * 0.04 + self.rng.gauss(0, 0.016)
+        return city, county, round(latitude, 6), round(longitude, 6)
+
+    def _timestamps(self) -> Tuple[datetime, datetime]:
+        # Most listings were touched recently; a long tail goes back a year
+        age = min(365.0, self.rng.expovariate(1 / 20))
+        modified = self.now - timedelta(days=age, seconds=self.rng.randint(0, 86400))
+        entered = modified - timedelta(days=self.rng.expovariate(1 / 30))
+        return entered, modified
+
+    def _office(self) -> Tuple[str, str]:
+        return self.offices[_pick(self.rng, self.office_weights)]
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total, running = sum(weights), 0.0
+    cumulative = []
+    for weight in weights:
+        running += weight / total
+        cumulative.append(running)
+    return cumulative
+
+
+def _pick(rng: random.Random, cumulative: List[float]) -> int:
+    target = rng.random()
+    low, high = 0, len(cumulative) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if cumulative[middle] < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _weighted(rng: random.Random, choices: Sequence[Tuple[str, int]]) -> str:
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def _postal_code(rng: random.Random) -> str:
+    letters = "ABCEGHJKLMNPRSTVXY"
+    return (
+        f"{rng.choice('KLMN')}{rng.randint(0, 9)}{rng.choice(letters)} "
+        f"{rng.randint(0, 9)}{rng.choice(letters)}{rng.randint(0, 9)}"
+    )
+
+
+def _remarks(rng: random.Random, subtype: str, city: str) -> str:
+    adjectives = ["Bright", "Spacious", "Renovated", "Charming", "Modern", "Rare", "Stunning"]
+    features = ["open concept layout", "updated kitchen", "south exposure", "steps to transit",
+                "quiet street", "large lot", "parking included", "high ceilings"]
+    return (
+        f"{rng.choice(adjectives)} {subtype.lower()} in {city}. "
+        + ", ".join(rng.sample(features, 3)).capitalize() + "."
+    )
+
+
+def _array(values: Iterable[str]) -> str:
+    return "{" + ",".join(json.dumps(value) for value in values) + "}"
+
+
+def copy_rows(cursor, table: str, columns: List[str], rows: Iterable[List[Any]], batch: int = 50_000) -> int:
+    """Stream rows into ``table`` with COPY ... FROM STDIN in CSV batches."""
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    statement = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = total = 0
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value for value in row
+        )
+        pending += 1
+        if pending == batch:
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            total += pending
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        total += pending
+    return total
+
+
+def _secondary_indexes(cursor, tables: List[str]) -> List[Tuple[str, str]]:
+    cursor.execute(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "JOIN pg_class c ON c.relname = i.indexname "
+        "JOIN pg_index x ON x.indexrelid = c.oid "
+        "WHERE i.tablename = ANY(%s) AND NOT x.indisprimary",
+        (tables,),
+    )
+    return cursor.fetchall()
+
+
+def generate(listings: int, commercial_share: float, seed: int, truncate: bool, defer_indexes: bool) -> dict:
+    Base.metadata.create_all(engine)
+    generator = Generator(listings, commercial_share, seed)
+    started = time.monotonic()
+    counts = {}
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        tables = PROPERTY_TABLES + MEDIA_TABLES
+        if truncate:
+            cursor.execute(f"TRUNCATE {', '.join(tables)}")
+
+        indexes = _secondary_indexes(cursor, tables) if defer_indexes else []
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+        counts["residential_properties"] = copy_rows(
+            cursor, "residential_properties", RESIDENTIAL_COLUMNS, generator.residential_rows()
+        )
+        counts["commercial_properties"] = copy_rows(
+            cursor, "commercial_properties", COMMERCIAL_COLUMNS, generator.commercial_rows()
+        )
+        counts["residential_media"] = copy_rows(
+            cursor, "residential_media", MEDIA_COLUMNS, generator.media_rows("R", generator.residential)
+        )
+        counts["commercial_media"] = copy_rows(
+            cursor, "commercial_media", MEDIA_COLUMNS, generator.media_rows("C", generator.commercial)
+        )
+
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        # Mark the load as an ingestion run so replication-driven caches refresh
+        cursor.execute(
+            "INSERT INTO replication_logs (source, last_replicated_at) VALUES ('synthetic', now()) "
+            "ON CONFLICT (source) DO UPDATE SET last_replicated_at = EXCLUDED.last_replicated_at"
+        )
+        connection.commit()
+
+        connection.set_isolation_level(0)
+        for table in tables:
+            cursor.execute(f"ANALYZE {table}")
+    finally:
+        connection.close()
+
+    return {
+        "listings": listings,
+        "seed": seed,
+        "offices": len(generator.offices),
+        "rows": counts,
+        "seconds": round(time.monotonic() - started, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--size", choices=sorted(SIZES), help="preset listing count")
+    size.add_argument("--listings", type=int, help="explicit listing count")
+    parser.add_argument("--commercial-share", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first")
+    parser.add_argument("--defer-indexes", action="store_true", help="rebuild secondary indexes after loading")
+    args = parser.parse_args(argv)
+
+    listings = SIZES[args.size] if args.size else args.listings
+    result = generate(listings, args.commercial_share, args.seed, args.truncate, args.defer_indexes)
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Parity check and latency benchmark for listing detail rendering.
+
+Compares the Postgres-rendered document (ListingsService.get_listing_detail_json)
+against the ORM path (ListingsService.get_listing_by_key + ListingDetail.from_db_model
++ model_dump_json) for a sample of listings, then times both.
+
+Usage:
+    python -m benchmarks.listing_detail --sample 200 --iterations 5
+"""
+from datetime import datetime
+from typing import Any, List, Tuple
+import argparse
+import json
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.services.listings import ListingsService
+from app.services.routing import listing_router
+from benchmarks.stats import summarize
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Normalize values that are equal in JSON terms but rendered differently:
+    Postgres writes timestamptz as +00:00 where Pydantic writes Z, and trims
+    trailing zeros from fractional seconds and floats.
+    """
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str) and len(value) >= 19 and value[10:11] == "T":
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _diff(expected: Any, actual: Any, path: str = "") -> List[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        problems = []
+        if list(expected) != list(actual):
+            problems.append(f"{path or '.'}: key order/shape differs")
+        for key in expected.keys() | actual.keys():
+            problems.extend(_diff(expected.get(key), actual.get(key), f"{path}.{key}"))
+        return problems
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(expected)} != {len(actual)}"]
+        problems = []
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            problems.extend(_diff(left, right, f"{path}[{index}]"))
+        return problems
+    if expected != actual:
+        return [f"{path}: {expected!r} != {actual!r}"]
+    return []
+
+
+def sample_listing_keys(db, sample: int) -> List[str]:
+    rows = db.execute(
+        text(
+            "(SELECT listing_key FROM residential_properties ORDER BY random() LIMIT :n) "
+            "UNION ALL "
+            "(SELECT listing_key FROM commercial_properties ORDER BY random() LIMIT :n)"
+        ),
+        {"n": sample},
+    )
+    return [row.listing_key for row in rows]
+
+
+def check_parity(service: ListingsService, listing_keys: List[str]) -> List[Tuple[str, List[str]]]:
+    mismatches = []
+    for listing_key in listing_keys:
+        listing = service.get_listing_by_key(listing_key)
+        document = service.get_listing_detail_json(listing_key)
+        if listing is None or document is None:
+            if (listing is None) != (document is None):
+                mismatches.append((listing_key, ["found by only one path"]))
+            continue
+        expected = _normalize(json.loads(listing.model_dump_json()))
+        actual = _normalize(json.loads(document[0]))
+        problems = _diff(expected, actual)
+        if problems:
+            mismatches.append((listing_key, problems))
+    return mismatches
+
+
+def time_paths(service: ListingsService, listing_keys: List[str], iterations: int) -> dict:
+    orm_ms, sql_ms = [], []
+    for _ in range(iterations):
+        for listing_key in listing_keys:
+            started = time.perf_counter()
+            listing = service.get_listing_by_key(listing_key)
+            if listing:
+                listing.model_dump_json()
+            orm_ms.append((time.perf_counter() - started) * 1000)
+            service.db.expunge_all()
+
+            started = time.perf_counter()
+            service.get_listing_detail_json(listing_key)
+            sql_ms.append((time.perf_counter() - started) * 1000)
+    return {"orm_pydantic": summarize(orm_ms), "sql_json": summarize(sql_ms)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=100, help="listings sampled per property table")
+    parser.add_argument("--iterations", type=int, default=3, help="timing passes over the sample")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        service = ListingsService(db)
+        listing_keys = sample_listing_keys(db, args.sample)
+        # Load the routing index and warm the connection before timing
+        listing_router.refresh(db)
+        for listing_key in listing_keys[:5]:
+            service.get_listing_detail_json(listing_key)
+
+        mismatches = check_parity(service, listing_keys)
+        timings = time_paths(service, listing_keys, args.iterations)
+    finally:
+        db.close()
+
+    result = {
+        "benchmark": "listing_detail",
+        "listings": len(listing_keys),
+        "mismatches": len(mismatches),
+        "timings_ms": timings,
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for listing_key, problems in mismatches[:20]:
+            print(f"MISMATCH {listing_key}:")
+            for problem in problems[:10]:
+                print(f"    {problem}")
+        print(f"{len(listing_keys)} listings, {len(mismatches)} mismatches")
+        for path, summary in timings.items():
+            print(f"{path:>13}: " + ", ".join(f"{key}={value}" for key, value in summary.items()))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
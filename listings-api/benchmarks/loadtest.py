@@ -0,0 +1,512 @@
+"""
+Synthetic load profiles modelled on real traffic.
+
+Scenarios, each run by closed-loop virtual users:
+
+    map           map panning bursts: a viewport dragged and zoomed in quick succession
+    autocomplete  city autocomplete keystroke storms, one request per keystroke
+    detail        listing detail page: the listing, then media and similar listings in parallel
+    featured      broker widget floods on /featured, skewed towards the largest offices
+    mix           all of the above, weighted like production
+
+Listing keys, offices and cities are discovered through the API itself, so any
+instance can be targeted. Start the instance with REQUEST_STATS_HEADERS=true to
+get DB queries per request in the report.
+
+    python -m benchmarks.loadtest run --scenario mix --users 32 --duration 60 \\
+        --output runs/mix.json --html runs/mix.html
+    python -m benchmarks.loadtest saturate --scenario detail --slo-p95 250 \\
+        --label "workers=1 pool=10+20" --html runs/detail-saturation.html
+
+For per-worker numbers run the instance with a single worker; repeat with
+different DATABASE_POOL_SIZE / DATABASE_MAX_OVERFLOW values and compare the
+saturation points. Reports use the same route sections as benchmarks.workload,
+so `python -m benchmarks.workload diff` works on them too.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import html
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.stats import LATENCY_BUCKETS_MS, histogram, percentile
+from benchmarks.workload import _print_report, build_report
+
+API = "/api/v1"
+
+# Share of sessions per scenario in the "mix" profile
+MIX_WEIGHTS = {"map": 0.3, "autocomplete": 0.2, "detail": 0.35, "featured": 0.15}
+
+
+class Targets:
+    """Identifiers used to build requests, discovered from the instance under test."""
+
+    def __init__(self, listings: List[Dict[str, Any]], offices: List[str]):
+        self.listing_keys = [listing["listing_key"] for listing in listings]
+        self.places = [
+            (listing["coordinates"]["latitude"], listing["coordinates"]["longitude"])
+            for listing in listings
+            if listing.get("coordinates", {}).get("latitude") is not None
+        ]
+        self.cities = sorted({
+            listing["address"]["city_region"] for listing in listings
+            if listing.get("address", {}).get("city_region")
+        })
+        # Largest offices first, so a Zipf pick floods the popular widgets
+        self.offices = offices
+        self._office_weights = [1 / (rank + 1) for rank in range(len(offices))]
+
+    @classmethod
+    async def discover(cls, client: httpx.AsyncClient, pages: int = 5) -> "Targets":
+        listings: List[Dict[str, Any]] = []
+        for page in range(1, pages + 1):
+            response = await client.get(f"{API}/search/", params={"limit": 100, "page": page, "sort": "updated"})
+            response.raise_for_status()
+            batch = response.json()["listings"]
+            listings.extend(batch)
+            if len(batch) < 100:
+                break
+        response = await client.get(f"{API}/featured/offices", params={"limit": 100})
+        response.raise_for_status()
+        offices = [office["office_key"] for office in response.json()["offices"]]
+        return cls(listings, offices)
+
+    def office(self, rng: random.Random) -> str:
+        return rng.choices(self.offices, weights=self._office_weights)[0]
+
+
+class Recorder:
+    """Times requests and keeps one result per request, stamped relative to the run start."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.results: List[Dict[str, Any]] = []
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        route: str,
+        path: str,
+        method: str = "GET",
+        **kwargs
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"t": started - self.origin, "route": f"{method} {API}{route}"}
+        try:
+            response = await client.request(method, f"{API}{path}", **kwargs)
+            await response.aread()
+        except httpx.HTTPError as e:
+            result.update(status=None, error=type(e).__name__, latency_ms=(time.perf_counter() - started) * 1000)
+            self.results.append(result)
+            return None
+        result.update(
+            status=response.status_code,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            db_queries=_int_header(response, "x-db-queries"),
+            cache_hits=_int_header(response, "x-cache-hits"),
+            cache_misses=_int_header(response, "x-cache-misses"),
+        )
+        self.results.append(result)
+        return response
+
+
+Scenario = Callable[[httpx.AsyncClient, Targets, Recorder, random.Random, float], Awaitable[None]]
+
+
+async def map_panning(client, targets: Targets, recorder: Recorder, rng: random.Random, think: float) -> None:
+    lat, lng = rng.choice(targets.places)
+    height, width = 0.04, 0.06
+    for _ in range(rng.randint(4, 10)):
+        if rng.random() < 0.15:
+            height, width = height * 2, width * 2
+        elif rng.random() < 0.15:
+            height, width = height / 2, width / 2
+        else:
+            lat += rng.uniform(-0.3, 0.3) * height
+            lng += rng.uniform(-0.3, 0.3) * width
+        await recorder.request(client, "/search/map", "/search/map", params={
+            "ne_lat": round(lat + height / 2, 5), "ne_lng": round(lng + width / 2, 5),
+            "sw_lat": round(lat - height / 2, 5), "sw_lng": round(lng - width / 2, 5),
+        })
+        await _think(rng.uniform(0.05, 0.15) * think)
+    await _think(rng.uniform(1, 3) * think)
+
+
+async def autocomplete(client, targets: Targets, recorder: Recorder, rng: random.Random, think: float) -> None:
+    city = rng.choice(targets.cities)
+    # No client-side debounce: every keystroke from the second one on is a request
+    for length in range(2, len(city) + 1):
+        await recorder.request(
+            client, "/search/suggestions/cities", "/search/suggestions/cities", params={"q": city[:length]}
+        )
+        await _think(rng.uniform(0.08, 0.2) * think)
+    await _think(rng.uniform(0.5, 2) * think)
+
+
+async def listing_detail(client, targets: Targets, recorder: Recorder, rng: random.Random, think: float) -> None:
+    key = rng.choice(targets.listing_keys)
+    await recorder.request(client, "/listings/{listing_key}", f"/listings/{key}")
+    await asyncio.gather(
+        recorder.request(client, "/listings/{listing_key}/media", f"/listings/{key}/media"),
+        recorder.request(client, "/listings/{listing_key}/similar", f"/listings/{key}/similar"),
+        recorder.request(
+            client, "/media/listing/{listing_key}", f"/media/listing/{key}", params={"size": "Thumbnail"}
+        ),
+    )
+    await _think(rng.uniform(2, 6) * think)
+
+
+async def featured_widget(client, targets: Targets, recorder: Recorder, rng: random.Random, think: float) -> None:
+    if rng.random() < 0.1:
+        offices = {targets.office(rng) for _ in range(5)}
+        await recorder.request(
+            client, "/featured/batch", "/featured/batch", params={"office_keys": ",".join(sorted(offices))}
+        )
+    else:
+        office = targets.office(rng)
+        await recorder.request(client, "/featured/{office_key}", f"/featured/{office}", params={"limit": 12})
+    await _think(rng.uniform(0.1, 0.5) * think)
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "map": map_panning,
+    "autocomplete": autocomplete,
+    "detail": listing_detail,
+    "featured": featured_widget,
+}
+
+
+async def _think(seconds: float) -> None:
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+async def run_load(
+    base_url: str,
+    scenario: str,
+    users: int,
+    duration: float,
+    targets: Targets,
+    think: float = 1.0,
+    timeout: float = 30.0,
+    seed: int = 1
+) -> Dict[str, Any]:
+    """Run ``users`` virtual users for ``duration`` seconds and return the raw results."""
+    recorder = Recorder()
+    names = list(MIX_WEIGHTS) if scenario == "mix" else [scenario]
+    weights = [MIX_WEIGHTS[name] for name in names] if scenario == "mix" else None
+
+    async def user(client: httpx.AsyncClient, index: int) -> None:
+        rng = random.Random(seed * 100003 + index)
+        deadline = recorder.origin + duration
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            await SCENARIOS[name](client, targets, recorder, rng, think)
+
+    # Detail pages fan out to three parallel requests
+    limits = httpx.Limits(max_connections=users * 3, max_keepalive_connections=users * 3)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(user(client, index) for index in range(users)))
+    wall = time.perf_counter() - recorder.origin
+    return {"results": recorder.results, "wall": wall}
+
+
+def build_load_report(
+    results: List[Dict[str, Any]],
+    wall: float,
+    interval: float,
+    **metadata
+) -> Dict[str, Any]:
+    """Route sections as in benchmarks.workload plus a latency histogram and a timeline."""
+    report = build_report(results, wall)
+    report["benchmark"] = "load_test"
+    report.update(metadata)
+    latencies = [result["latency_ms"] for result in results if result.get("status") is not None]
+    report["histogram"] = {"bounds_ms": LATENCY_BUCKETS_MS, "counts": histogram(latencies)}
+    report["timeline"] = timeline(results, interval)
+    return report
+
+
+def timeline(results: List[Dict[str, Any]], interval: float) -> List[Dict[str, Any]]:
+    """Throughput, errors, percentiles and a histogram per ``interval``-second window."""
+    windows: Dict[int, List[Dict[str, Any]]] = {}
+    for result in results:
+        windows.setdefault(int(result["t"] // interval), []).append(result)
+
+    rows = []
+    for index in range(max(windows) + 1 if windows else 0):
+        items = windows.get(index, [])
+        latencies = [item["latency_ms"] for item in items if item.get("status") is not None]
+        rows.append({
+            "t": round(index * interval, 3),
+            "requests": len(items),
+            "rps": round(len(items) / interval, 2),
+            "errors": sum(1 for item in items if item.get("status") is None or item["status"] >= 500),
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "histogram": histogram(latencies),
+        })
+    return rows
+
+
+async def find_saturation(
+    base_url: str,
+    scenario: str,
+    targets: Targets,
+    start_users: int,
+    max_users: int,
+    step_seconds: float,
+    slo_p95_ms: float,
+    max_error_rate: float,
+    min_gain: float,
+    think: float,
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Double the number of users each step until throughput stops growing by
+    ``min_gain``, p95 breaks the SLO or errors exceed ``max_error_rate``.
+    The saturation point is the highest-throughput step within the SLO.
+    """
+    steps = []
+    best = None
+    users = start_users
+    while users <= max_users:
+        run = await run_load(base_url, scenario, users, step_seconds, targets, think, timeout, seed=users)
+        results = run["results"]
+        latencies = [result["latency_ms"] for result in results if result.get("status") is not None]
+        errors = sum(1 for result in results if result.get("status") is None or result["status"] >= 500)
+        step = {
+            "users": users,
+            "requests": len(results),
+            "throughput_rps": round(len(results) / run["wall"], 2) if run["wall"] else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "error_rate": round(errors / len(results), 4) if results else 0.0,
+        }
+        within_slo = step["p95"] <= slo_p95_ms and step["error_rate"] <= max_error_rate
+        step["within_slo"] = within_slo
+        steps.append(step)
+        print(
+            f"users={users:<5} {step['throughput_rps']:>9.1f} req/s p50={step['p50']:.1f} "
+            f"p95={step['p95']:.1f} p99={step['p99']:.1f} errors={step['error_rate'] * 100:.2f}%",
+            file=sys.stderr, flush=True
+        )
+
+        if not within_slo:
+            break
+        previous = best
+        if best is None or step["throughput_rps"] > best["throughput_rps"]:
+            best = step
+        if previous is not None and step["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            break
+        users *= 2
+
+    return {
+        "benchmark": "saturation",
+        "scenario": scenario,
+        "slo_p95_ms": slo_p95_ms,
+        "max_error_rate": max_error_rate,
+        "saturation": best,
+        "steps": steps,
+    }
+
+
+def render_html(report: Dict[str, Any]) -> str:
+    """Self-contained HTML page (inline SVG charts, no external assets)."""
+    title = f"{report['benchmark']}: {report.get('scenario', '')} {report.get('label') or ''}".strip()
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}td:first-child,th:first-child{text-align:left}"
+        "svg{border:1px solid #ddd;margin:1em 0}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+    ]
+
+    if report["benchmark"] == "saturation":
+        saturation = report["saturation"]
+        if saturation:
+            parts.append(
+                f"<p>Saturation: <b>{saturation['throughput_rps']} req/s</b> at {saturation['users']} users "
+                f"(p95 {saturation['p95']} ms, SLO {report['slo_p95_ms']} ms)</p>"
+            )
+        else:
+            parts.append("<p>No step met the SLO.</p>")
+        steps = report["steps"]
+        parts.append(_chart("Throughput (req/s) by users", [s["users"] for s in steps], {
+            "req/s": [s["throughput_rps"] for s in steps],
+        }))
+        parts.append(_chart("Latency (ms) by users", [s["users"] for s in steps], {
+            "p50": [s["p50"] for s in steps], "p95": [s["p95"] for s in steps], "p99": [s["p99"] for s in steps],
+        }))
+        parts.append(_table(
+            ["users", "req/s", "p50", "p95", "p99", "errors %", "within SLO"],
+            [[s["users"], s["throughput_rps"], s["p50"], s["p95"], s["p99"],
+              round(s["error_rate"] * 100, 2), "yes" if s["within_slo"] else "no"] for s in steps]
+        ))
+    else:
+        parts.append(
+            f"<p>{report['requests']} requests in {report['wall_seconds']} s "
+            f"({report['throughput_rps']} req/s), {report.get('users')} users</p>"
+        )
+        rows = report["timeline"]
+        seconds = [row["t"] for row in rows]
+        parts.append(_chart("Throughput (req/s) over time", seconds, {"req/s": [row["rps"] for row in rows]}))
+        parts.append(_chart("Latency (ms) over time", seconds, {
+            "p50": [row["p50"] for row in rows], "p95": [row["p95"] for row in rows], "p99": [row["p99"] for row in rows],
+        }))
+        bounds = report["histogram"]["bounds_ms"]
+        labels = [f"&le; {bound}" for bound in bounds] + [f"&gt; {bounds[-1]}"]
+        parts.append("<h2>Latency histogram (ms)</h2>")
+        parts.append(_table(["bucket", "requests"], list(zip(labels, report["histogram"]["counts"])), escape=False))
+        parts.append("<h2>Routes</h2>")
+        sections = [("(overall)", report["overall"])] + list(report["routes"].items())
+        parts.append(_table(
+            ["route", "n", "p50", "p95", "p99", "max", "errors", "db queries", "cache hit %"],
+            [[route, s["latency_ms"]["count"], s["latency_ms"]["p50"], s["latency_ms"]["p95"],
+              s["latency_ms"]["p99"], s["latency_ms"]["max"], s["errors"],
+              "-" if s["db_queries_per_request"] is None else s["db_queries_per_request"],
+              "-" if s["cache_hit_rate"] is None else round(s["cache_hit_rate"] * 100, 1)]
+             for route, s in sections]
+        ))
+
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+COLOURS = ["#1f77b4", "#ff7f0e", "#d62728", "#2ca02c"]
+
+
+def _chart(title: str, xs: List[float], series: Dict[str, List[float]], width: int = 720, height: int = 220) -> str:
+    if not xs:
+        return ""
+    pad = 40
+    top = max((max(values) for values in series.values() if values), default=0) or 1
+    span = (max(xs) - min(xs)) or 1
+
+    def point(x: float, y: float) -> str:
+        return f"{pad + (x - min(xs)) / span * (width - 2 * pad):.1f},{height - pad - y / top * (height - 2 * pad):.1f}"
+
+    svg = [
+        f"<h2>{html.escape(title)}</h2>",
+        f"<svg width='{width}' height='{height}' xmlns='http://www.w3.org/2000/svg'>",
+        f"<text x='4' y='{pad - 10}' font-size='11'>{top:g}</text>",
+        f"<text x='4' y='{height - pad}' font-size='11'>0</text>",
+        f"<text x='{pad}' y='{height - 10}' font-size='11'>{min(xs):g}</text>",
+        f"<text x='{width - pad}' y='{height - 10}' font-size='11' text-anchor='end'>{max(xs):g}</text>",
+    ]
+    for index, (name, values) in enumerate(series.items()):
+        colour = COLOURS[index % len(COLOURS)]
+        points = " ".join(point(x, y) for x, y in zip(xs, values))
+        svg.append(f"<polyline fill='none' stroke='{colour}' stroke-width='2' points='{points}'/>")
+        svg.append(f"<text x='{width - pad + 4}' y='{pad + 14 * index}' font-size='11' fill='{colour}'>{html.escape(name)}</text>")
+    svg.append("</svg>")
+    return "\n".join(svg)
+
+
+def _table(headers: List[str], rows: List[List[Any]], escape: bool = True) -> str:
+    def cell(value: Any) -> str:
+        return html.escape(str(value)) if escape else str(value)
+
+    lines = ["<table><tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in headers) + "</tr>"]
+    for row in rows:
+        lines.append("<tr>" + "".join(f"<td>{cell(value)}</td>" for value in row) + "</tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+
+def _int_header(response: httpx.Response, name: str) -> Optional[int]:
+    value = response.headers.get(name)
+    return int(value) if value is not None else None
+
+
+def _write(report: Dict[str, Any], args) -> None:
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.html:
+        with open(args.html, "w") as output:
+            output.write(render_html(report))
+    if args.json:
+        print(json.dumps(report))
+
+
+async def _discover(base_url: str, timeout: float) -> Targets:
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        targets = await Targets.discover(client)
+    if not targets.listing_keys or not targets.offices:
+        raise SystemExit(f"No listings or offices found at {base_url}")
+    return targets
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--base-url", default="http://localhost:8000")
+    common.add_argument("--scenario", choices=sorted(SCENARIOS) + ["mix"], default="mix")
+    common.add_argument("--timeout", type=float, default=30.0)
+    common.add_argument("--label", help="free-form run label, e.g. the worker and pool settings under test")
+    common.add_argument("--output", help="write the JSON report here")
+    common.add_argument("--html", help="write an HTML report here")
+    common.add_argument("--json", action="store_true", help="print the JSON report")
+
+    run_parser = commands.add_parser("run", parents=[common], help="fixed number of users for a duration")
+    run_parser.add_argument("--users", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    run_parser.add_argument("--think", type=float, default=1.0, help="think-time multiplier; 0 = back to back")
+    run_parser.add_argument("--interval", type=float, default=1.0, help="timeline window in seconds")
+    run_parser.add_argument("--seed", type=int, default=1)
+
+    saturate_parser = commands.add_parser("saturate", parents=[common], help="find the saturation throughput")
+    saturate_parser.add_argument("--start-users", type=int, default=1)
+    saturate_parser.add_argument("--max-users", type=int, default=512)
+    saturate_parser.add_argument("--step-seconds", type=float, default=15.0)
+    saturate_parser.add_argument("--slo-p95", type=float, default=250.0, help="p95 latency SLO in ms")
+    saturate_parser.add_argument("--max-error-rate", type=float, default=0.01)
+    saturate_parser.add_argument(
+        "--min-gain", type=float, default=0.05, help="stop when doubling users adds less throughput than this"
+    )
+    saturate_parser.add_argument("--think", type=float, default=0.0, help="think-time multiplier")
+    args = parser.parse_args(argv)
+
+    targets = asyncio.run(_discover(args.base_url, args.timeout))
+
+    if args.command == "run":
+        run = asyncio.run(run_load(
+            args.base_url, args.scenario, args.users, args.duration, targets, args.think, args.timeout, args.seed
+        ))
+        report = build_load_report(
+            run["results"], run["wall"], args.interval,
+            scenario=args.scenario, users=args.users, think=args.think, label=args.label
+        )
+        _write(report, args)
+        if not args.json:
+            _print_report(report)
+        return 0
+
+    report = asyncio.run(find_saturation(
+        args.base_url, args.scenario, targets, args.start_users, args.max_users, args.step_seconds,
+        args.slo_p95, args.max_error_rate, args.min_gain, args.think, args.timeout
+    ))
+    report["label"] = args.label
+    _write(report, args)
+    if not args.json:
+        saturation = report["saturation"]
+        if saturation:
+            print(f"Saturation: {saturation['throughput_rps']} req/s at {saturation['users']} users")
+        else:
+            print("No step met the SLO")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Per-endpoint query budgets.
+
+Runs every endpoint in process against sampled keys, with the response cache
+off, inside app.core.sql_stats.query_budget and fails when an endpoint
+executes more statements than its budget or repeats one statement shape more
+often than allowed (an N+1). Use it in CI against a benchmarks.dataset
+database:
+
+    python -m benchmarks.query_budgets --sample 10
+
+Budgets are worst case over the sampled inputs. Lower them when an endpoint
+gets cheaper so regressions are caught.
+"""
+from typing import Any, Callable, List, Optional, Tuple
+import argparse
+import sys
+
+from app.core.sql_stats import QueryBudgetExceeded, query_budget
+from benchmarks.suite import Samples
+
+PREFIX = "/api/v1"
+
+# name, inputs from samples, request (client, input), max statements, max executions of one statement shape
+Budget = Tuple[str, Callable[[Samples], List[Any]], Callable[[Any, Any], Any], int, Optional[int]]
+
+BUDGETS: List[Budget] = [
+    (
+        "GET /listings/{listing_key}", lambda s: s.listing_keys,
+        lambda client, key: client.get(f"{PREFIX}/listings/{key}"), 2, 1
+    ),
+    (
+        "GET /listings/{listing_key}/media", lambda s: s.listing_keys,
+        lambda client, key: client.get(f"{PREFIX}/listings/{key}/media"), 2, 1
+    ),
+    (
+        # One thumbnail lookup per similar listing
+        "GET /listings/{listing_key}/similar", lambda s: s.listing_keys,
+        lambda client, key: client.get(f"{PREFIX}/listings/{key}/similar"), 9, 5
+    ),
+    (
+        "GET /listings/{listing_key}/exists", lambda s: s.listing_keys,
+        lambda client, key: client.get(f"{PREFIX}/listings/{key}/exists"), 1, 1
+    ),
+    (
+        "POST /listings/batch", lambda s: s.batches,
+        lambda client, keys: client.post(f"{PREFIX}/listings/batch", json={"listing_keys": keys}), 4, 2
+    ),
+    (
+        # One thumbnail lookup per result row
+        "GET /search/", lambda s: s.filters,
+        lambda client, filters: client.get(f"{PREFIX}/search/", params=filters.model_dump(mode="json", exclude_none=True)),
+        44, 40
+    ),
+    (
+        # One thumbnail lookup per result row, up to the 500 row map limit per table
+        "GET /search/map", lambda s: s.bounds,
+        lambda client, bounds: client.get(f"{PREFIX}/search/map", params=bounds), 1002, 1000
+    ),
+    (
+        "GET /search/suggestions/cities", lambda s: [city[:3] for city in s.cities],
+        lambda client, q: client.get(f"{PREFIX}/search/suggestions/cities", params={"q": q}), 2, 1
+    ),
+    (
+        "GET /media/listing/{listing_key}", lambda s: s.listing_keys,
+        lambda client, key: client.get(f"{PREFIX}/media/listing/{key}"), 2, 1
+    ),
+    (
+        "GET /media/item/{media_key}", lambda s: s.media_keys,
+        lambda client, key: client.get(f"{PREFIX}/media/item/{key}"), 2, 1
+    ),
+    (
+        # One thumbnail lookup per featured listing
+        "GET /featured/{office_key}", lambda s: s.office_keys,
+        lambda client, key: client.get(f"{PREFIX}/featured/{key}"), 13, 12
+    ),
+    (
+        "GET /featured/batch", lambda s: s.office_batches,
+        lambda client, keys: client.get(f"{PREFIX}/featured/batch", params={"office_keys": ",".join(keys)}), 4, 2
+    ),
+    (
+        "GET /featured/office/{office_key}/info", lambda s: s.office_keys,
+        lambda client, key: client.get(f"{PREFIX}/featured/office/{key}/info"), 2, 1
+    ),
+]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=10, help="inputs drawn per kind")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+    from app.core.cache import ResponseCache, get_response_cache
+    from app.core.database import SessionLocal, get_redis
+    from app.jobs.indexes import refresh_indexes
+    from app.main import app
+
+    app.dependency_overrides[get_response_cache] = lambda: ResponseCache(None)
+    app.dependency_overrides[get_redis] = lambda: None
+    client = TestClient(app)
+
+    db = SessionLocal()
+    try:
+        samples = Samples(db, args.sample, args.seed)
+    finally:
+        db.close()
+
+    # The client runs without the lifespan, so load the in-process indexes its index job would keep
+    refresh_indexes()
+
+    failures = 0
+    for name, inputs, request, max_queries, max_repeats in BUDGETS:
+        worst = 0
+        violations = []
+        for value in inputs(samples):
+            # Warm the statement caches so only steady-state statements count
+            request(client, value)
+            try:
+                with query_budget(max_queries, max_repeats, label=name) as captured:
+                    request(client, value)
+            except QueryBudgetExceeded as e:
+                violations.append(str(e))
+            worst = max(worst, len(captured))
+        status = "FAIL" if violations else "ok"
+        print(f"{status:<4} {name:<44} worst={worst:<5} budget={max_queries} max_repeats={max_repeats}")
+        for violation in violations[:3]:
+            print(f"     {violation}")
+        failures += bool(violations)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
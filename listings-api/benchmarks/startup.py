@@ -0,0 +1,121 @@
+"""
+Worker startup cost: how long ``import app.main`` takes and how long the
+lifespan warm-up takes to make the worker ready.
+
+Imports are measured in fresh interpreters with ``-X importtime`` and broken
+down by top-level package and by app module. Import must stay cheap (no I/O,
+no index loading); everything slow belongs in the warm-up, whose phases are
+read from /readyz after running the lifespan once.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --import-budget-ms 1500 --skip-warmup   # CI gate
+"""
+from collections import defaultdict
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.stats import summarize
+
+
+def measure_import(module: str = "app.main") -> Dict[str, Any]:
+    """One fresh-interpreter import; cumulative and self microseconds per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules[name] = (int(self_us), int(cumulative_us))
+    return {"total_us": modules[module][1], "modules": modules}
+
+
+def import_report(runs: int, top: int) -> Dict[str, Any]:
+    totals = []
+    packages: Dict[str, List[int]] = defaultdict(list)
+    app_modules: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(runs):
+        measured = measure_import()
+        totals.append(measured["total_us"] / 1000)
+        package_self = defaultdict(int)
+        for name, (self_us, _) in measured["modules"].items():
+            package_self[name.split(".")[0]] += self_us
+            if name.startswith("app."):
+                app_modules[name].append(self_us)
+        for package, self_us in package_self.items():
+            packages[package].append(self_us)
+
+    def median_ms(values: List[int]) -> float:
+        return round(sorted(values)[len(values) // 2] / 1000, 2)
+
+    return {
+        "import_ms": summarize(totals),
+        "packages_ms": dict(sorted(
+            ((package, median_ms(values)) for package, values in packages.items()), key=lambda item: -item[1]
+        )[:top]),
+        "app_modules_ms": dict(sorted(
+            ((name, median_ms(values)) for name, values in app_modules.items()), key=lambda item: -item[1]
+        )[:top]),
+    }
+
+
+def warmup_report() -> Dict[str, Any]:
+    """Run the lifespan once in process and return /readyz."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.get("/readyz")
+    return {"status_code": response.status_code, **response.json()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh-interpreter imports to measure")
+    parser.add_argument("--top", type=int, default=12, help="packages and app modules listed")
+    parser.add_argument("--import-budget-ms", type=float, help="exit 1 when the median import exceeds this")
+    parser.add_argument("--skip-warmup", action="store_true", help="only measure imports (no database needed)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = import_report(args.runs, args.top)
+    if not args.skip_warmup:
+        report["warmup"] = warmup_report()
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        imports = report["import_ms"]
+        print(f"import app.main: p50={imports['p50']:.1f}ms max={imports['max']:.1f}ms over {imports['count']} runs")
+        print("\nSelf time by package (median ms):")
+        for package, ms in report["packages_ms"].items():
+            print(f"  {ms:8.2f}  {package}")
+        print("\nSelf time by app module (median ms):")
+        for name, ms in report["app_modules_ms"].items():
+            print(f"  {ms:8.2f}  {name}")
+        if "warmup" in report:
+            warmup = report["warmup"]
+            print(f"\nWarm-up: ready={warmup['ready']} (HTTP {warmup['status_code']})")
+            for phase, ms in warmup["warmup_ms"].items():
+                print(f"  {ms:8.1f}ms  {phase}")
+            for phase, error in warmup["errors"].items():
+                print(f"  error in {phase}: {error}")
+
+    budget = args.import_budget_ms
+    if budget is not None and report["import_ms"]["p50"] > budget:
+        print(f"\nImport budget exceeded: {report['import_ms']['p50']:.1f}ms > {budget:.1f}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
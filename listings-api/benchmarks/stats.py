@@ -0,0 +1,39 @@
+"""Small statistics helpers shared by the benchmark tools."""
+from typing import Dict, List, Sequence
+import bisect
+import math
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    if not samples_ms:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(samples_ms),
+        "mean": round(sum(samples_ms) / len(samples_ms), 3),
+        "p50": round(percentile(samples_ms, 50), 3),
+        "p95": round(percentile(samples_ms, 95), 3),
+        "p99": round(percentile(samples_ms, 99), 3),
+        "max": round(max(samples_ms), 3),
+    }
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def histogram(samples_ms: Sequence[float], bounds: Sequence[float] = LATENCY_BUCKETS_MS) -> List[int]:
+    """Counts per bucket: ``samples <= bounds[i]`` (non-cumulative), plus one overflow bucket."""
+    counts = [0] * (len(bounds) + 1)
+    for value in samples_ms:
+        counts[bisect.bisect_left(bounds, value)] += 1
+    return counts
@@ -0,0 +1,356 @@
+"""
+Service and endpoint benchmark suite.
+
+Times every public method of ListingsService, SearchService, MediaService and
+FeaturedService, the in-memory indexes, the Pydantic schema conversions and
+every API endpoint (in process, without the response cache unless
+--endpoint-cache is given). Each case reports a latency summary and DB
+queries per call. Run it against a dataset from benchmarks.dataset:
+
+    python -m benchmarks.dataset --size 100k --truncate
+    python -m benchmarks.suite --sample 50 --iterations 3 --append results.jsonl
+
+--filter runs only cases whose "group.name" contains the given text.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.request_context import begin_request, current_stats, end_request
+from app.models.database import (
+    ResidentialProperty, CommercialProperty, ResidentialMedia
+)
+from app.models.schemas import (
+    ListingDetail, ListingSummary, MediaItem, PropertyType, SearchFilters,
+    SortOption, TransactionType
+)
+from app.services.featured import FeaturedService
+from app.services.listings import ListingsService
+from app.services.media import MediaService
+from app.services.office_stats import office_stats
+from app.services.reference_data import build_reference_data
+from app.services.routing import listing_router
+from app.services.search import SearchService
+from benchmarks.stats import summarize
+
+
+class Case:
+    def __init__(self, group: str, name: str, call: Callable[[Any], Any], inputs: Sequence[Any]):
+        self.group = group
+        self.name = name
+        self.call = call
+        self.inputs = list(inputs)
+
+    @property
+    def label(self) -> str:
+        return f"{self.group}.{self.name}"
+
+
+class Samples:
+    """Inputs drawn from the current database so cases hit real rows."""
+
+    def __init__(self, db, size: int, seed: int):
+        rng = random.Random(seed)
+        self.listing_keys = _column(db, (
+            "(SELECT listing_key FROM residential_properties WHERE standard_status = 'Active' "
+            "ORDER BY md5(listing_key) LIMIT :n) UNION ALL "
+            "(SELECT listing_key FROM commercial_properties WHERE standard_status = 'Active' "
+            "ORDER BY md5(listing_key) LIMIT :n)"
+        ), size)
+        rng.shuffle(self.listing_keys)
+        self.office_keys = _column(db, (
+            "SELECT list_office_key FROM residential_properties WHERE list_office_key IS NOT NULL "
+            "GROUP BY 1 ORDER BY count(*) DESC LIMIT :n"
+        ), size)
+        self.media_keys = _column(db, (
+            "SELECT media_key FROM residential_media ORDER BY md5(media_key) LIMIT :n"
+        ), size)
+        self.cities = _column(db, (
+            "SELECT city_region FROM residential_properties WHERE city_region IS NOT NULL "
+            "GROUP BY 1 ORDER BY count(*) DESC LIMIT :n"
+        ), size)
+        centres = db.execute(text(
+            "SELECT latitude, longitude FROM residential_properties "
+            "WHERE latitude IS NOT NULL ORDER BY md5(listing_key) LIMIT :n"
+        ), {"n": size}).fetchall()
+        # Neighbourhood-sized map viewports around real listings
+        self.bounds = [
+            dict(ne_lat=lat + 0.02, ne_lng=lng + 0.03, sw_lat=lat - 0.02, sw_lng=lng - 0.03)
+            for lat, lng in centres
+        ]
+        self.filters = [
+            SearchFilters(),
+            SearchFilters(property_type=PropertyType.RESIDENTIAL),
+            SearchFilters(transaction_type=TransactionType.FOR_SALE, min_price=500000, max_price=1500000),
+            SearchFilters(property_type=PropertyType.RESIDENTIAL, bedrooms=3, bathrooms=2),
+            SearchFilters(property_type=PropertyType.COMMERCIAL, transaction_type=TransactionType.FOR_LEASE),
+        ] + [SearchFilters(city_region=city) for city in self.cities[:5]]
+        self.batches = [
+            self.listing_keys[start:start + 20] for start in range(0, max(1, len(self.listing_keys) - 19), 20)
+        ] or [self.listing_keys]
+        self.office_batches = [self.office_keys[:10], self.office_keys[-10:]]
+
+
+def _column(db, query: str, size: int) -> List[Any]:
+    return [row[0] for row in db.execute(text(query), {"n": size})]
+
+
+def service_cases(db, samples: Samples) -> List[Case]:
+    listings = ListingsService(db)
+    search = SearchService(db)
+    media = MediaService(db)
+    featured = FeaturedService(db)
+    sorts = list(SortOption)
+
+    return [
+        Case("listings", "get_listing_by_key", listings.get_listing_by_key, samples.listing_keys),
+        Case("listings", "get_listing_detail_json", listings.get_listing_detail_json, samples.listing_keys),
+        Case("listings", "get_listings_by_keys[20]", listings.get_listings_by_keys, samples.batches),
+        Case("listings", "get_similar_listings", listings.get_similar_listings, samples.listing_keys),
+        Case("listings", "check_listing_exists", listings.check_listing_exists, samples.listing_keys),
+        Case(
+            "search", "search_listings",
+            lambda args: search.search_listings(args[0], page=1, limit=20, sort=args[1]),
+            [(filters, sorts[index % len(sorts)]) for index, filters in enumerate(samples.filters)]
+        ),
+        Case(
+            "search", "search_listings[page 5]",
+            lambda filters: search.search_listings(filters, page=5, limit=20),
+            samples.filters
+        ),
+        Case(
+            "search", "search_listings_for_map",
+            lambda bounds: search.search_listings_for_map(SearchFilters(**bounds), limit=500),
+            samples.bounds
+        ),
+        Case("search", "get_city_suggestions", search.get_city_suggestions, [city[:3] for city in samples.cities]),
+        Case("search", "get_property_subtypes", search.get_property_subtypes, [None, PropertyType.RESIDENTIAL]),
+        Case("media", "get_media_by_listing", media.get_media_by_listing, samples.listing_keys),
+        Case(
+            "media", "get_media_by_listing[Thumbnail]",
+            lambda key: media.get_media_by_listing(key, size_filter="Thumbnail"),
+            samples.listing_keys
+        ),
+        Case("media", "get_media_by_key", media.get_media_by_key, samples.media_keys),
+        Case("media", "get_available_sizes", media.get_available_sizes, [None, "residential"]),
+        Case("media", "get_available_types", media.get_available_types, [None, "commercial"]),
+        Case("featured", "get_featured_listings", featured.get_featured_listings, samples.office_keys),
+        Case(
+            "featured", "get_featured_listings_batch[10]",
+            featured.get_featured_listings_batch, samples.office_batches
+        ),
+        Case(
+            "featured", "build_featured_feeds",
+            lambda key: featured.build_featured_feeds(key, [(None, 12, None), (PropertyType.RESIDENTIAL, 12, "For Sale")]),
+            samples.office_keys
+        ),
+        Case("featured", "get_office_info", featured.get_office_info, samples.office_keys),
+        Case("featured", "get_active_offices", lambda _: featured.get_active_offices(), [None]),
+        Case("memory", "office_stats.get_active_offices", lambda _: office_stats.get_active_offices(), [None]),
+        Case("memory", "office_stats.get_office_info", office_stats.get_office_info, samples.office_keys),
+        Case("memory", "build_reference_data", lambda _: build_reference_data(db), [None]),
+    ]
+
+
+def schema_cases(db, samples: Samples) -> List[Case]:
+    """Conversions only: ORM rows are loaded up front, outside the timing."""
+    keys = samples.listing_keys
+    residential = db.query(ResidentialProperty).filter(ResidentialProperty.listing_key.in_(keys)).all()
+    commercial = db.query(CommercialProperty).filter(CommercialProperty.listing_key.in_(keys)).all()
+    rows = residential + commercial
+    media_rows = db.query(ResidentialMedia).filter(ResidentialMedia.resource_record_key.in_(keys)).all()
+    media_items = [MediaItem.model_validate(row.__dict__) for row in media_rows]
+    details = [ListingDetail.from_db_model(row, media_items[:40]) for row in rows]
+    summaries = [ListingSummary.from_db_model(row) for row in rows]
+
+    return [
+        Case("schemas", "ListingDetail.from_db_model", lambda row: ListingDetail.from_db_model(row, media_items[:40]), rows),
+        Case("schemas", "ListingSummary.from_db_model", ListingSummary.from_db_model, rows),
+        Case("schemas", "MediaItem.model_validate", lambda row: MediaItem.model_validate(row.__dict__), media_rows[:200]),
+        Case("schemas", "ListingDetail.model_dump_json", lambda detail: detail.model_dump_json(), details),
+        Case("schemas", "ListingSummary.model_dump_json[20]", lambda _: [s.model_dump_json() for s in summaries[:20]], [None]),
+    ]
+
+
+def endpoint_cases(samples: Samples, use_cache: bool) -> List[Case]:
+    from fastapi.testclient import TestClient
+    from app.core.cache import ResponseCache, get_response_cache
+    from app.core.database import check_redis, get_redis
+    from app.main import app
+
+    if use_cache:
+        check_redis()
+    else:
+        app.dependency_overrides[get_response_cache] = lambda: ResponseCache(None)
+        app.dependency_overrides[get_redis] = lambda: None
+    # The lifespan is not run: no warm-up or background jobs while timing
+    client = TestClient(app)
+    settings.REQUEST_STATS_HEADERS = True
+
+    def get(path: str, params: Optional[Dict[str, Any]] = None):
+        return client.get(path, params=params)
+
+    prefix = settings.API_V1_STR
+    return [
+        Case("endpoints", "GET /listings/{key}", lambda key: get(f"{prefix}/listings/{key}"), samples.listing_keys),
+        Case("endpoints", "GET /listings/{key}/media", lambda key: get(f"{prefix}/listings/{key}/media"), samples.listing_keys),
+        Case("endpoints", "GET /listings/{key}/similar", lambda key: get(f"{prefix}/listings/{key}/similar"), samples.listing_keys),
+        Case("endpoints", "GET /listings/{key}/exists", lambda key: get(f"{prefix}/listings/{key}/exists"), samples.listing_keys),
+        Case(
+            "endpoints", "POST /listings/batch[20]",
+            lambda keys: client.post(f"{prefix}/listings/batch", json={"listing_keys": keys}),
+            samples.batches
+        ),
+        Case(
+            "endpoints", "GET /search/",
+            lambda filters: get(f"{prefix}/search/", filters.model_dump(mode="json", exclude_none=True)),
+            samples.filters
+        ),
+        Case("endpoints", "GET /search/map", lambda bounds: get(f"{prefix}/search/map", bounds), samples.bounds),
+        Case(
+            "endpoints", "GET /search/suggestions/cities",
+            lambda city: get(f"{prefix}/search/suggestions/cities", {"q": city[:3]}), samples.cities
+        ),
+        Case(
+            "endpoints", "GET /search/suggestions/property-types",
+            lambda _: get(f"{prefix}/search/suggestions/property-types"), [None]
+        ),
+        Case("endpoints", "GET /media/listing/{key}", lambda key: get(f"{prefix}/media/listing/{key}"), samples.listing_keys),
+        Case("endpoints", "GET /media/item/{key}", lambda key: get(f"{prefix}/media/item/{key}"), samples.media_keys),
+        Case("endpoints", "GET /media/sizes", lambda _: get(f"{prefix}/media/sizes"), [None]),
+        Case("endpoints", "GET /featured/{office}", lambda key: get(f"{prefix}/featured/{key}"), samples.office_keys),
+        Case(
+            "endpoints", "GET /featured/batch[10]",
+            lambda keys: get(f"{prefix}/featured/batch", {"office_keys": ",".join(keys)}), samples.office_batches
+        ),
+        Case("endpoints", "GET /featured/offices", lambda _: get(f"{prefix}/featured/offices"), [None]),
+        Case(
+            "endpoints", "GET /featured/office/{office}/info",
+            lambda key: get(f"{prefix}/featured/office/{key}/info"), samples.office_keys
+        ),
+    ]
+
+
+def run_case(db, case: Case, iterations: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    # One untimed pass warms connections and statement caches
+    for value in case.inputs[:3]:
+        try:
+            case.call(value)
+        except Exception:
+            pass
+        db.expunge_all()
+
+    for _ in range(iterations):
+        for value in case.inputs:
+            token = begin_request()
+            try:
+                started = time.perf_counter()
+                result = case.call(value)
+                latencies.append((time.perf_counter() - started) * 1000)
+                # Endpoint cases report the middleware's own count
+                header = result.headers.get("x-db-queries") if hasattr(result, "headers") else None
+                queries.append(int(header) if header is not None else current_stats().db_queries)
+                if getattr(result, "status_code", 200) >= 500:
+                    errors += 1
+            except Exception:
+                errors += 1
+            finally:
+                end_request(token)
+            db.expunge_all()
+
+    return {
+        "case": case.label,
+        "latency_ms": summarize(latencies),
+        "db_queries_per_call": round(sum(queries) / len(queries), 2) if queries else None,
+        "errors": errors,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=30, help="inputs drawn per kind")
+    parser.add_argument("--iterations", type=int, default=3, help="timed passes over each case's inputs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--filter", help="run only cases whose group.name contains this text")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--endpoint-cache", action="store_true", help="keep the Redis response cache for endpoint cases")
+    parser.add_argument("--output", help="write the JSON results here")
+    parser.add_argument("--append", help="append the results as one JSON line (trend tracking)")
+    parser.add_argument("--json", action="store_true", help="print the JSON results")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        samples = Samples(db, args.sample, args.seed)
+        dataset = {
+            table: db.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            for table in ("residential_properties", "commercial_properties", "residential_media", "commercial_media")
+        }
+        office_stats.refresh(db)
+        listing_router.refresh(db)
+
+        cases = service_cases(db, samples) + schema_cases(db, samples)
+        if not args.skip_endpoints:
+            cases += endpoint_cases(samples, args.endpoint_cache)
+        if args.filter:
+            cases = [case for case in cases if args.filter in case.label]
+
+        results = []
+        for case in cases:
+            result = run_case(db, case, args.iterations)
+            results.append(result)
+            if not args.json:
+                latency = result["latency_ms"]
+                print(
+                    f"{case.label[:56]:<56} n={latency['count']:<5} p50={latency['p50']:>9.3f} "
+                    f"p95={latency['p95']:>9.3f} p99={latency['p99']:>9.3f} "
+                    f"dbq={result['db_queries_per_call']} err={result['errors']}",
+                    flush=True
+                )
+    finally:
+        db.close()
+
+    report = {
+        "benchmark": "suite",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "dataset": dataset,
+        "iterations": args.iterations,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.append:
+        with open(args.append, "a") as output:
+            output.write(json.dumps(report) + "\n")
+    if args.json:
+        print(json.dumps(report))
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Local trace collector and trace summaries.
+
+`collect` is a stand-in for an OTLP collector: it accepts OTLP/JSON posts
+on /v1/traces (TRACE_EXPORT=otlp) and appends the spans to a JSONL file in
+the same format the API writes with TRACE_EXPORT=jsonl. `summary` shows where
+time goes per route: span names with their share of the route's time, counted
+as self time (the span's duration minus its children's), and weighted by
+each trace's sampling weight.
+
+    python -m benchmarks.traces collect --port 4318 --output traces.jsonl
+    python -m benchmarks.traces summary traces*.jsonl --route "/search"
+"""
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List
+import argparse
+import json
+import sys
+import threading
+
+from benchmarks.stats import summarize
+
+
+def load_spans(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with open(path) as trace_file:
+            for line in trace_file:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    return spans
+
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("doubleValue", "boolValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def otlp_to_spans(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                spans.append({
+                    "trace_id": span["traceId"],
+                    "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId") or None,
+                    "name": span["name"],
+                    "start_ns": start,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "attributes": {
+                        attribute["key"]: _attribute_value(attribute["value"])
+                        for attribute in span.get("attributes", [])
+                    },
+                })
+    return spans
+
+
+def collect(port: int, output: str) -> None:
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            spans = otlp_to_spans(payload)
+            with lock, open(output, "a") as trace_file:
+                for span in spans:
+                    trace_file.write(json.dumps(span) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"Collecting OTLP/JSON traces on :{port}/v1/traces into {output}", file=sys.stderr)
+    ThreadingHTTPServer(("", port), Handler).serve_forever()
+
+
+def summarize_traces(spans: List[Dict[str, Any]], route_filter: str = None) -> Dict[str, Any]:
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+
+    routes: Dict[str, Dict[str, Any]] = {}
+    for trace_spans in traces.values():
+        roots = [span for span in trace_spans if "http.route" in span["attributes"] or "http.status_code" in span["attributes"]]
+        if not roots:
+            continue
+        root = roots[0]
+        if route_filter and route_filter not in root["name"]:
+            continue
+        weight = root["attributes"].get("sampling.weight", 1.0)
+        children_ms: Dict[str, float] = defaultdict(float)
+        for span in trace_spans:
+            if span["parent_id"]:
+                children_ms[span["parent_id"]] += span["duration_ms"]
+
+        route = routes.setdefault(root["name"], {"traces": 0, "weight": 0.0, "durations": [], "self_ms": defaultdict(float), "calls": defaultdict(float)})
+        route["traces"] += 1
+        route["weight"] += weight
+        route["durations"].append(root["duration_ms"])
+        for span in trace_spans:
+            self_ms = max(0.0, span["duration_ms"] - children_ms.get(span["span_id"], 0.0))
+            name = "(request)" if span is root else span["name"]
+            route["self_ms"][name] += self_ms * weight
+            route["calls"][name] += weight
+
+    report = {}
+    for name, route in sorted(routes.items(), key=lambda item: -item[1]["weight"]):
+        total = sum(route["self_ms"].values()) or 1.0
+        report[name] = {
+            "traces": route["traces"],
+            "estimated_requests": round(route["weight"]),
+            "latency_ms": summarize(route["durations"]),
+            "breakdown": [
+                {
+                    "span": span_name,
+                    "share": round(self_ms / total, 4),
+                    "self_ms_per_request": round(self_ms / route["weight"], 3),
+                    "calls_per_request": round(route["calls"][span_name] / route["weight"], 2),
+                }
+                for span_name, self_ms in sorted(route["self_ms"].items(), key=lambda item: -item[1])
+            ],
+        }
+    return report
+
+
+def _print_summary(report: Dict[str, Any], top: int) -> None:
+    for route, section in report.items():
+        latency = section["latency_ms"]
+        print(
+            f"\n{route}  traces={section['traces']} (~{section['estimated_requests']} requests) "
+            f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms"
+        )
+        for row in section["breakdown"][:top]:
+            print(
+                f"  {row['share'] * 100:5.1f}%  {row['self_ms_per_request']:9.3f}ms  "
+                f"x{row['calls_per_request']:<7} {row['span'][:100]}"
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    collect_parser = commands.add_parser("collect", help="run a local OTLP/JSON collector")
+    collect_parser.add_argument("--port", type=int, default=4318)
+    collect_parser.add_argument("--output", default="traces.jsonl")
+
+    summary_parser = commands.add_parser("summary", help="where time goes per route")
+    summary_parser.add_argument("files", nargs="+", help="JSONL span files")
+    summary_parser.add_argument("--route", help="only routes containing this text")
+    summary_parser.add_argument("--top", type=int, default=15, help="span names shown per route")
+    summary_parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        collect(args.port, args.output)
+        return 0
+
+    report = summarize_traces(load_spans(args.files), args.route)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        _print_summary(report, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Replay captured API workloads and compare runs.
+
+Capture on a running instance by setting WORKLOAD_CAPTURE_PATH (for example
+/tmp/capture-{pid}.jsonl) and optionally WORKLOAD_CAPTURE_SAMPLE_RATE. Replay
+against a local instance started with REQUEST_STATS_HEADERS=true so DB query
+counts and cache hits can be reported:
+
+    python -m benchmarks.workload replay /tmp/capture-*.jsonl \\
+        --base-url http://localhost:8000 --speedup 10 --concurrency 32 \\
+        --remap --output runs/baseline.json
+    python -m benchmarks.workload diff runs/baseline.json runs/candidate.json
+
+--remap maps captured listing, office and media keys deterministically onto
+keys present in the local database, so production captures replay against a
+synthetic dataset.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.stats import summarize
+
+# Path and query parameters that carry identifiers, by kind
+KEY_PARAMETERS = {
+    "listing_key": "listing",
+    "office_key": "office",
+    "media_key": "media",
+}
+
+
+def load_capture(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    records = []
+    for path in paths:
+        with open(path) as capture:
+            for line in capture:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+class KeyRemapper:
+    """Deterministically maps captured identifiers onto keys that exist locally."""
+
+    def __init__(self, keys: Dict[str, List[str]]):
+        self.keys = {kind: sorted(values) for kind, values in keys.items() if values}
+
+    @classmethod
+    def from_database(cls, limit: int = 200000) -> "KeyRemapper":
+        from sqlalchemy import text
+        from app.core.database import SessionLocal
+
+        queries = {
+            "listing": (
+                "(SELECT listing_key FROM residential_properties LIMIT :n) UNION ALL "
+                "(SELECT listing_key FROM commercial_properties LIMIT :n)"
+            ),
+            "office": (
+                "SELECT DISTINCT list_office_key FROM residential_properties WHERE list_office_key IS NOT NULL "
+                "UNION SELECT DISTINCT list_office_key FROM commercial_properties WHERE list_office_key IS NOT NULL"
+            ),
+            "media": (
+                "(SELECT media_key FROM residential_media LIMIT :n) UNION ALL "
+                "(SELECT media_key FROM commercial_media LIMIT :n)"
+            ),
+        }
+        db = SessionLocal()
+        try:
+            keys = {
+                kind: [row[0] for row in db.execute(text(query), {"n": limit})]
+                for kind, query in queries.items()
+            }
+        finally:
+            db.close()
+        return cls(keys)
+
+    def map(self, kind: str, value: str) -> str:
+        candidates = self.keys.get(kind)
+        if not candidates:
+            return value
+        digest = int(hashlib.sha1(value.encode()).hexdigest(), 16)
+        return candidates[digest % len(candidates)]
+
+    def remap(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        record = dict(record)
+        record["path_params"] = {
+            name: self.map(KEY_PARAMETERS[name], value) if name in KEY_PARAMETERS else value
+            for name, value in record.get("path_params", {}).items()
+        }
+        query = []
+        for name, value in record.get("query", []):
+            if name == "office_keys":
+                value = ",".join(self.map("office", key) for key in value.split(",") if key)
+            elif name in KEY_PARAMETERS:
+                value = self.map(KEY_PARAMETERS[name], value)
+            query.append([name, value])
+        record["query"] = query
+        body = record.get("body")
+        if isinstance(body, dict) and isinstance(body.get("listing_keys"), list):
+            record["body"] = {**body, "listing_keys": [self.map("listing", key) for key in body["listing_keys"]]}
+        return record
+
+
+def request_path(record: Dict[str, Any]) -> str:
+    path = record["route"]
+    for name, value in record.get("path_params", {}).items():
+        path = path.replace("{" + name + "}", quote(str(value), safe=""))
+    return path
+
+
+async def replay(
+    records: List[Dict[str, Any]],
+    base_url: str,
+    speedup: float,
+    concurrency: int,
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Send the records with their original spacing divided by ``speedup``
+    (0 sends as fast as ``concurrency`` allows). Latency is measured from
+    send to full response body.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Dict[str, Any]] = []
+    late = 0
+
+    async def send(client: httpx.AsyncClient, record: Dict[str, Any]) -> None:
+        try:
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    record["method"],
+                    request_path(record),
+                    params=record.get("query") or None,
+                    json=record.get("body") if record["method"] != "GET" else None,
+                )
+                await response.aread()
+                elapsed = (time.perf_counter() - started) * 1000
+                results.append({
+                    "route": f"{record['method']} {record['route']}",
+                    "status": response.status_code,
+                    "latency_ms": elapsed,
+                    "db_queries": _int_header(response, "x-db-queries"),
+                    "cache_hits": _int_header(response, "x-cache-hits"),
+                    "cache_misses": _int_header(response, "x-cache-misses"),
+                })
+            except httpx.HTTPError as e:
+                results.append({
+                    "route": f"{record['method']} {record['route']}",
+                    "status": None,
+                    "error": type(e).__name__,
+                    "latency_ms": (time.perf_counter() - started) * 1000,
+                })
+        finally:
+            semaphore.release()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        tasks = []
+        origin = records[0]["ts"] if records else 0
+        started = time.perf_counter()
+        for record in records:
+            if speedup > 0:
+                due = (record["ts"] - origin) / speedup
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.1:
+                    late += 1
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(send(client, record)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+
+    return build_report(results, wall, late)
+
+
+def build_report(results: List[Dict[str, Any]], wall: float, late: int = 0) -> Dict[str, Any]:
+    by_route: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+
+    def section(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        db_counts = [item["db_queries"] for item in items if item.get("db_queries") is not None]
+        hits = sum(item.get("cache_hits") or 0 for item in items)
+        misses = sum(item.get("cache_misses") or 0 for item in items)
+        return {
+            "latency_ms": summarize([item["latency_ms"] for item in items if item.get("status") is not None]),
+            "errors": sum(1 for item in items if item.get("status") is None or item["status"] >= 500),
+            "db_queries_per_request": round(sum(db_counts) / len(db_counts), 3) if db_counts else None,
+            "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    return {
+        "benchmark": "workload_replay",
+        "requests": len(results),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "late_dispatches": late,
+        "overall": section(results),
+        "routes": {route: section(items) for route, items in sorted(by_route.items())},
+    }
+
+
+def diff_reports(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-route comparison of two replay reports (candidate relative to baseline)."""
+    rows = []
+    sections = {"(overall)": (baseline["overall"], candidate["overall"])}
+    for route in sorted(baseline["routes"].keys() | candidate["routes"].keys()):
+        sections[route] = (baseline["routes"].get(route), candidate["routes"].get(route))
+
+    for route, (before, after) in sections.items():
+        row: Dict[str, Any] = {"route": route}
+        if before is None or after is None:
+            row["note"] = "only in baseline" if after is None else "only in candidate"
+            rows.append(row)
+            continue
+        for pct in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][pct], after["latency_ms"][pct]
+            row[pct] = {"baseline": old, "candidate": new, "change_pct": _change(old, new)}
+        for metric in ("db_queries_per_request", "cache_hit_rate", "errors"):
+            row[metric] = {"baseline": before.get(metric), "candidate": after.get(metric)}
+        rows.append(row)
+    return rows
+
+
+def _change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if not old or new is None:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def _int_header(response: httpx.Response, name: str) -> Optional[int]:
+    value = response.headers.get(name)
+    return int(value) if value is not None else None
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['requests']} requests in {report['wall_seconds']}s "
+        f"({report['throughput_rps']} req/s, {report['late_dispatches']} dispatched late)"
+    )
+    rows = [("(overall)", report["overall"])] + list(report["routes"].items())
+    print(f"{'route':<48} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'dbq':>6} {'hit%':>6}")
+    for route, section in rows:
+        latency = section["latency_ms"]
+        dbq = section["db_queries_per_request"]
+        hit = section["cache_hit_rate"]
+        print(
+            f"{route[:48]:<48} {latency['count']:>6} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+            f"{latency['p99']:>8.2f} {section['errors']:>5} "
+            f"{'-' if dbq is None else f'{dbq:.1f}':>6} {'-' if hit is None else f'{hit * 100:.0f}':>6}"
+        )
+
+
+def _print_diff(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'route':<48} {'p50':>18} {'p95':>18} {'p99':>18} {'dbq':>13} {'hit%':>11}")
+    for row in rows:
+        if "note" in row:
+            print(f"{row['route'][:48]:<48} {row['note']}")
+            continue
+        cells = []
+        for pct in ("p50", "p95", "p99"):
+            cell = row[pct]
+            change = "" if cell["change_pct"] is None else f" {cell['change_pct']:+.0f}%"
+            cells.append(f"{cell['candidate']:.1f}{change}".rjust(18))
+        dbq = row["db_queries_per_request"]
+        hit = row["cache_hit_rate"]
+        cells.append(f"{_fmt(dbq['baseline'])}->{_fmt(dbq['candidate'])}".rjust(13))
+        cells.append(f"{_fmt(hit['baseline'], 100)}->{_fmt(hit['candidate'], 100)}".rjust(11))
+        print(f"{row['route'][:48]:<48} " + " ".join(cells))
+
+
+def _fmt(value: Optional[float], scale: float = 1.0) -> str:
+    return "-" if value is None else f"{value * scale:.1f}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("replay", help="replay capture files against an instance")
+    replay_parser.add_argument("captures", nargs="+", help="JSONL capture files")
+    replay_parser.add_argument("--base-url", default="http://localhost:8000")
+    replay_parser.add_argument("--speedup", type=float, default=1.0, help="time compression; 0 = no pacing")
+    replay_parser.add_argument("--concurrency", type=int, default=16)
+    replay_parser.add_argument("--timeout", type=float, default=30.0)
+    replay_parser.add_argument("--limit", type=int, help="replay only the first N records")
+    replay_parser.add_argument("--remap", action="store_true", help="map keys onto the local database")
+    replay_parser.add_argument("--output", help="write the JSON report here")
+    replay_parser.add_argument("--json", action="store_true", help="print the JSON report")
+
+    diff_parser = commands.add_parser("diff", help="compare two replay reports")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("candidate")
+    diff_parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+    diff_parser.add_argument(
+        "--fail-over", type=float, metavar="PCT",
+        help="exit 1 if any route's p95 regresses by more than PCT percent"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        records = load_capture(args.captures)[:args.limit]
+        if args.remap:
+            remapper = KeyRemapper.from_database()
+            records = [remapper.remap(record) for record in records]
+        report = asyncio.run(replay(records, args.base_url, args.speedup, args.concurrency, args.timeout))
+        report["captures"] = args.captures
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(report, output, indent=2)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            _print_report(report)
+        return 0
+
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        rows = diff_reports(json.load(baseline), json.load(candidate))
+    if args.json:
+        print(json.dumps(rows))
+    else:
+        _print_diff(rows)
+    if args.fail_over is not None:
+        regressed = [
+            row["route"] for row in rows
+            if "p95" in row and row["p95"]["change_pct"] is not None and row["p95"]["change_pct"] > args.fail_over
+        ]
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
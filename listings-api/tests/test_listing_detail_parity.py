@@ -0,0 +1,69 @@
+"""
+Parity between the Postgres-rendered listing detail document and the ORM +
+Pydantic path. Runs against the configured database (seed one with
+``python -m benchmarks.dataset``) and is skipped when it is unreachable.
+
+    DATABASE_PASSWORD=... python -m pytest tests
+"""
+import json
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal
+from app.services.listings import ListingsService, _build_detail_document_query, json_object
+from app.services.routing import MEDIA_MODELS, PROPERTY_MODELS
+from benchmarks.listing_detail import check_parity, sample_listing_keys
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = SessionLocal()
+    try:
+        session.connection()
+    except OperationalError as e:
+        session.close()
+        pytest.skip(f"database unavailable: {e}")
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def listing_keys(db):
+    listing_keys = sample_listing_keys(db, 100)
+    if not listing_keys:
+        pytest.skip("database has no listings")
+    return listing_keys
+
+
+def test_sql_document_matches_orm(db, listing_keys):
+    mismatches = check_parity(ListingsService(db), listing_keys)
+    assert not mismatches, mismatches[:5]
+
+
+def test_unknown_listing_is_missing_on_both_paths(db):
+    service = ListingsService(db)
+    assert service.get_listing_by_key("no-such-listing") is None
+    assert service.get_listing_detail_json("no-such-listing") is None
+
+
+@pytest.mark.parametrize("property_type", list(PROPERTY_MODELS))
+def test_chunked_objects_render_the_same_document(db, property_type):
+    """Objects split over several json_build_object calls keep their keys and order."""
+    model = PROPERTY_MODELS[property_type]
+    row = db.query(model.listing_key).first()
+    if row is None:
+        pytest.skip(f"no {property_type} listings")
+    documents = [
+        db.execute(_build_detail_document_query(model, MEDIA_MODELS[property_type], max_pairs), {"listing_key": row[0]}).scalar()
+        for max_pairs in (50, 7)
+    ]
+    assert json.loads(documents[0], object_pairs_hook=list) == json.loads(documents[1], object_pairs_hook=list)
+
+
+def test_json_object_stays_within_the_argument_limit():
+    fields = [(f"f{i}", str(i)) for i in range(120)]
+    sql = json_object(fields)
+    assert sql.count("json_build_object(") == 3
+    for chunk in sql.split("json_build_object(")[1:]:
+        assert chunk.count("'f") <= 50